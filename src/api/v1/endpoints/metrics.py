@@ -0,0 +1,85 @@
+from fastapi import APIRouter
+from src.core.executors import get_pool_stats
+from src.core.jobs import job_queue
+from src.core.lazy import get_startup_report
+from src.rag_system.vector_store import get_vector_store_stats, get_embedding_cache_stats
+from src.rag_system.artifacts import get_artifact_stats
+from src.rag_system.answer_cache import get_answer_cache_stats
+from src.rag_system.reranker import get_rerank_stats
+from src.rag_system.context import get_context_stats
+from src.rag_system.question_bank import get_question_bank_stats
+
+router = APIRouter()
+
+@router.get("/pools")
+async def pool_metrics():
+    """
+    Queue depth, running workers and wait times for each worker pool.
+    """
+    return get_pool_stats()
+
+@router.get("/vector-store")
+async def vector_store_metrics():
+    """
+    Hit/miss counters for the per-namespace vector store and retriever caches.
+    """
+    return get_vector_store_stats()
+
+@router.get("/embedding-cache")
+async def embedding_cache_metrics():
+    """
+    Size, hit rate and evictions for the on-disk embedding cache.
+    """
+    return get_embedding_cache_stats()
+
+@router.get("/artifacts")
+async def artifact_metrics():
+    """
+    Hit rate and evictions for the content-addressed artifact cache
+    (re-uploaded files and already-processed YouTube videos).
+    """
+    return get_artifact_stats()
+
+@router.get("/answer-cache")
+async def answer_cache_metrics():
+    """
+    Hit rate and invalidations for the semantic answer cache (/chat answers).
+    """
+    return get_answer_cache_stats()
+
+@router.get("/reranker")
+async def reranker_metrics():
+    """
+    Rerank latency (p50/p95) and the current adaptive candidate depth, for tuning
+    RERANK_MAX_CANDIDATES / RERANK_TOP_K against throughput. Pool wait times are under /pools.
+    """
+    return get_rerank_stats()
+
+@router.get("/context")
+async def context_metrics():
+    """
+    Prompt tokens saved by context packing (near-duplicates, splitter overlap, token budget).
+    """
+    return get_context_stats()
+
+@router.get("/question-bank")
+async def question_bank_metrics():
+    """
+    Questions pre-generated for quizzes and exams, and how many have been served.
+    """
+    return get_question_bank_stats()
+
+@router.get("/jobs")
+async def job_metrics():
+    """
+    Job counts by status for the persistent job queue.
+    """
+    return job_queue.stats()
+
+@router.get("/startup")
+async def startup_metrics():
+    """
+    Startup-time breakdown: import time, warm-up, and how long each lazily
+    loaded model/client took (plus which ones haven't been loaded yet).
+    """
+    return get_startup_report()
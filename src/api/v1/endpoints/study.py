@@ -1,30 +1,48 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Body
+from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Query, Header, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import os
-import shutil
-from src.rag_system.loader import load_and_split_pdf, transcribe_and_split_audio
-from src.rag_system.vector_store import add_documents_to_store
+import asyncio
+import time
+from src.rag_system.loader import iter_pdf_chunks, iter_audio_chunks, get_youtube_video_id
+from src.rag_system.artifacts import ingest_artifact, file_artifact_key, youtube_artifact_key
+from src.rag_system.hashing import file_hash
+from src.rag_system.ingest import IngestReport
 from src.rag_system.graph import get_agent_runnable, AgentState
 from src.rag_system.search_chain import get_rag_search_runnable
 from src.rag_system.prioritize_chain import get_prioritize_runnable
-from fastapi import BackgroundTasks
 from pydantic import BaseModel, Field
-import uuid
 from src.rag_system.exam_chain import generate_exam_and_pdf
 from src.rag_system.tutor_chain import get_tutor_runnable
-from typing import List, Dict, Any
+from src.rag_system.conversations import Conversation, conversation_store, load_context
+from typing import List, Dict, Any, Literal
 from src.rag_system.map_chain import get_map_runnable
-from src.rag_system.loader import process_youtube_video
+from src.rag_system.loader import iter_youtube_chunks
+from src.core.jobs import Job, job_queue, COMPLETE, FINISHED_STATUSES
+from src.core.config import settings
+from src.core.uploads import (
+    SavedUpload, UploadSession, UploadTooLarge, UploadOffsetMismatch,
+    save_upload_stream, iter_upload_file, max_upload_bytes, upload_sessions
+)
+from src.rag_system.streaming import astream_progress, sse_stream, format_sse, graph_node_tokens, tagged_tokens
 
 # setup
 router = APIRouter()
-UPLOAD_DIR = "temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
 class UploadResponse(BaseModel):
     filename: str
     message: str
     documents_added: int
+    timings: Dict[str, float] | None = None # per-stage seconds: parse, embed, upsert
+    job_id: str | None = None # set when the work was queued with background=true
+    cached: bool = False # True when an identical input had already been processed
+
+class UploadInitRequest(BaseModel):
+    user_id: str
+    filename: str
+    kind: Literal["pdf", "audio"] = "audio"
+    size: int | None = Field(default=None, ge=0) # total bytes, if known
 
 class ChatRequest(BaseModel):
     question: str
@@ -57,19 +75,27 @@ class ExamJob(BaseModel):
     status: str = "pending"
     download_url: str | None = None
     error: str | None = None
+    progress: float = 0.0 # percentage, 0-100
+    stage: str | None = None # e.g. "retrieval", "planning", "section 3/8", "pdf"
+    updated_at: float = 0.0 # pass back as `since` when long-polling
 
 class ExamRequest(BaseModel):
     user_id: str
     num_questions: int = Field(default=20, gt=0, le=50)
+    priority: int = Field(default=0, ge=0, le=10)
 
 class GuidedChatRequest(BaseModel):
     user_id: str
     topic: str
-    chat_history: List[Dict[str, Any]] # e.g., [{"role": "user", "content": "..."}, ...]
+    # with a session_id the server keeps the history, so chat_history can be left out;
+    # without one, a new session is started (seeded with chat_history, if any)
+    session_id: str | None = None
+    chat_history: List[Dict[str, Any]] = [] # e.g., [{"role": "user", "content": "..."}, ...]
     user_question: str
 
 class GuidedChatResponse(BaseModel):
     ai_message: str
+    session_id: str | None = None # send it back on the next turn
 
 class MapRequest(BaseModel):
     user_id: str
@@ -81,21 +107,206 @@ class MapResponse(BaseModel):
 class YouTubeRequest(BaseModel):
     url: str
     user_id: str
+    background: bool = False # return a job_id right away instead of waiting
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    progress: float = 0.0
+    stage: str | None = None
+    result: Dict[str, Any] | None = None
+    error: str | None = None
+    updated_at: float = 0.0
+
+def run_exam_task(job: Job, report_progress) -> dict:
+    """
+    The exam job handler, run by the job queue workers.
+    """
+    download_url = generate_exam_and_pdf(
+        job.user_id,
+        job.payload["num_questions"],
+        progress=report_progress
+    )
+    return {"download_url": download_url}
+
+job_queue.register_handler("exam", run_exam_task)
 
-exam_jobs: dict[str, ExamJob] = {}
+def _ingest_into_store(key: str, source: str, filename: str, user_id: str, produce) -> dict:
+    """
+    Ingests an input through the artifact cache. On a miss, chunks are upserted
+    in batches while they're still being produced, so the first part of a
+    lecture can be queried before the rest is transcribed.
+    """
+    start = time.perf_counter()
+    report = ingest_artifact(key, source, user_id, produce)
+    elapsed = time.perf_counter() - start
+    
+    # parsing overlaps with indexing, so "parse" is whatever time wasn't embed/upsert
+    return {
+        "filename": filename,
+        "documents_added": report.chunks,
+        "cached": report.cached,
+        "timings": _stage_timings(max(0.0, elapsed - report.embed_seconds - report.upsert_seconds), report),
+    }
 
-def run_exam_task(job_id: str, user_id: str, num_questions: int):
+def run_transcription_task(job: Job, report_progress) -> dict:
     """
-    The function that runs in the background.
-    It updates the job status in our 'exam_jobs' dict.
+    The audio job handler: chunks are indexed as the transcription progresses.
     """
+    file_path = job.payload["file_path"]
+    filename = job.payload["filename"]
     try:
-        download_url = generate_exam_and_pdf(user_id, num_questions)
-        exam_jobs[job_id].status = "complete"
-        exam_jobs[job_id].download_url = download_url
+        key = file_artifact_key(job.payload.get("sha256") or file_hash(file_path))
+        return _ingest_into_store(
+            key, filename, filename, job.user_id,
+            lambda: iter_audio_chunks(file_path, filename, progress=report_progress)
+        )
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+def discard_transcription_task(job: Job):
+    """
+    A transcription cancelled before it started: its upload is deleted here instead.
+    """
+    file_path = job.payload["file_path"]
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+def run_youtube_task(job: Job, report_progress) -> dict:
+    """
+    The YouTube job handler (transcript API, or download + Whisper as a fallback).
+    """
+    url = job.payload["url"]
+    video_id = get_youtube_video_id(url)
+    if not video_id:
+        raise ValueError("Invalid YouTube URL")
+
+    return _ingest_into_store(
+        youtube_artifact_key(video_id), f"YouTube: {url}", url, job.user_id,
+        lambda: iter_youtube_chunks(url, progress=report_progress)
+    )
+
+job_queue.register_handler("transcribe", run_transcription_task, on_discard=discard_transcription_task)
+job_queue.register_handler("youtube", run_youtube_task)
+
+def _to_job_status(job: Job) -> JobStatus:
+    return JobStatus(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        stage=job.stage,
+        result=job.result,
+        error=job.error,
+        updated_at=job.updated_at
+    )
+
+async def _upload_job_response(job: Job, filename: str, message: str, background: bool) -> UploadResponse:
+    """
+    Either returns the queued job right away, or waits for it like a normal request.
+    """
+    if background:
+        return UploadResponse(
+            filename=filename,
+            message="Queued. Follow progress at /jobs/{job_id}.",
+            documents_added=0,
+            job_id=job.job_id
+        )
+
+    job_id = job.job_id
+    job = await job_queue.wait_until_finished(job_id, settings.JOB_WATCH_MAX_SECONDS)
+    if job is None or job.status not in FINISHED_STATUSES:
+        raise HTTPException(504, f"Still processing. Follow progress at /jobs/{job_id}.")
+    if job.status != COMPLETE:
+        raise HTTPException(500, job.error or f"Job {job.status}.")
+
+    return UploadResponse(
+        filename=filename,
+        message=message,
+        documents_added=job.result["documents_added"],
+        timings=job.result["timings"],
+        cached=job.result.get("cached", False),
+        job_id=job.job_id
+    )
+
+def _to_exam_job(job: Job) -> ExamJob:
+    return ExamJob(
+        job_id=job.job_id,
+        status=job.status,
+        download_url=(job.result or {}).get("download_url"),
+        error=job.error,
+        progress=job.progress,
+        stage=job.stage,
+        updated_at=job.updated_at
+    )
+
+def _stage_timings(parse_seconds: float, report: IngestReport) -> Dict[str, float]:
+    return {
+        "parse": round(parse_seconds, 3),
+        "embed": report.embed_seconds,
+        "upsert": report.upsert_seconds,
+    }
+
+# bounds how many uploads one worker writes to disk at once
+_upload_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_UPLOADS)
+
+async def _save_upload(file: UploadFile, kind: str) -> SavedUpload:
+    """
+    Streams a multipart upload to a unique temp file (size-checked, hashed on the way).
+    """
+    async with _upload_slots:
+        try:
+            return await save_upload_stream(iter_upload_file(file), file.filename, max_upload_bytes(kind))
+        except UploadTooLarge as e:
+            raise HTTPException(413, str(e))
+
+async def _ingest_pdf(saved: SavedUpload, user_id: str) -> UploadResponse:
+    try:
+        # identical files (the same syllabus, uploaded by every student) are only parsed once
+        key = file_artifact_key(saved.sha256)
+        
+        # loading, splitting and adding to the vector store
+        result = await asyncio.to_thread(
+            _ingest_into_store,
+            key, saved.filename, saved.filename, user_id,
+            lambda: iter_pdf_chunks(saved.path, source=saved.filename)
+        )
+        
+        return UploadResponse(
+            message="File processed and added to vector store.",
+            **result
+        )
+        
+    except Exception as e:
+        raise HTTPException(500, f"An error occurred: {str(e)}")
+        
+    finally:
+        if os.path.exists(saved.path):
+            os.remove(saved.path)
+
+async def _queue_audio(saved: SavedUpload, user_id: str, background: bool) -> UploadResponse:
+    try:
+        # the job owns the file from here on (it's removed when the job finishes)
+        job = await asyncio.to_thread(
+            job_queue.submit,
+            "transcribe",
+            user_id,
+            {"file_path": saved.path, "filename": saved.filename, "sha256": saved.sha256}
+        )
+        
     except Exception as e:
-        exam_jobs[job_id].status = "error"
-        exam_jobs[job_id].error = str(e)
+        if os.path.exists(saved.path):
+            os.remove(saved.path)
+        raise HTTPException(500, f"An error occurred: {str(e)}")
+    
+    return await _upload_job_response(
+        job,
+        saved.filename,
+        "Audio file transcribed and added to vector store.",
+        background
+    )
 
 @router.post("/upload", response_model=UploadResponse)
 async def upload_pdf(
@@ -110,70 +321,98 @@ async def upload_pdf(
     if file.content_type != "application/pdf":
         raise HTTPException(400, "File must be a PDF")
     
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    
-    try:
-        # saving the file temporarily
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # loading and splitting
-        split_docs = load_and_split_pdf(file_path)
-            
-        # adding to the vector store
-        add_documents_to_store(split_docs, collection_name=user_id)
-        
-        return UploadResponse(
-            filename=file.filename,
-            message="File processed and added to vector store.",
-            documents_added=len(split_docs)
-        )
-        
-    except Exception as e:
-        raise HTTPException(500, f"An error occurred: {str(e)}")
-        
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    saved = await _save_upload(file, "pdf")
+    return await _ingest_pdf(saved, user_id)
 
 @router.post("/upload-audio", response_model=UploadResponse)
 async def upload_audio(
     user_id: str = Body(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    background: bool = Body(False)
 ):
     """
     Upload an audio file (e.g., mp3, m4a, wav).
     It will be transcribed, processed, and added to the user's vector store.
+    Transcription runs as a job; with background=true the job_id is returned
+    right away (see /jobs/{job_id}), otherwise the request waits for it.
     """
     
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    
+    saved = await _save_upload(file, "audio")
+    return await _queue_audio(saved, user_id, background)
+
+@router.post("/uploads", response_model=UploadSession)
+async def create_resumable_upload(request: UploadInitRequest):
+    """
+    Starts a resumable upload (for large audio files).
+    Send the file with PATCH /uploads/{upload_id} in sequential chunks,
+    each with an Upload-Offset header, then POST /uploads/{upload_id}/complete.
+    """
     try:
-        # saving the file temporarily
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # transcribe and split
-        split_docs = transcribe_and_split_audio(
-            file_path, 
-            source_filename=file.filename
+        return await asyncio.to_thread(
+            upload_sessions.create,
+            request.user_id,
+            request.filename,
+            request.kind,
+            request.size
         )
-            
-        # adding to the vector store
-        add_documents_to_store(split_docs, collection_name=user_id)
-        
-        return UploadResponse(
-            filename=file.filename,
-            message="Audio file transcribed and added to vector store.",
-            documents_added=len(split_docs)
-        )
-        
-    except Exception as e:
-        raise HTTPException(500, f"An error occurred: {str(e)}")
-        
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+
+@router.get("/uploads/{upload_id}", response_model=UploadSession)
+async def get_resumable_upload(upload_id: str):
+    """
+    How much of the file has been received (resume from `offset`).
+    """
+    session = await asyncio.to_thread(upload_sessions.get, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+@router.patch("/uploads/{upload_id}", response_model=UploadSession)
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset")
+):
+    """
+    Appends the raw request body to the upload, streamed straight to disk.
+    """
+    async with _upload_slots:
+        try:
+            session = await upload_sessions.append(upload_id, upload_offset, request.stream())
+        except UploadOffsetMismatch as e:
+            raise HTTPException(409, str(e))
+        except UploadTooLarge as e:
+            raise HTTPException(413, str(e))
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+@router.post("/uploads/{upload_id}/complete", response_model=UploadResponse)
+async def complete_resumable_upload(upload_id: str, background: bool = Body(False, embed=True)):
+    """
+    Finishes a resumable upload and processes the file like /upload or /upload-audio.
+    """
+    session = await asyncio.to_thread(upload_sessions.get, upload_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        saved = await asyncio.to_thread(upload_sessions.complete, upload_id)
+    except UploadOffsetMismatch as e:
+        raise HTTPException(409, str(e))
+
+    if session.kind == "audio":
+        return await _queue_audio(saved, session.user_id, background)
+    return await _ingest_pdf(saved, session.user_id)
+
+@router.delete("/uploads/{upload_id}")
+async def abort_resumable_upload(upload_id: str):
+    """
+    Cancels a resumable upload and deletes what was received.
+    """
+    if not await asyncio.to_thread(upload_sessions.abort, upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {"upload_id": upload_id, "status": "aborted"}
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_docs(request: ChatRequest):
@@ -195,7 +434,7 @@ async def chat_with_docs(request: ChatRequest):
         }
         
         # invoking the state
-        final_state = agent.invoke(initial_state)
+        final_state = await agent.ainvoke(initial_state)
         
         # return the result from the final state
         return ChatResponse(
@@ -208,6 +447,29 @@ async def chat_with_docs(request: ChatRequest):
     except Exception as e:
         raise HTTPException(500, f"Error during chat: {str(e)}")
     
+@router.post("/chat/stream")
+async def chat_with_docs_stream(request: ChatRequest):
+    """
+    Streaming version of /chat (Server-Sent Events).
+    Emits "router", "retrieval", "token" and a final "done" event.
+    """
+    agent = get_agent_runnable()
+    
+    initial_state: AgentState = {
+        "question": request.question,
+        "user_id": request.user_id,
+        "answer": "",
+        "quiz": "",
+        "next_node": "router"
+    }
+    
+    events = astream_progress(
+        agent,
+        initial_state,
+        token_filter=graph_node_tokens("rag_node", "quiz_node")
+    )
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream")
+    
 @router.post("/find-problems", response_model=SearchResponse)
 async def find_problems(request: SearchRequest):
     """
@@ -227,7 +489,7 @@ async def find_problems(request: SearchRequest):
         }
         
         # invoking the chain
-        results = search_chain.invoke(input_data)
+        results = await search_chain.ainvoke(input_data)
         
         return SearchResponse(
             results=results,
@@ -238,6 +500,22 @@ async def find_problems(request: SearchRequest):
     except Exception as e:
         raise HTTPException(500, f"Error finding problems: {str(e)}")
     
+@router.post("/find-problems/stream")
+async def find_problems_stream(request: SearchRequest):
+    """
+    Streaming version of /find-problems (Server-Sent Events).
+    Emits "retrieval", "search", "token" and a final "done" event.
+    """
+    search_chain = get_rag_search_runnable()
+    
+    input_data = {
+        "topic": request.topic,
+        "user_id": request.user_id
+    }
+    
+    events = astream_progress(search_chain, input_data, token_filter=tagged_tokens)
+    return StreamingResponse(sse_stream(events), media_type="text/event-stream")
+    
 @router.post("/prioritize", response_model=PrioritizeResponse)
 async def prioritize_topics(request: PrioritizeRequest):
     """
@@ -252,7 +530,7 @@ async def prioritize_topics(request: PrioritizeRequest):
         input_data = {"user_id": request.user_id}
         
         # invoking the chain
-        topics_list = chain.invoke(input_data)
+        topics_list = await chain.ainvoke(input_data)
         
         return PrioritizeResponse(
             topics_list=topics_list,
@@ -263,68 +541,150 @@ async def prioritize_topics(request: PrioritizeRequest):
         raise HTTPException(500, f"Error prioritizing topics: {e}")
     
 @router.post("/generate-test", response_model=ExamJob)
-async def start_exam_generation(
-    request: ExamRequest,
-    background_tasks: BackgroundTasks
-):
+async def start_exam_generation(request: ExamRequest):
     """
-    Starts a background job to generate a PDF exam.
+    Queues a job to generate a PDF exam.
     Returns a job_id to check status.
     """
 
-    # creating a unique job id
-    job_id = str(uuid.uuid4())
-    
-    # creating the job function
-    job = ExamJob(job_id=job_id, status="running")
-    exam_jobs[job_id] = job
-    
-    # adding the heavy lift function
-    background_tasks.add_task(
-        run_exam_task, 
-        job_id, 
-        request.user_id, 
-        request.num_questions
+    # the job is persisted, so any worker can run it and report on it
+    job = await asyncio.to_thread(
+        job_queue.submit,
+        "exam",
+        request.user_id,
+        {"num_questions": request.num_questions},
+        request.priority
     )
     
     # returning the job status
-    return job
+    return _to_exam_job(job)
 
 @router.get("/generate-test/status/{job_id}", response_model=ExamJob)
-async def get_exam_job_status(job_id: str):
+async def get_exam_job_status(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=60),
+    since: float = Query(default=0)
+):
     """
     Checks the status of a running exam generation job.
+    Long-poll: with `wait` > 0, the response is held until the job changes
+    after `since` (the `updated_at` you last saw) or finishes, for up to `wait` seconds.
+    """
+    if wait > 0:
+        job = await job_queue.wait_for_update(job_id, since, wait)
+    else:
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _to_exam_job(job)
+
+@router.get("/generate-test/events/{job_id}")
+async def stream_exam_job_events(job_id: str):
+    """
+    Server-Sent Events for an exam job: a "progress" event on every change
+    (retrieval, llm, pdf), then one final "complete", "error" or "cancelled" event.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def _events():
+        async for job in job_queue.watch(job_id, settings.JOB_WATCH_MAX_SECONDS):
+            event = job.status if job.status in FINISHED_STATUSES else "progress"
+            yield format_sse({"event": event, "data": _to_exam_job(job).model_dump()})
+
+    return StreamingResponse(_events(), media_type="text/event-stream")
+
+@router.delete("/generate-test/{job_id}", response_model=ExamJob)
+async def cancel_exam_job(job_id: str):
     """
-    job = exam_jobs.get(job_id)
+    Cancels a pending or running exam generation job.
+    """
+    job = await asyncio.to_thread(job_queue.cancel, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    return job
+    return _to_exam_job(job)
+
+def _open_guided_session(request: GuidedChatRequest) -> Conversation:
+    """
+    Returns the request's server-side session, starting one if it has no session_id.
+    """
+    if request.session_id:
+        conversation = conversation_store.get(request.session_id)
+        if conversation is None or conversation.user_id != request.user_id:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return conversation
+
+    conversation = conversation_store.create(request.user_id, request.topic)
+    history = [
+        {"role": m["role"], "content": m.get("content", "")}
+        for m in request.chat_history
+        if m.get("role") in ("user", "assistant")
+    ]
+    if history:
+        conversation_store.append(conversation.session_id, history)
+    return conversation
+
+def _guided_input(request: GuidedChatRequest, conversation: Conversation) -> Dict[str, Any]:
+    # recent turns verbatim + a rolling summary of the rest, so the prompt stays the same size
+    summary, recent = load_context(conversation.session_id)
+    return {
+        "user_id": request.user_id,
+        "topic": conversation.topic, # a session keeps the topic it was started with
+        "chat_history": recent,
+        "summary": summary,
+        "user_question": request.user_question
+    }
+
+def _record_turn(conversation: Conversation, question: str, answer: str):
+    conversation_store.append(conversation.session_id, [
+        {"role": "user", "content": question},
+        {"role": "assistant", "content": answer},
+    ])
 
 @router.post("/guided-chat", response_model=GuidedChatResponse)
 async def guided_chat_session(request: GuidedChatRequest):
     """
     Manages a stateful, Socratic guided chat session.
+    The history is kept server-side under the returned session_id.
     """
+    conversation = await asyncio.to_thread(_open_guided_session, request)
     try:
         # getting the runnable
         chain = get_tutor_runnable()
         
         # defining the input
-        input_data = {
-            "user_id": request.user_id,
-            "topic": request.topic,
-            "chat_history": request.chat_history,
-            "user_question": request.user_question
-        }
+        input_data = await asyncio.to_thread(_guided_input, request, conversation)
         
         #invoking the chain
-        ai_message = chain.invoke(input_data)
+        ai_message = await chain.ainvoke(input_data)
+        await asyncio.to_thread(_record_turn, conversation, request.user_question, ai_message)
         
-        return GuidedChatResponse(ai_message=ai_message)
+        return GuidedChatResponse(ai_message=ai_message, session_id=conversation.session_id)
     
     except Exception as e:
         raise HTTPException(500, f"Error in guided session: {str(e)}")
     
+@router.post("/guided-chat/stream")
+async def guided_chat_session_stream(request: GuidedChatRequest):
+    """
+    Streaming version of /guided-chat (Server-Sent Events).
+    Emits "session" (the session_id to send next time), "retrieval", "token"
+    and a final "done" event.
+    """
+    conversation = await asyncio.to_thread(_open_guided_session, request)
+    chain = get_tutor_runnable()
+    input_data = await asyncio.to_thread(_guided_input, request, conversation)
+    
+    async def _events():
+        yield {"event": "session", "data": {"session_id": conversation.session_id}}
+        async for event in astream_progress(chain, input_data):
+            if event["event"] == "done":
+                await asyncio.to_thread(_record_turn, conversation, request.user_question, event["data"]["text"])
+            yield event
+    
+    return StreamingResponse(sse_stream(_events()), media_type="text/event-stream")
+    
 @router.post("/generate-map", response_model=MapResponse)
 async def generate_concept_map(request: MapRequest):
     """
@@ -337,7 +697,7 @@ async def generate_concept_map(request: MapRequest):
         
         input_data = {"user_id": request.user_id}
         
-        dot_string = chain.invoke(input_data)
+        dot_string = await chain.ainvoke(input_data)
         
         if not dot_string.strip().startswith("digraph"):
             raise Exception("Failed to generate valid DOT string from LLM.")
@@ -354,19 +714,66 @@ async def generate_concept_map(request: MapRequest):
 async def process_youtube(request: YouTubeRequest):
     """
     Process a YouTube video (Transcript or Whisper) and add to vector DB.
+    Runs as a job; with background=true the job_id is returned right away.
     """
     try:
-        # process the video
-        split_docs = process_youtube_video(request.url)
-        
-        # adding to vector store
-        add_documents_to_store(split_docs, collection_name=request.user_id)
-        
-        return UploadResponse(
-            filename=request.url,
-            message="YouTube video processed and added to knowledge base.",
-            documents_added=len(split_docs)
+        job = await asyncio.to_thread(
+            job_queue.submit,
+            "youtube",
+            request.user_id,
+            {"url": request.url}
         )
-        
     except Exception as e:
-        raise HTTPException(500, f"Error processing YouTube video: {str(e)}")
\ No newline at end of file
+        raise HTTPException(500, f"Error processing YouTube video: {str(e)}")
+    
+    return await _upload_job_response(
+        job,
+        request.url,
+        "YouTube video processed and added to knowledge base.",
+        request.background
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(
+    job_id: str,
+    wait: float = Query(default=0, ge=0, le=60),
+    since: float = Query(default=0)
+):
+    """
+    Status of any job (transcription, YouTube, exam).
+    Supports the same long-poll parameters as /generate-test/status.
+    """
+    if wait > 0:
+        job = await job_queue.wait_for_update(job_id, since, wait)
+    else:
+        job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _to_job_status(job)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Server-Sent Events for any job: "progress" events, then one final
+    "complete", "error" or "cancelled" event.
+    """
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def _events():
+        async for job in job_queue.watch(job_id, settings.JOB_WATCH_MAX_SECONDS):
+            event = job.status if job.status in FINISHED_STATUSES else "progress"
+            yield format_sse({"event": event, "data": _to_job_status(job).model_dump()})
+
+    return StreamingResponse(_events(), media_type="text/event-stream")
+
+@router.delete("/jobs/{job_id}", response_model=JobStatus)
+async def cancel_job(job_id: str):
+    """
+    Cancels a pending or running job.
+    """
+    job = await asyncio.to_thread(job_queue.cancel, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _to_job_status(job)
@@ -1,7 +1,6 @@
 import streamlit as st
 import requests
 import json
-import time
 
 API_URL = "http://127.0.0.1:8000/v1/study"
 BASE_URL = "http://127.0.0.1:8000"
@@ -26,6 +25,34 @@ def handle_api_error(response):
     """Checks for HTTP errors and raises a detailed exception."""
     response.raise_for_status() # This will raise an HTTPError for 4xx/5xx
 
+def stream_sse(endpoint, payload):
+    """Posts to a streaming endpoint and yields (event, data) pairs as they arrive."""
+    with requests.post(f"{API_URL}{endpoint}", json=payload, stream=True) as response:
+        handle_api_error(response)
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):].strip())
+
+def stream_answer(endpoint, payload, progress):
+    """Yields answer tokens for st.write_stream, showing progress events in `progress`."""
+    for event, data in stream_sse(endpoint, payload):
+        if event == "router":
+            progress.caption(f"Routing: {data['decision']}")
+        elif event == "retrieval":
+            progress.caption(f"Found {data['documents']} relevant passages...")
+        elif event == "search":
+            progress.caption(f"Web search returned {data['results']} results...")
+        elif event == "session":
+            st.session_state.guided_session_id = data["session_id"]
+        elif event == "token":
+            progress.empty()
+            yield data["text"]
+        elif event == "error":
+            raise Exception(data.get("detail"))
+
 with st.sidebar:
     st.header("⚙️ Course Setup")
     user_id = st.text_input("User/Course ID", value="demo_course_101", help="Unique ID for your vector store")
@@ -106,28 +133,25 @@ with tabs[0]:
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"): st.markdown(prompt)
         with st.chat_message("assistant"):
-            with st.spinner("Agent is thinking..."):
-                try:
-                    payload = {"question": prompt, "user_id": user_id}
-                    response = requests.post(f"{API_URL}/chat", json=payload)
-                    handle_api_error(response)
-                    data = response.json()
-                    content = data.get("answer", data.get("quiz", "Sorry, I had a problem."))
-                    st.markdown(content)
-                    st.session_state.messages.append({"role": "assistant", "content": content})
-                except Exception as e: st.error(f"Error: {e}")
+            try:
+                payload = {"question": prompt, "user_id": user_id}
+                progress = st.empty()
+                progress.caption("Agent is thinking...")
+                content = st.write_stream(stream_answer("/chat/stream", payload, progress)) or "Sorry, I had a problem."
+                st.session_state.messages.append({"role": "assistant", "content": content})
+            except Exception as e: st.error(f"Error: {e}")
 
 with tabs[1]:
     st.subheader("Find Practice Problems on the Web")
     topic = st.text_input("Enter your topic", key="problem_topic")
     if st.button("Search for Problems", type="primary", key="search_problems"):
-        with st.spinner(f"Searching..."):
-            try:
-                payload = {"topic": topic, "user_id": user_id}
-                response = requests.post(f"{API_URL}/find-problems", json=payload)
-                handle_api_error(response)
-                st.markdown(response.json().get("results", "No results."))
-            except Exception as e: st.error(f"Error: {e}")
+        try:
+            payload = {"topic": topic, "user_id": user_id}
+            progress = st.empty()
+            progress.caption("Searching...")
+            if not st.write_stream(stream_answer("/find-problems/stream", payload, progress)):
+                st.markdown("No results.")
+        except Exception as e: st.error(f"Error: {e}")
 
 with tabs[2]:
     st.subheader("Generate a Practice Exam (PDF)")
@@ -138,14 +162,17 @@ with tabs[2]:
                 payload = {"user_id": user_id, "num_questions": num_q}
                 response = requests.post(f"{API_URL}/generate-test", json=payload)
                 handle_api_error(response)
-                job_id = response.json().get("job_id")
-                status = "running"
-                while status == "running" or status == "pending":
-                    time.sleep(5)
-                    status_response = requests.get(f"{API_URL}/generate-test/status/{job_id}")
-                    handle_api_error(status_response)
-                    job = status_response.json()
-                    status = job.get("status")
+                job = response.json()
+                job_id = job.get("job_id")
+                progress_bar = st.progress(0, text="Queued...")
+                # the server pushes every progress change, so no polling needed
+                with requests.get(f"{API_URL}/generate-test/events/{job_id}", stream=True) as events:
+                    handle_api_error(events)
+                    for line in events.iter_lines(decode_unicode=True):
+                        if line.startswith("data:"):
+                            job = json.loads(line[len("data:"):].strip())
+                            progress_bar.progress(int(job.get("progress", 0)), text=f"Stage: {job.get('stage') or job.get('status')}")
+                status = job.get("status")
                 if status == "complete":
                     st.success("✅ Exam Generated!")
                     full_download_url = f"{BASE_URL}{job.get('download_url')}"
@@ -158,6 +185,7 @@ with tabs[3]:
     st.subheader("👩‍🏫 AI-Guided Socratic Session")
     if "guided_messages" not in st.session_state: st.session_state.guided_messages = []
     if "guided_topic" not in st.session_state: st.session_state.guided_topic = None
+    if "guided_session_id" not in st.session_state: st.session_state.guided_session_id = None
     if st.session_state.guided_topic is None:
         topic = st.text_input("What topic do you want to master today?", key="guided_topic_input")
         if st.button("Start Guided Session", type="primary", key="start_guided"):
@@ -169,12 +197,26 @@ with tabs[3]:
         if st.query_params.get("end_session") == "true":
             st.session_state.guided_topic = None
             st.session_state.guided_messages = []
+            st.session_state.guided_session_id = None
             st.query_params.clear()
             st.rerun()
         for message in st.session_state.guided_messages:
             with st.chat_message(message["role"]): st.markdown(message["content"])
         if prompt := st.chat_input("Answer the tutor..."):
-            pass
+            with st.chat_message("user"): st.markdown(prompt)
+            with st.chat_message("assistant"):
+                try:
+                    payload = {
+                        "user_id": user_id,
+                        "topic": st.session_state.guided_topic,
+                        "session_id": st.session_state.guided_session_id, # the server keeps the history
+                        "user_question": prompt
+                    }
+                    progress = st.empty()
+                    content = st.write_stream(stream_answer("/guided-chat/stream", payload, progress))
+                    st.session_state.guided_messages.append({"role": "user", "content": prompt})
+                    st.session_state.guided_messages.append({"role": "assistant", "content": content})
+                except Exception as e: st.error(f"Error: {e}")
 
 with tabs[4]:
     st.subheader("🗺️ Concept Map Visualizer")
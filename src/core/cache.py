@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class LRUCache:
+    """
+    A small thread-safe LRU cache with an optional idle TTL and hit/miss counters.
+    Entries that haven't been touched for `ttl_seconds` are treated as missing.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None, on_evict: Optional[Callable] = None):
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.RLock()
+        # key -> [lock, waiters]: one factory call per key, outside the cache-wide lock
+        self._creating: Dict[Hashable, list] = {}
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, last_used: float) -> bool:
+        return self.ttl_seconds is not None and time.monotonic() - last_used > self.ttl_seconds
+
+    def _evict(self, key: Hashable):
+        value, _ = self._data.pop(key)
+        self.evictions += 1
+        if self._on_evict is not None:
+            self._on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return default
+
+            entry[1] = time.monotonic()
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            if key in self._data:
+                self._data.pop(key)
+            self._data[key] = [value, time.monotonic()]
+            while len(self._data) > self.max_size:
+                self._evict(next(iter(self._data)))
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value, or builds it with `factory()` and caches it.
+        Concurrent callers for the same key wait for one build; other keys
+        (hits and builds alike) aren't blocked by it.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            creating = self._creating.setdefault(key, [threading.Lock(), 0])
+            creating[1] += 1
+        try:
+            with creating[0]:
+                # built by another caller while we waited?
+                with self._lock:
+                    entry = self._data.get(key)
+                    if entry is not None and not self._expired(entry[1]):
+                        return entry[0]
+                value = factory()
+                self.put(key, value)
+                return value
+        finally:
+            with self._lock:
+                creating[1] -= 1
+                if not creating[1]:
+                    self._creating.pop(key, None)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def prune(self):
+        """
+        Drops every entry whose idle TTL has passed.
+        """
+        with self._lock:
+            for key in [k for k, (_, t) in self._data.items() if self._expired(t)]:
+                self._evict(key)
+
+    def values(self) -> list:
+        with self._lock:
+            return [value for value, _ in self._data.values()]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+_MISSING = object()
@@ -1,3 +1,4 @@
+from typing import List
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -13,7 +14,141 @@ class Settings(BaseSettings):
 
     GOOGLE_API_KEY: str
     TAVILY_API_KEY: str
-    PINECONE_API_KEY: str
+    PINECONE_API_KEY: str = "" # only needed with the pinecone backend
     PINECONE_INDEX_NAME: str = "sturdy-study"
 
+    # where local caches and stores are kept
+    DATA_DIR: str = "data"
+
+    # uploads (streamed to unique temp files, size-checked while streaming)
+    UPLOAD_DIR: str = "temp_uploads"
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+    MAX_PDF_UPLOAD_BYTES: int = 100 * 1024 * 1024
+    MAX_AUDIO_UPLOAD_BYTES: int = 1024 * 1024 * 1024
+    MAX_CONCURRENT_UPLOADS: int = 8 # per worker process
+    UPLOAD_SESSION_TTL_SECONDS: float = 24 * 3600 # unfinished resumable uploads
+
+    # models to load at startup instead of on first use, e.g. ["embeddings", "llm", "reranker"]
+    # (whisper is loaded inside the transcription worker processes, not here)
+    WARMUP_MODELS: List[str] = []
+    WARMUP_BLOCKING: bool = False
+
+    # worker pools for blocking / CPU-heavy work
+    # (whisper workers are processes, each with its own copy of the model)
+    WHISPER_POOL_WORKERS: int = 2
+    PDF_POOL_WORKERS: int = 2
+    PDF_PAGES_PER_TASK: int = 16 # pages parsed per PDF pool task
+    EMBEDDING_POOL_WORKERS: int = 2
+    RERANK_POOL_WORKERS: int = 1 # one cross-encoder; torch already uses several threads per call
+
+    # transcription: "whisper" or "faster-whisper" (CTranslate2, faster on CPU; optional dependency)
+    TRANSCRIPTION_BACKEND: str = "whisper"
+    WHISPER_MODEL_SIZE: str = "base"
+    TRANSCRIPTION_THREADS_PER_WORKER: int = 0 # 0 = split the cores evenly across workers
+    TRANSCRIPTION_SEGMENT_SECONDS: float = 60
+    TRANSCRIPTION_SPLIT_WINDOW_SECONDS: float = 10 # how far from the target we look for a pause
+
+    # vector storage: "pinecone", or "local" (memory-mapped files under DATA_DIR/vectors, for on-prem/offline use)
+    VECTOR_BACKEND: str = "pinecone"
+    LOCAL_HNSW_MIN_VECTORS: int = 20_000 # smaller namespaces are searched exactly; hnswlib is optional
+    LOCAL_HNSW_M: int = 16
+    LOCAL_HNSW_EF_SEARCH: int = 64
+    LOCAL_HNSW_SAVE_INTERVAL_SECONDS: float = 60
+
+    # pinecone connection pooling + per-namespace store cache
+    PINECONE_POOL_THREADS: int = 8
+    VECTOR_STORE_CACHE_SIZE: int = 256
+    VECTOR_STORE_CACHE_TTL_SECONDS: float = 900
+    NAMESPACE_SCAN_BATCH_SIZE: int = 100
+
+    # hybrid retrieval: dense (pinecone) + keyword (bm25) results, fused with reciprocal rank fusion
+    HYBRID_SEARCH_ENABLED: bool = True
+    RETRIEVER_K: int = 10 # chunks returned per query
+    HYBRID_CANDIDATES: int = 20 # fetched from each side before fusing
+    HYBRID_DENSE_WEIGHT: float = 1.0
+    HYBRID_KEYWORD_WEIGHT: float = 1.0
+    HYBRID_RRF_K: int = 60
+    KEYWORD_INDEX_MAX_NAMESPACES: int = 64 # kept in memory; the rest are reloaded from disk on use
+
+    # multi-query retrieval (quizzes, exams): a topic is expanded into sub-queries searched together
+    MULTI_QUERY_COUNT: int = 4 # sub-queries, on top of the original request
+    MULTI_QUERY_K: int = 8 # chunks per sub-query
+    MULTI_QUERY_LIMIT: int = 24 # chunks after merging
+    MULTI_QUERY_CONCURRENCY: int = 8
+    MULTI_QUERY_CACHE_SIZE: int = 512 # cached expansions
+
+    # optional cross-encoder reranking of retrieved chunks (on CPU)
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_MIN_CANDIDATES: int = 10
+    RERANK_MAX_CANDIDATES: int = 40 # retrieved per query; how many get scored adapts to the latency budget
+    RERANK_LATENCY_BUDGET_MS: float = 150
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_TOP_K: int = 6
+    RERANK_TOKEN_BUDGET: int = 3000 # kept chunks stop at this many (estimated) tokens
+
+    # exam generation: concurrent per-topic sections, validated and deduplicated
+    EXAM_QUESTIONS_PER_SECTION: int = 5
+    EXAM_SECTION_CONCURRENCY: int = 4
+    EXAM_SECTION_RETRIES: int = 2 # rounds of retrying only the failed sections
+    EXAM_DEDUP_THRESHOLD: float = 0.7 # estimated jaccard similarity of question texts
+
+    # question bank: questions pre-generated after ingest, sampled by quizzes and exams
+    QUESTION_BANK_ENABLED: bool = True
+    QUESTION_BANK_FILL_DELAY_SECONDS: float = 10
+    QUESTION_BANK_CHUNKS_PER_BATCH: int = 6 # passages per generation call
+    QUESTION_BANK_QUESTIONS_PER_BATCH: int = 4
+    QUESTION_BANK_MAX_QUESTIONS: int = 500 # per namespace
+    QUESTION_BANK_FILL_CONCURRENCY: int = 2
+    QUIZ_DEFAULT_QUESTIONS: int = 5 # when the quiz request doesn't say
+
+    # prompt context: near-duplicate chunks dropped, splitter overlap trimmed, packed to a token budget
+    CONTEXT_TOKEN_BUDGET: int = 6000
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8 # estimated jaccard similarity of word 5-grams
+
+    # ingest pipeline
+    EMBED_BATCH_SIZE: int = 64
+    UPSERT_CONCURRENCY: int = 4
+    UPSERT_MAX_RETRIES: int = 3
+    UPSERT_RETRY_BASE_DELAY: float = 0.5
+    STREAM_INGEST_BATCH_CHUNKS: int = 16 # transcripts are upserted in batches of this many chunks
+
+    # on-disk embedding cache
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500_000
+    EMBEDDING_CACHE_TOUCH_INTERVAL: float = 3600 # seconds; a hit refreshes last_used at most this often
+
+    # content-addressed cache of parsed/transcribed inputs (chunks + embeddings)
+    ARTIFACT_CACHE_ENABLED: bool = True
+    ARTIFACT_CACHE_MAX_ENTRIES: int = 2000
+
+    # semantic answer cache for /chat rag answers, per namespace
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95 # cosine similarity between questions
+    ANSWER_CACHE_TTL_SECONDS: float = 3600
+    ANSWER_CACHE_MAX_ENTRIES: int = 256
+    ANSWER_CACHE_MAX_NAMESPACES: int = 1024
+
+    # server-side guided-chat sessions
+    CONVERSATION_WINDOW_TOKENS: int = 2000 # recent turns sent verbatim; older ones are summarized
+    CONVERSATION_SUMMARY_MAX_WORDS: int = 250
+    CONVERSATION_TTL_SECONDS: float = 7 * 24 * 3600 # idle sessions are deleted
+
+    # map-reduce over whole courses (prioritize, map, exam)
+    DIRECT_CONTEXT_TOKENS: int = 30_000
+    MAP_REDUCE_BATCH_TOKENS: int = 12_000
+    MAP_REDUCE_MAX_CONCURRENCY: int = 4
+
+    # course digests (seconds to wait after an upload before summarizing)
+    DIGEST_REFRESH_DELAY_SECONDS: float = 5
+
+    # persistent job queue (exam generation, ...)
+    JOB_WORKERS: int = 2
+    JOB_PER_USER_LIMIT: int = 1 # running jobs per user, for each job kind
+    JOB_RESULT_TTL_SECONDS: float = 24 * 3600
+    JOB_STALE_SECONDS: float = 120
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_WATCH_POLL_SECONDS: float = 0.5
+    JOB_WATCH_MAX_SECONDS: float = 1800
+
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from src.core.config import settings
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    """
+    Runs inside the worker (thread or process) and reports when it started.
+    Kept at module level so it can be pickled for process pools.
+    """
+    started_at = time.time()
+    return started_at, fn(*args, **kwargs)
+
+class BoundedPool:
+    """
+    A fixed-size thread or process pool that keeps queue and wait-time stats.
+    Heavy CPU work (Whisper, PDF parsing, embedding) goes through one of these
+    so it never runs on the event loop and never starves the other pools.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+        # stats
+        self._outstanding = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _get_executor(self):
+        # creating the executor lazily so idle pools cost nothing
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn, not fork: the parent has live threads (and maybe torch) by now
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"pool-{self.name}"
+                    )
+            return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Submits work to the pool and returns a concurrent Future with the result.
+        """
+        executor = self._get_executor()
+        submitted_at = time.time()
+
+        with self._lock:
+            self._outstanding += 1
+            self._submitted += 1
+
+        outer: Future = Future()
+        inner = executor.submit(_timed_call, fn, args, kwargs)
+
+        def _on_done(f: Future):
+            error = f.exception()
+            with self._lock:
+                self._outstanding -= 1
+                if error is None:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+
+            if error is not None:
+                outer.set_exception(error)
+                return
+
+            started_at, result = f.result()
+            wait = max(0.0, started_at - submitted_at)
+            with self._lock:
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+            outer.set_result(result)
+
+        inner.add_done_callback(_on_done)
+        return outer
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Awaitable version of submit() for use inside async endpoints.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "running": min(self._outstanding, self.max_workers),
+                "queue_depth": max(0, self._outstanding - self.max_workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(1000 * self._total_wait / finished, 2) if finished else 0.0,
+                "max_wait_ms": round(1000 * self._max_wait, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# the shared pools, sized separately so one kind of work can't starve another
+_pools: Dict[str, BoundedPool] = {
+    "whisper": BoundedPool("whisper", "process", settings.WHISPER_POOL_WORKERS),
+    "pdf": BoundedPool("pdf", "process", settings.PDF_POOL_WORKERS),
+    "embedding": BoundedPool("embedding", "thread", settings.EMBEDDING_POOL_WORKERS),
+    "rerank": BoundedPool("rerank", "thread", settings.RERANK_POOL_WORKERS),
+}
+
+def get_pool(name: str) -> BoundedPool:
+    return _pools[name]
+
+async def run_in_pool(name: str, fn: Callable, *args, **kwargs) -> Any:
+    """
+    Runs a blocking function in the named pool without blocking the event loop.
+    """
+    return await _pools[name].run(fn, *args, **kwargs)
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: pool.stats() for name, pool in _pools.items()}
+
+def shutdown_pools():
+    for pool in _pools.values():
+        pool.shutdown()
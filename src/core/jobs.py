@@ -0,0 +1,407 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from pydantic import BaseModel
+from src.core.config import settings
+
+# job statuses
+PENDING = "pending"
+RUNNING = "running"
+COMPLETE = "complete"
+ERROR = "error"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETE, ERROR, CANCELLED)
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job handler when the job has been cancelled.
+    """
+
+class Job(BaseModel):
+    job_id: str
+    kind: str
+    user_id: str
+    status: str = PENDING
+    priority: int = 0
+    progress: float = 0.0 # percentage, 0-100
+    stage: str | None = None
+    payload: Dict[str, Any] = {}
+    result: Dict[str, Any] | None = None
+    error: str | None = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+# handler(job, report_progress) -> result dict
+# report_progress(percent, stage) also raises JobCancelled if the job was cancelled
+ProgressCallback = Callable[[float, Optional[str]], None]
+JobHandler = Callable[[Job, ProgressCallback], Dict[str, Any]]
+# discard_handler(job): cleans up after a job that will never run (cancelled while pending)
+DiscardHandler = Callable[[Job], None]
+
+class JobQueue:
+    """
+    A persistent job queue backed by SQLite, shared by every uvicorn worker.
+    Each process runs a few worker threads that claim pending jobs by
+    priority, respecting a cap on running jobs per user and job kind
+    (so a long exam doesn't hold up the same user's uploads).
+    """
+
+    def __init__(self, path: str, workers: int, per_user_limit: int, result_ttl: float):
+        self.path = path
+        self.workers = max(1, workers)
+        self.per_user_limit = max(1, per_user_limit)
+        self.result_ttl = result_ttl
+        self._handlers: Dict[str, JobHandler] = {}
+        self._discard_handlers: Dict[str, DiscardHandler] = {}
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._local = threading.local()
+
+        # async waiters in this process, woken as soon as a job changes here
+        self._watchers: Dict[str, List[tuple]] = {}
+        self._watchers_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                progress REAL NOT NULL DEFAULT 0,
+                stage TEXT,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                heartbeat_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority DESC, created_at);
+            """
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # one connection per thread; sqlite handles locking between processes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row["job_id"],
+            kind=row["kind"],
+            user_id=row["user_id"],
+            status=row["status"],
+            priority=row["priority"],
+            progress=row["progress"],
+            stage=row["stage"],
+            payload=json.loads(row["payload"]),
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+    # public api
+
+    def register_handler(self, kind: str, handler: JobHandler, on_discard: Optional[DiscardHandler] = None):
+        """
+        `on_discard` runs instead of the handler when a job is cancelled before it starts
+        (e.g. to delete the uploaded file the handler would have cleaned up).
+        """
+        self._handlers[kind] = handler
+        if on_discard is not None:
+            self._discard_handlers[kind] = on_discard
+
+    def submit(self, kind: str, user_id: str, payload: Dict[str, Any], priority: int = 0) -> Job:
+        """
+        Adds a job to the queue and returns it (status "pending").
+        """
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, kind, user_id, status, priority, payload, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, user_id, PENDING, priority, json.dumps(payload), now, now)
+        )
+        self._wakeup.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Cancels a pending or running job. Running jobs stop at their next progress report;
+        pending ones never start, so their discard handler runs here.
+        """
+        conn = self._conn()
+        now = time.time()
+        discarded = conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+            (CANCELLED, now, job_id, PENDING)
+        ).rowcount
+        if not discarded:
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, now, job_id, RUNNING)
+            )
+        self._notify(job_id)
+        job = self.get(job_id)
+        if discarded and job is not None:
+            self._discard(job)
+        return job
+
+    def _discard(self, job: Job):
+        handler = self._discard_handlers.get(job.kind)
+        if handler is None:
+            return
+        try:
+            handler(job)
+        except Exception as e:
+            print(f"[Jobs] Discard handler failed for {job.kind} job {job.job_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {
+            "workers": self.workers,
+            "per_user_limit": self.per_user_limit,
+            "jobs": {status: count for status, count in rows},
+        }
+
+    # waiting for changes (long-poll / server push)
+
+    def _subscribe(self, job_id: str) -> asyncio.Event:
+        event = asyncio.Event()
+        with self._watchers_lock:
+            self._watchers.setdefault(job_id, []).append((asyncio.get_running_loop(), event))
+        return event
+
+    def _unsubscribe(self, job_id: str, event: asyncio.Event):
+        with self._watchers_lock:
+            watchers = [w for w in self._watchers.get(job_id, []) if w[1] is not event]
+            if watchers:
+                self._watchers[job_id] = watchers
+            else:
+                self._watchers.pop(job_id, None)
+
+    def _notify(self, job_id: str):
+        with self._watchers_lock:
+            watchers = list(self._watchers.get(job_id, []))
+        for loop, event in watchers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # the waiter's event loop is already closed
+                pass
+
+    async def wait_for_update(self, job_id: str, since: float, timeout: float) -> Optional[Job]:
+        """
+        Returns the job as soon as it has changed after `since` (its updated_at)
+        or is finished, or when `timeout` seconds have passed.
+        Updates from this process wake us instantly; updates made by other
+        workers are picked up by polling.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            event = self._subscribe(job_id)
+            try:
+                job = await asyncio.to_thread(self.get, job_id)
+                if job is None or job.status in FINISHED_STATUSES or job.updated_at > since:
+                    return job
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return job
+                try:
+                    await asyncio.wait_for(event.wait(), min(remaining, settings.JOB_WATCH_POLL_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                self._unsubscribe(job_id, event)
+
+    async def watch(self, job_id: str, timeout: float) -> AsyncIterator[Job]:
+        """
+        Yields the job every time it changes, until it finishes or `timeout` passes.
+        """
+        deadline = time.monotonic() + timeout
+        since = -1.0
+        while time.monotonic() < deadline:
+            job = await self.wait_for_update(job_id, since, deadline - time.monotonic())
+            if job is None:
+                return
+            if job.updated_at > since:
+                since = job.updated_at
+                yield job
+            if job.status in FINISHED_STATUSES:
+                return
+
+    async def wait_until_finished(self, job_id: str, timeout: float) -> Optional[Job]:
+        """
+        Waits for a job to finish and returns it (or its latest state on timeout).
+        """
+        last = None
+        async for job in self.watch(job_id, timeout):
+            last = job
+        return last
+
+    # worker side
+
+    def _claim(self) -> Optional[Job]:
+        """
+        Atomically picks the highest-priority pending job whose user is under the cap for its kind.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT * FROM jobs j WHERE j.status = ? AND ("
+                " SELECT COUNT(*) FROM jobs r WHERE r.user_id = j.user_id AND r.kind = j.kind AND r.status = ?"
+                ") < ? ORDER BY j.priority DESC, j.created_at ASC LIMIT 1",
+                (PENDING, RUNNING, self.per_user_limit)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, heartbeat_at = ? WHERE job_id = ?",
+                (RUNNING, now, now, row["job_id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._notify(row["job_id"])
+        return self.get(row["job_id"])
+
+    def _report_progress(self, job_id: str, progress: float, stage: Optional[str]):
+        conn = self._conn()
+        now = time.time()
+        conn.execute(
+            "UPDATE jobs SET progress = ?, stage = COALESCE(?, stage), updated_at = ?, heartbeat_at = ? "
+            "WHERE job_id = ? AND status = ?",
+            (max(0.0, min(100.0, progress)), stage, now, now, job_id, RUNNING)
+        )
+        self._notify(job_id)
+        status = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if status is None or status["status"] == CANCELLED:
+            raise JobCancelled(job_id)
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        progress = 100.0 if status == COMPLETE else None
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, progress = COALESCE(?, progress), updated_at = ? "
+            "WHERE job_id = ? AND status = ?",
+            (status, json.dumps(result) if result is not None else None, error, progress,
+             time.time(), job_id, RUNNING)
+        )
+        self._notify(job_id)
+
+    def _run_job(self, job: Job):
+        handler = self._handlers.get(job.kind)
+        if handler is None:
+            self._finish(job.job_id, ERROR, error=f"No handler for job kind '{job.kind}'")
+            return
+
+        print(f"[Jobs] Running {job.kind} job {job.job_id} for {job.user_id}...")
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job.job_id, done), daemon=True)
+        heartbeat.start()
+        try:
+            result = handler(job, lambda progress, stage=None: self._report_progress(job.job_id, progress, stage))
+            self._finish(job.job_id, COMPLETE, result=result or {})
+            print(f"[Jobs] Job {job.job_id} complete.")
+        except JobCancelled:
+            print(f"[Jobs] Job {job.job_id} cancelled.")
+        except Exception as e:
+            traceback.print_exc()
+            self._finish(job.job_id, ERROR, error=str(e))
+        finally:
+            done.set()
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        # keeps long steps (e.g. one big LLM call) from looking like a dead worker
+        while not done.wait(settings.JOB_STALE_SECONDS / 3):
+            self._conn().execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = ?",
+                (time.time(), job_id, RUNNING)
+            )
+
+    def _cleanup(self):
+        """
+        Deletes finished jobs past their result TTL, and requeues running
+        jobs whose worker stopped sending heartbeats (e.g. it was restarted).
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED_STATUSES))}) AND updated_at < ?",
+            (*FINISHED_STATUSES, now - self.result_ttl)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND heartbeat_at < ?",
+            (PENDING, now, RUNNING, now - settings.JOB_STALE_SECONDS)
+        )
+
+    def _worker_loop(self):
+        last_cleanup = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.time() - last_cleanup > 60:
+                    self._cleanup()
+                    last_cleanup = time.time()
+
+                job = self._claim()
+                if job is None:
+                    # other processes may add jobs too, so we also poll
+                    self._wakeup.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+                    self._wakeup.clear()
+                    continue
+                self._run_job(job)
+            except Exception as e:
+                print(f"[Jobs] Worker error: {e}")
+                time.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[Jobs] Started {self.workers} job workers.")
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        self._threads = []
+
+job_queue = JobQueue(
+    path=os.path.join(settings.DATA_DIR, "jobs.sqlite"),
+    workers=settings.JOB_WORKERS,
+    per_user_limit=settings.JOB_PER_USER_LIMIT,
+    result_ttl=settings.JOB_RESULT_TTL_SECONDS
+)
+
+def get_job_queue() -> JobQueue:
+    return job_queue
@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Callable, Dict, Generic, List, TypeVar
+
+T = TypeVar("T")
+
+# how long each provider took to load, in load order (for the startup report)
+_load_times: Dict[str, float] = {}
+_startup_steps: Dict[str, float] = {}
+_registry: Dict[str, "LazyProvider"] = {}
+
+class LazyProvider(Generic[T]):
+    """
+    Builds an expensive object (a model, a client, a compiled chain) on first use.
+    Thread-safe: concurrent first calls wait for a single load.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    self._value = self._factory()
+                    _load_times[self.name] = round(time.perf_counter() - start, 3)
+                    self._loaded = True
+                    print(f"[Startup] Loaded '{self.name}' in {_load_times[self.name]}s")
+        return self._value
+
+def record_startup_step(name: str, seconds: float):
+    """
+    Records how long a startup step took (imports, app setup, ...).
+    """
+    _startup_steps[name] = round(seconds, 3)
+
+def warm_up(names: List[str]):
+    """
+    Loads the named providers now instead of on first use.
+    """
+    for name in names:
+        provider = _registry.get(name)
+        if provider is None:
+            print(f"[Startup] Unknown provider '{name}', skipping warm-up.")
+            continue
+        try:
+            provider.get()
+        except Exception as e:
+            print(f"[Startup] Warm-up of '{name}' failed: {e}")
+
+def get_startup_report() -> dict:
+    return {
+        "steps": dict(_startup_steps),
+        "loaded": dict(_load_times),
+        "not_loaded": sorted(name for name, p in _registry.items() if not p.loaded),
+    }
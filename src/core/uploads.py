@@ -0,0 +1,258 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import AsyncIterator, Dict, Optional, Tuple
+from pydantic import BaseModel
+from src.core.config import settings
+
+class UploadTooLarge(Exception):
+    """
+    Raised while streaming an upload once it goes past its size limit.
+    """
+
+class UploadOffsetMismatch(Exception):
+    """
+    Raised when a resumable upload chunk doesn't start where the file ends.
+    """
+
+class SavedUpload(BaseModel):
+    path: str # unique temp file, owned by whoever processes it
+    filename: str # the client's original filename
+    size: int
+    sha256: str
+
+def max_upload_bytes(kind: str) -> int:
+    return settings.MAX_AUDIO_UPLOAD_BYTES if kind == "audio" else settings.MAX_PDF_UPLOAD_BYTES
+
+def _temp_path(filename: str) -> str:
+    # unique per request, so concurrent uploads of "notes.pdf" can't clobber each other
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    _, ext = os.path.splitext(filename or "")
+    fd, path = tempfile.mkstemp(suffix=ext, dir=settings.UPLOAD_DIR)
+    os.close(fd)
+    return path
+
+def _hash_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(settings.UPLOAD_CHUNK_BYTES), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+async def _write_stream(
+    chunks: AsyncIterator[bytes],
+    path: str,
+    mode: str,
+    hasher,
+    start_size: int,
+    max_bytes: int
+) -> int:
+    """
+    Appends the stream to `path`, hashing as it goes. Returns the new size.
+    """
+    size = start_size
+    with open(path, mode) as f:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload is larger than the {max_bytes // (1024 * 1024)} MB limit.")
+            if hasher is not None:
+                hasher.update(chunk)
+            await asyncio.to_thread(f.write, chunk)
+    return size
+
+async def iter_upload_file(file) -> AsyncIterator[bytes]:
+    """
+    Reads a FastAPI UploadFile in UPLOAD_CHUNK_BYTES pieces.
+    """
+    while True:
+        chunk = await file.read(settings.UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+async def save_upload_stream(chunks: AsyncIterator[bytes], filename: str, max_bytes: int) -> SavedUpload:
+    """
+    Streams an upload to a unique temp file, enforcing `max_bytes` as it goes
+    and computing the SHA-256 during the write (so dedupe needs no second read).
+    """
+    path = _temp_path(filename)
+    hasher = hashlib.sha256()
+    try:
+        size = await _write_stream(chunks, path, "wb", hasher, 0, max_bytes)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SavedUpload(path=path, filename=filename, size=size, sha256=hasher.hexdigest())
+
+class UploadSession(BaseModel):
+    upload_id: str
+    user_id: str
+    filename: str
+    kind: str # "pdf" or "audio"
+    path: str
+    offset: int = 0 # bytes received so far
+    total_size: int | None = None # if the client announced it
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+class UploadSessionStore:
+    """
+    Resumable uploads: a session is created, then the file is appended in
+    sequential chunks (each one checked against the current offset), then
+    completed. Sessions live in SQLite, so any worker can take the next chunk.
+    The running SHA-256 is kept in memory by the worker that received the
+    previous chunk; if a chunk lands elsewhere, the file is hashed on completion.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " upload_id TEXT PRIMARY KEY,"
+            " user_id TEXT NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " offset INTEGER NOT NULL DEFAULT 0,"
+            " total_size INTEGER,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, user_id: str, filename: str, kind: str, total_size: Optional[int] = None) -> UploadSession:
+        self.cleanup()
+        if total_size is not None and total_size > max_upload_bytes(kind):
+            raise UploadTooLarge(f"Upload is larger than the {max_upload_bytes(kind) // (1024 * 1024)} MB limit.")
+
+        now = time.time()
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            user_id=user_id,
+            filename=filename,
+            kind=kind,
+            path=_temp_path(filename),
+            total_size=total_size,
+            created_at=now,
+            updated_at=now
+        )
+        self._conn().execute(
+            "INSERT INTO uploads (upload_id, user_id, filename, kind, path, offset, total_size, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)",
+            (session.upload_id, user_id, filename, kind, session.path, total_size, now, now)
+        )
+        self._hashers[session.upload_id] = (0, hashlib.sha256())
+        return session
+
+    def get(self, upload_id: str) -> Optional[UploadSession]:
+        row = self._conn().execute("SELECT * FROM uploads WHERE upload_id = ?", (upload_id,)).fetchone()
+        return UploadSession(**dict(row)) if row else None
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Optional[UploadSession]:
+        """
+        Appends one chunk of the file. `offset` must equal the bytes received so far.
+        """
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            session = await asyncio.to_thread(self.get, upload_id)
+            if session is None:
+                return None
+            if offset != session.offset:
+                raise UploadOffsetMismatch(f"Expected offset {session.offset}, got {offset}.")
+
+            # only keeping the running hash if it covers exactly what's on disk
+            hashed = self._hashers.pop(upload_id, None)
+            hasher = hashed[1] if hashed and hashed[0] == session.offset else None
+
+            limit = max_upload_bytes(session.kind)
+            if session.total_size is not None:
+                limit = min(limit, session.total_size)
+            try:
+                size = await _write_stream(chunks, session.path, "ab", hasher, session.offset, limit)
+            except BaseException:
+                # dropping the partial chunk so the client can retry from the same offset
+                with open(session.path, "ab") as f:
+                    f.truncate(session.offset)
+                raise
+
+            if hasher is not None:
+                self._hashers[upload_id] = (size, hasher)
+            session.offset = size
+            session.updated_at = time.time()
+            await asyncio.to_thread(self._save_offset, upload_id, size, session.updated_at)
+            return session
+
+    def _save_offset(self, upload_id: str, offset: int, updated_at: float):
+        self._conn().execute(
+            "UPDATE uploads SET offset = ?, updated_at = ? WHERE upload_id = ?",
+            (offset, updated_at, upload_id)
+        )
+
+    def complete(self, upload_id: str) -> Optional[SavedUpload]:
+        """
+        Closes the session and hands the file over (the caller now owns it).
+        """
+        session = self.get(upload_id)
+        if session is None:
+            return None
+        if session.total_size is not None and session.offset != session.total_size:
+            raise UploadOffsetMismatch(f"Upload incomplete: {session.offset} of {session.total_size} bytes received.")
+
+        hashed = self._hashers.pop(upload_id, None)
+        if hashed and hashed[0] == session.offset:
+            sha256 = hashed[1].hexdigest()
+        else:
+            sha256 = _hash_file(session.path)
+
+        self._conn().execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+        self._locks.pop(upload_id, None)
+        return SavedUpload(path=session.path, filename=session.filename, size=session.offset, sha256=sha256)
+
+    def abort(self, upload_id: str) -> bool:
+        session = self.get(upload_id)
+        if session is None:
+            return False
+        self._conn().execute("DELETE FROM uploads WHERE upload_id = ?", (upload_id,))
+        self._hashers.pop(upload_id, None)
+        self._locks.pop(upload_id, None)
+        if os.path.exists(session.path):
+            os.remove(session.path)
+        return True
+
+    def cleanup(self):
+        """
+        Drops sessions (and their partial files) that haven't been touched in ttl_seconds.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        rows = self._conn().execute(
+            "SELECT upload_id FROM uploads WHERE updated_at < ?", (cutoff,)
+        ).fetchall()
+        for row in rows:
+            self.abort(row["upload_id"])
+
+upload_sessions = UploadSessionStore(
+    path=os.path.join(settings.DATA_DIR, "uploads.sqlite"),
+    ttl_seconds=settings.UPLOAD_SESSION_TTL_SECONDS
+)
@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+import time
+_import_start = time.perf_counter()
+
+import threading
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from src.core.config import settings
 import os
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware # <--- NEW IMPORT
 from src.api.v1.endpoints import study 
+from src.api.v1.endpoints import metrics
+from src.core.executors import shutdown_pools
+from src.core.jobs import job_queue
+from src.core.lazy import record_startup_step, warm_up
+from src.core.uploads import max_upload_bytes
+
+record_startup_step("imports", time.perf_counter() - _import_start)
 
 app = FastAPI(
     title="Student SaaS AI Agent",
@@ -24,6 +36,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# multipart uploads are parsed (and spooled) before the endpoint runs, so the size
+# limit is enforced here: obviously oversized ones are turned away from the
+# Content-Length alone, and bodies without one (chunked) are counted as they arrive
+_UPLOAD_KINDS = {"/v1/study/upload": "pdf", "/v1/study/upload-audio": "audio"}
+_MULTIPART_OVERHEAD = 1024 * 1024
+
+def _too_large(kind: str) -> str:
+    return f"Upload is larger than the {max_upload_bytes(kind) // (1024 * 1024)} MB limit."
+
+class UploadSizeLimitMiddleware:
+    """
+    Caps the request body of the multipart upload endpoints.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        kind = _UPLOAD_KINDS.get(scope.get("path")) if scope["type"] == "http" else None
+        if kind is None:
+            return await self.app(scope, receive, send)
+
+        limit = max_upload_bytes(kind) + _MULTIPART_OVERHEAD
+        length = dict(scope.get("headers") or []).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": _too_large(kind)})
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # raised inside body parsing, so FastAPI turns it into the response
+                    raise HTTPException(status_code=413, detail=_too_large(kind))
+            return message
+
+        await self.app(scope, counted_receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
 static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
 if not os.path.exists(static_dir):
     os.makedirs(static_dir)
@@ -33,6 +89,25 @@ if not os.path.exists(os.path.join(static_dir, "exams")):
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 app.include_router(study.router, prefix="/v1/study", tags=["Study API"])
+app.include_router(metrics.router, prefix="/v1/metrics", tags=["Metrics"])
+
+@app.on_event("startup")
+async def startup():
+    job_queue.start()
+
+    # optional warm-up, so the first request doesn't pay for model loading
+    if settings.WARMUP_MODELS:
+        if settings.WARMUP_BLOCKING:
+            warm_start = time.perf_counter()
+            warm_up(settings.WARMUP_MODELS)
+            record_startup_step("warm_up", time.perf_counter() - warm_start)
+        else:
+            threading.Thread(target=warm_up, args=(settings.WARMUP_MODELS,), daemon=True).start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    job_queue.stop()
+    shutdown_pools()
 
 @app.get("/", tags=["Health Check"])
 async def root():
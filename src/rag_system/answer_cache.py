@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Union
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableBranch, RunnableLambda, RunnablePassthrough
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.rag_system.hashing import content_hash, chunk_id
+from src.rag_system.vector_store import embeddings, register_namespace_listener
+from src.rag_system.streaming import CACHED_ANSWER_NAME
+
+class _NamespaceAnswers:
+    """
+    One namespace's cached answers: an LRU of (kind, fingerprint, vector, answer).
+    Vectors are normalized, so similarity is a dot product.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._next_id = 0
+
+    def find(self, kind: str, fingerprint: str, vector: np.ndarray, threshold: float, ttl: float) -> Optional[str]:
+        now = time.time()
+        best_id, best_score = None, threshold
+        for entry_id, (e_kind, e_fingerprint, e_vector, answer, created_at) in list(self.entries.items()):
+            if now - created_at > ttl:
+                del self.entries[entry_id]
+                continue
+            if e_kind != kind or e_fingerprint != fingerprint:
+                continue
+            score = float(np.dot(vector, e_vector))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            return None
+        self.entries.move_to_end(best_id)
+        return self.entries[best_id][3]
+
+    def add(self, kind: str, fingerprint: str, vector: np.ndarray, answer: str):
+        self.entries[self._next_id] = (kind, fingerprint, vector, answer, time.time())
+        self._next_id += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+class SemanticAnswerCache:
+    """
+    Per-namespace cache of generated RAG answers.
+    A question hits when a previous one in the same namespace:
+    - is the same kind of request,
+    - retrieved exactly the same chunks (so the answer was grounded in the same context),
+    - and has a question embedding with cosine similarity >= `threshold`.
+    Entries expire after `ttl_seconds`; each namespace keeps its `max_entries`
+    most recently used answers. Namespaces are dropped when their documents change.
+    The cache is per process; the chunk fingerprint and TTL keep other workers'
+    caches from serving answers built on outdated retrieval results.
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int, max_namespaces: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._namespaces = LRUCache(max_size=max_namespaces)
+        self._lock = threading.Lock()
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def lookup(self, namespace: str, kind: str, vector: np.ndarray, fingerprint: str) -> Optional[str]:
+        with self._lock:
+            answers = self._namespaces.get(namespace)
+            answer = None
+            if answers is not None:
+                answer = answers.find(kind, fingerprint, vector, self.threshold, self.ttl_seconds)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def store(self, namespace: str, kind: str, vector: np.ndarray, fingerprint: str, answer: str):
+        with self._lock:
+            answers = self._namespaces.get_or_create(namespace, lambda: _NamespaceAnswers(self.max_entries))
+            answers.add(kind, fingerprint, vector, answer)
+
+    def invalidate(self, namespace: str):
+        with self._lock:
+            if self._namespaces.pop(namespace) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespaces": len(self._namespaces),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    max_namespaces=settings.ANSWER_CACHE_MAX_NAMESPACES
+)
+
+# new or deleted documents change what the right answer is
+register_namespace_listener(lambda event, namespace, docs: answer_cache.invalidate(namespace))
+
+def _normalize(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def retrieval_fingerprint(docs: List[Document]) -> str:
+    """
+    Order-independent fingerprint of the retrieved chunk IDs.
+    """
+    return content_hash("|".join(sorted(doc.id or chunk_id(doc) for doc in docs)))
+
+def create_cached_answer_chain(
+    kind: Union[str, Callable[[str], str]],
+    retriever,
+    namespace: Optional[str],
+    generate: Runnable,
+    format_context: Callable[[List[Document]], str]
+) -> Runnable:
+    """
+    Wraps `generate` ({"context", "question"} -> text) with retrieval and the
+    semantic answer cache. On a hit the cached text is returned without an LLM
+    call; on a miss `generate` runs as usual (so its tokens still stream) and
+    the answer is stored. With no namespace, or the cache disabled, it's plain RAG.
+    `kind` can be a function of the question, for requests whose answers differ
+    in ways the embedding can't tell apart (e.g. a quiz's question count).
+    """
+    use_cache = namespace is not None and settings.ANSWER_CACHE_ENABLED
+    kind_of = kind if callable(kind) else (lambda question: kind)
+
+    def _lookup(x: dict, docs: List[Document], vector) -> dict:
+        fingerprint = retrieval_fingerprint(docs)
+        vector = _normalize(vector)
+        kind_key = kind_of(x["question"])
+        return {
+            "question": x["question"],
+            "context": format_context(docs),
+            "vector": vector,
+            "fingerprint": fingerprint,
+            "kind": kind_key,
+            "cached": answer_cache.lookup(namespace, kind_key, vector, fingerprint),
+        }
+
+    def _prepare(x: dict, config) -> dict:
+        docs = retriever.invoke(x["question"], config=config)
+        if not use_cache:
+            return {"question": x["question"], "context": format_context(docs), "cached": None}
+        # the retriever just embedded the question, so this is an embedding-cache hit
+        return _lookup(x, docs, embeddings.embed_query(x["question"]))
+
+    async def _aprepare(x: dict, config) -> dict:
+        docs = await retriever.ainvoke(x["question"], config=config)
+        if not use_cache:
+            return {"question": x["question"], "context": format_context(docs), "cached": None}
+        vector = await asyncio.to_thread(embeddings.embed_query, x["question"])
+        return _lookup(x, docs, vector)
+
+    def _store(x: dict) -> str:
+        if use_cache and x["answer"]:
+            answer_cache.store(namespace, x["kind"], x["vector"], x["fingerprint"], x["answer"])
+        return x["answer"]
+
+    generate_and_store = (
+        RunnablePassthrough.assign(answer=generate | StrOutputParser())
+        | RunnableLambda(_store, name="store_answer")
+    )
+
+    return RunnableLambda(_prepare, afunc=_aprepare, name="retrieve") | RunnableBranch(
+        (lambda x: x["cached"] is not None, RunnableLambda(lambda x: x["cached"], name=CACHED_ANSWER_NAME)),
+        generate_and_store
+    )
+
+def get_answer_cache_stats() -> dict:
+    if not settings.ANSWER_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
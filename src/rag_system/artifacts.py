@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from src.core.config import settings
+from src.rag_system.hashing import content_hash, chunk_id
+from src.rag_system.ingest import IngestReport
+from src.rag_system.models import EMBEDDING_MODEL_NAME
+from src.rag_system.vector_store import add_documents_to_store, add_document_stream, embeddings
+
+# bump when chunking changes, so old artifacts stop matching
+ARTIFACT_FORMAT_VERSION = 1
+
+class ArtifactStore:
+    """
+    Content-addressed cache of processed inputs (keyed by file SHA-256 or YouTube
+    video ID): the split chunks plus their embeddings, so ingesting the same
+    input again, into any namespace, skips parsing, Whisper and embedding.
+    Each artifact is a .json (chunks) + .npy (vectors) pair; the .json is written
+    last, so a half-written artifact is never read. Least recently used
+    artifacts are evicted past `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _files(self, key: str) -> Tuple[str, str]:
+        name = content_hash(key)
+        return os.path.join(self.path, f"{name}.json"), os.path.join(self.path, f"{name}.npy")
+
+    def get(self, key: str) -> Optional[Tuple[List[Document], Dict[str, List[float]]]]:
+        """
+        Returns (chunks, vectors by chunk ID), or None on a miss.
+        """
+        json_path, npy_path = self._files(key)
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            matrix = np.load(npy_path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if data.get("version") != ARTIFACT_FORMAT_VERSION or data.get("key") != key:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        docs = [Document(page_content=c["text"], metadata=c["metadata"]) for c in data["chunks"]]
+        vectors = {}
+        # vectors are only reusable with the model that made them
+        if data.get("model") == EMBEDDING_MODEL_NAME and len(matrix) == len(docs):
+            vectors = {chunk_id(doc): row.tolist() for doc, row in zip(docs, matrix)}
+
+        os.utime(json_path) # marking it as recently used
+        with self._lock:
+            self.hits += 1
+        return docs, vectors
+
+    def put(self, key: str, docs: List[Document], vectors: np.ndarray):
+        json_path, npy_path = self._files(key)
+        data = {
+            "version": ARTIFACT_FORMAT_VERSION,
+            "key": key,
+            "model": EMBEDDING_MODEL_NAME,
+            "created_at": time.time(),
+            "chunks": [{"text": doc.page_content, "metadata": doc.metadata} for doc in docs],
+        }
+
+        # writing to temp files and renaming, so readers never see partial files
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(npy_path + tmp_suffix, "wb") as f:
+            np.save(f, vectors)
+        os.replace(npy_path + tmp_suffix, npy_path)
+        with open(json_path + tmp_suffix, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(json_path + tmp_suffix, json_path)
+
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = [
+                os.path.join(self.path, name)
+                for name in os.listdir(self.path)
+                if name.endswith(".json")
+            ]
+            if len(entries) <= self.max_entries:
+                return
+
+            entries.sort(key=lambda p: os.path.getmtime(p))
+            for json_path in entries[:len(entries) - self.max_entries]:
+                for path in (json_path, json_path[:-len(".json")] + ".npy"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+artifact_store = ArtifactStore(
+    path=os.path.join(settings.DATA_DIR, "artifacts"),
+    max_entries=settings.ARTIFACT_CACHE_MAX_ENTRIES
+)
+
+def file_artifact_key(file_hash: str) -> str:
+    return f"sha256:{file_hash}"
+
+def youtube_artifact_key(video_id: str) -> str:
+    return f"youtube:{video_id}"
+
+def _embed_matrix(docs: List[Document]) -> np.ndarray:
+    """
+    The chunks' vectors as one float32 matrix, filled batch by batch.
+    They were just embedded, so this is served by the embedding cache.
+    """
+    batch_size = settings.EMBED_BATCH_SIZE
+    matrix = None
+    for i in range(0, len(docs), batch_size):
+        batch = embeddings.embed_documents([doc.page_content for doc in docs[i:i + batch_size]])
+        if matrix is None:
+            matrix = np.empty((len(docs), len(batch[0])), dtype=np.float32)
+        matrix[i:i + len(batch)] = batch
+    return matrix
+
+def ingest_artifact(
+    key: str,
+    source: str,
+    namespace: str,
+    produce: Callable[[], Iterable[Document]]
+) -> IngestReport:
+    """
+    Ingests an input into a namespace, going through the artifact cache:
+    - hit: the cached chunks and vectors are upserted as they are (no parsing,
+      transcription or embedding); only the "source" label is updated.
+    - miss: `produce()` chunks are streamed into the store and, once the input
+      has been fully processed, saved as a new artifact.
+    """
+    if settings.ARTIFACT_CACHE_ENABLED:
+        cached = artifact_store.get(key)
+        if cached is not None:
+            docs, cached_vectors = cached
+            # the new label changes the chunk IDs, so the vectors are re-keyed
+            vectors = {}
+            for doc in docs:
+                old_id = chunk_id(doc)
+                doc.metadata["source"] = source
+                if old_id in cached_vectors:
+                    vectors[chunk_id(doc)] = cached_vectors[old_id]
+            print(f"[Artifacts] Cache hit for {key} ({len(docs)} chunks).")
+            report = add_documents_to_store(docs, namespace, vectors)
+            report.cached = True
+            return report
+
+    produced: List[Document] = []
+
+    def _collect(docs: Iterable[Document]):
+        for doc in docs:
+            produced.append(doc)
+            yield doc
+
+    report = add_document_stream(_collect(produce()), namespace)
+
+    if settings.ARTIFACT_CACHE_ENABLED and produced:
+        try:
+            artifact_store.put(key, produced, _embed_matrix(produced))
+            print(f"[Artifacts] Saved {key} ({len(produced)} chunks).")
+        except Exception as e:
+            print(f"[Artifacts] Could not save {key}: {e}")
+
+    return report
+
+def get_artifact_stats() -> dict:
+    if not settings.ARTIFACT_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **artifact_store.stats()}
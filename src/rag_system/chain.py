@@ -1,16 +1,14 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_core.runnables import RunnableMap, RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
+from typing import Optional
 from src.rag_system.vector_store import get_retriever
 from langchain_core.vectorstores.base import VectorStoreRetriever
-from src.core.config import settings
+from src.rag_system.models import get_chat_model
+from src.rag_system.answer_cache import create_cached_answer_chain
+from src.rag_system.context import build_context
+from src.rag_system.question_bank import quiz_question_count
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    temperature=0.3,
-    google_api_key=settings.GOOGLE_API_KEY
-)
+# setup: llm settings (clients are created on first use)
+LLM_TEMPERATURE = 0.3
 
 # prompt template
 RAG_PROMPT_TEMPLATE = """
@@ -28,6 +26,7 @@ Your task is to answer the user's "QUESTION" using *only* the "CONTEXT".
 - **Do NOT just copy-paste the context.**
 - **Synthesize** the information from all relevant parts of the context.
 - **Explain** the answer clearly and concisely in your own words, as a helpful tutor would.
+- If a passage is labelled with a recording timestamp (e.g. "[lecture.mp3 @ 12:05-13:40]"), mention where in the recording the answer comes from.
 - If the context does not contain the answer, state "I do not have enough information from your documents to answer that."
 """
 
@@ -58,58 +57,40 @@ Example Format:
 
 quiz_prompt = PromptTemplate.from_template(QUIZ_PROMPT_TEMPLATE)
 
-def create_quiz_chain(retriever: VectorStoreRetriever):
+def create_quiz_chain(retriever: VectorStoreRetriever, namespace: Optional[str] = None):
     """
     Creates a chain that generates a quiz.
+    Cached per namespace and question count, so "5 questions on X" never gets
+    the cached answer to "10 questions on X".
     """
     
-    retrieval_chain = RunnableMap({
-        "context": lambda x: _format_context(retriever.invoke(x["question"])),
-        "question": lambda x: x["question"]
-    })
-    
-    quiz_chain = (
-        retrieval_chain
-        | quiz_prompt
-        | llm
-        | StrOutputParser()
+    return create_cached_answer_chain(
+        lambda question: f"quiz:{quiz_question_count(question)}",
+        retriever,
+        namespace,
+        quiz_prompt | get_chat_model(temperature=LLM_TEMPERATURE),
+        build_context
     )
-    return quiz_chain
-
-# helper functions
-
-def _format_context(docs: list) -> str:
-    """
-    Helper function to combine retrieved documents into a single string.
-    """
-    return "\n\n---\n\n".join([d.page_content for d in docs])
 
 # the core rag chain
 
-def create_rag_chain(retriever: VectorStoreRetriever):
+def create_rag_chain(retriever: VectorStoreRetriever, namespace: Optional[str] = None):
     """
     Creates the main RAG chain using LCEL (LangChain Expression Language).
+    Near-identical questions in the same namespace are served from the answer cache.
     """
     
-    # runnablemap
-    retrieval_chain = RunnableMap({
-        "context": lambda x: _format_context(retriever.invoke(x["question"])),
-        "question": lambda x: x["question"]
-    })
-
-    # the full chain
-    rag_chain = (
-        retrieval_chain
-        | rag_prompt
-        | llm
-        | StrOutputParser()
+    return create_cached_answer_chain(
+        "rag",
+        retriever,
+        namespace,
+        rag_prompt | get_chat_model(temperature=LLM_TEMPERATURE),
+        build_context
     )
-    
-    return rag_chain
 
 def get_rag_chain(collection_name: str):
     """
     High-level function to get a runnable RAG chain for a specific collection.
     """
     retriever = get_retriever(collection_name)
-    return create_rag_chain(retriever)
\ No newline at end of file
+    return create_rag_chain(retriever, collection_name)
\ No newline at end of file
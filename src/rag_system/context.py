@@ -0,0 +1,241 @@
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from langchain_core.documents import Document
+from src.core.config import settings
+from src.core.lazy import LazyProvider
+from src.rag_system.map_reduce import estimate_tokens
+
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+# tokenizer for budgeting (tiktoken is local and fast; it's not gemini's tokenizer, but close enough)
+def _load_tokenizer():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"[Context] tiktoken unavailable, estimating tokens from length: {e}")
+        return None
+
+tokenizer_provider = LazyProvider("tokenizer", _load_tokenizer)
+
+def count_tokens(text: str) -> int:
+    encoding = tokenizer_provider.get()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def document_position(doc: Document):
+    """
+    Sort key that puts chunks back in reading order (source, then page or timestamp).
+    """
+    return (
+        str(doc.metadata.get("source", "")),
+        float(doc.metadata.get("page", 0) or 0),
+        float(doc.metadata.get("start", 0) or 0),
+        doc.id or "",
+    )
+
+def format_chunk(doc: Document) -> str:
+    """
+    One chunk as prompt context, labelled with its source
+    (and, for transcripts, where it is in the recording).
+    """
+    source = doc.metadata.get("source")
+    timestamp = doc.metadata.get("timestamp")
+    if timestamp:
+        return f"[{source or 'Recording'} @ {timestamp}]\n{doc.page_content}"
+    if source:
+        return f"[Source: {source}]\n{doc.page_content}"
+    return doc.page_content
+
+# near-duplicate detection: minhash signatures over word 5-grams
+SHINGLE_WORDS = 5
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16 # 16 bands of 4 rows: pairs above ~0.5 similarity become candidates
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(1, _PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+def _shingles(text: str) -> np.ndarray:
+    words = text.lower().split()
+    if len(words) <= SHINGLE_WORDS:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+def minhash_signature(text: str) -> np.ndarray:
+    hashes = _shingles(text)
+    # a, b < 2^31 and hashes < 2^32, so nothing overflows 64 bits
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1)
+
+def _similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+def drop_near_duplicates(docs: List[Document], threshold: float) -> List[Document]:
+    """
+    Keeps the first of every group of near-duplicate chunks (so, with ranked
+    input, the most relevant one). Candidate pairs come from LSH buckets.
+    """
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    buckets: Dict[tuple, List[int]] = defaultdict(list)
+    signatures: List[np.ndarray] = []
+    kept: List[Document] = []
+
+    for doc in docs:
+        signature = minhash_signature(doc.page_content)
+        bands = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+        candidates = {i for band in bands for i in buckets.get(band, ())}
+        if any(_similarity(signature, signatures[i]) >= threshold for i in candidates):
+            continue
+
+        for band in bands:
+            buckets[band].append(len(signatures))
+        signatures.append(signature)
+        kept.append(doc)
+    return kept
+
+# the splitter repeats up to chunk_overlap characters at the start of the next chunk
+MIN_OVERLAP_CHARS = 20
+MAX_OVERLAP_CHARS = 400
+
+def _overlap(previous: str, text: str) -> int:
+    """
+    Length of the longest suffix of `previous` that `text` starts with.
+    """
+    longest = min(len(previous), len(text), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if text.startswith(previous[-size:]):
+            return size
+    return 0
+
+def _trim_overlaps(docs: List[Document]) -> Tuple[List[Document], int]:
+    """
+    Puts chunks in reading order and cuts each one's leading overlap with the
+    chunk before it (same source). Returns new Documents, plus the chars cut.
+    """
+    ordered = sorted(docs, key=document_position)
+    trimmed, cut = [], 0
+    previous: Optional[Document] = None
+    for doc in ordered:
+        text = doc.page_content
+        if previous is not None and previous.metadata.get("source") == doc.metadata.get("source"):
+            size = _overlap(previous.page_content, text)
+            if size and text[size:].strip():
+                text = text[size:].lstrip()
+                cut += size
+        trimmed.append(Document(id=doc.id, page_content=text, metadata=doc.metadata))
+        previous = doc
+    return trimmed, cut
+
+class ContextReport(BaseModel):
+    chunks_in: int = 0
+    chunks_out: int = 0
+    duplicates: int = 0 # near-duplicate chunks dropped
+    over_budget: int = 0 # chunks that didn't fit in the token budget
+    overlap_chars: int = 0 # splitter overlap trimmed off
+    tokens_in: int = 0 # what joining every chunk would have cost
+    tokens_out: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_in - self.tokens_out)
+
+def prepare_chunks(docs: List[Document], token_budget: Optional[int] = None) -> Tuple[List[Document], ContextReport]:
+    """
+    The shared context pipeline, for chunks in relevance order:
+    1. near-duplicates are dropped (the more relevant copy is kept),
+    2. the most relevant chunks are kept while they fit in `token_budget`,
+    3. the rest are put in reading order, with the splitter overlap trimmed.
+    """
+    report = ContextReport(chunks_in=len(docs))
+    if not docs:
+        return [], report
+
+    unique = drop_near_duplicates(docs, settings.CONTEXT_DEDUP_THRESHOLD)
+    report.duplicates = len(docs) - len(unique)
+
+    packed = unique
+    if token_budget is not None:
+        packed, used = [], 0
+        for doc in unique:
+            # untrimmed size, so trimming can only make it smaller
+            tokens = count_tokens(format_chunk(doc))
+            if packed and used + tokens > token_budget:
+                continue
+            packed.append(doc)
+            used += tokens
+        report.over_budget = len(unique) - len(packed)
+
+    prepared, report.overlap_chars = _trim_overlaps(packed)
+    report.chunks_out = len(prepared)
+    return prepared, report
+
+class ContextStats:
+    """
+    Running totals of what context packing saved, across calls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.chunks_in = 0
+        self.chunks_out = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def record(self, report: ContextReport):
+        with self._lock:
+            self.calls += 1
+            self.chunks_in += report.chunks_in
+            self.chunks_out += report.chunks_out
+            self.tokens_in += report.tokens_in
+            self.tokens_out += report.tokens_out
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = max(0, self.tokens_in - self.tokens_out)
+            return {
+                "calls": self.calls,
+                "chunks_in": self.chunks_in,
+                "chunks_out": self.chunks_out,
+                "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out,
+                "tokens_saved": saved,
+                "saved_ratio": round(saved / self.tokens_in, 3) if self.tokens_in else 0.0,
+            }
+
+context_stats = ContextStats()
+
+def pack_context(docs: List[Document], token_budget: Optional[int] = None) -> Tuple[str, ContextReport]:
+    """
+    Builds a prompt context string from retrieved chunks (see prepare_chunks)
+    and reports what it saved compared to joining them as they are.
+    """
+    prepared, report = prepare_chunks(docs, token_budget)
+    context = CHUNK_SEPARATOR.join(format_chunk(doc) for doc in prepared)
+
+    report.tokens_in = count_tokens(CHUNK_SEPARATOR.join(format_chunk(doc) for doc in docs))
+    report.tokens_out = count_tokens(context)
+    context_stats.record(report)
+    if report.tokens_saved:
+        print(
+            f"[Context] {report.chunks_in} -> {report.chunks_out} chunks "
+            f"({report.duplicates} duplicates, {report.over_budget} over budget, "
+            f"{report.overlap_chars} overlap chars), saved {report.tokens_saved} of {report.tokens_in} tokens."
+        )
+    return context, report
+
+def build_context(docs: List[Document]) -> str:
+    """
+    Prompt context for retrieved chunks, packed to CONTEXT_TOKEN_BUDGET.
+    """
+    return pack_context(docs, settings.CONTEXT_TOKEN_BUDGET)[0]
+
+def get_context_stats() -> dict:
+    return context_stats.stats()
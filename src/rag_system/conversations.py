@@ -0,0 +1,255 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+from src.core.config import settings
+from src.core.lazy import LazyProvider
+from src.rag_system.map_reduce import estimate_tokens
+from src.rag_system.models import get_chat_model
+
+class Conversation(BaseModel):
+    session_id: str
+    user_id: str
+    topic: str
+    summary: str = "" # rolling summary of every turn up to `summarized_through`
+    summarized_through: int = 0 # seq of the last message folded into the summary
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+class ConversationStore:
+    """
+    SQLite store for guided-chat sessions: every message, plus a rolling
+    summary of the older ones, so clients only send the new question.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized_through INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.fetchall()
+
+    def create(self, user_id: str, topic: str) -> Conversation:
+        self.cleanup()
+        now = time.time()
+        conversation = Conversation(
+            session_id=uuid.uuid4().hex,
+            user_id=user_id,
+            topic=topic,
+            created_at=now,
+            updated_at=now
+        )
+        self._execute(
+            "INSERT INTO sessions (session_id, user_id, topic, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (conversation.session_id, user_id, topic, now, now)
+        )
+        return conversation
+
+    def get(self, session_id: str) -> Optional[Conversation]:
+        rows = self._execute(
+            "SELECT session_id, user_id, topic, summary, summarized_through, created_at, updated_at "
+            "FROM sessions WHERE session_id = ?",
+            (session_id,)
+        )
+        if not rows:
+            return None
+        keys = ("session_id", "user_id", "topic", "summary", "summarized_through", "created_at", "updated_at")
+        return Conversation(**dict(zip(keys, rows[0])))
+
+    def append(self, session_id: str, messages: List[Dict[str, str]]):
+        """
+        Appends {"role", "content"} messages to the end of the session.
+        """
+        with self._lock:
+            last = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO messages (session_id, seq, role, content, tokens) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, last + i + 1, m["role"], m["content"], estimate_tokens(m["content"]))
+                    for i, m in enumerate(messages)
+                ]
+            )
+            self._conn.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (time.time(), session_id))
+            self._conn.commit()
+
+    def window(
+        self,
+        session_id: str,
+        token_budget: int,
+        conversation: Optional[Conversation] = None
+    ) -> Tuple[List[Dict[str, str]], int]:
+        """
+        The messages that haven't been summarized yet, oldest first. Once they pass
+        `token_budget`, also returns the seq up to which the summary should catch up
+        (0 otherwise): everything but the newest half of the budget, so summaries run
+        every few turns, not every turn. Until that summary lands the older messages
+        stay in the window (nothing leaves the prompt before it's in the summary),
+        up to twice the budget in case summaries fall far behind.
+        Pass the `conversation` whose summary will be used, so the two line up.
+        """
+        conversation = conversation or self.get(session_id)
+        rows = self._execute(
+            "SELECT seq, role, content, tokens FROM messages "
+            "WHERE session_id = ? AND seq > ? ORDER BY seq DESC",
+            (session_id, conversation.summarized_through if conversation else 0)
+        )
+
+        window, used, fold_through = [], 0, 0
+        for seq, role, content, tokens in rows:
+            if window and not fold_through and used + tokens > token_budget // 2:
+                fold_through = seq
+            if window and used + tokens > 2 * token_budget:
+                break
+            window.append({"role": role, "content": content})
+            used += tokens
+        window.reverse()
+        return window, fold_through if used > token_budget else 0
+
+    def messages_between(self, session_id: str, after: int, through: int) -> List[Dict[str, str]]:
+        rows = self._execute(
+            "SELECT role, content FROM messages WHERE session_id = ? AND seq > ? AND seq <= ? ORDER BY seq",
+            (session_id, after, through)
+        )
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def set_summary(self, session_id: str, summary: str, summarized_through: int):
+        self._execute(
+            "UPDATE sessions SET summary = ?, summarized_through = ? "
+            "WHERE session_id = ? AND summarized_through < ?",
+            (summary, summarized_through, session_id, summarized_through)
+        )
+
+    def cleanup(self):
+        """
+        Deletes sessions that have been idle for longer than ttl_seconds.
+        """
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+                (cutoff,)
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self._conn.commit()
+
+conversation_store = ConversationStore(
+    path=os.path.join(settings.DATA_DIR, "conversations.sqlite"),
+    ttl_seconds=settings.CONVERSATION_TTL_SECONDS
+)
+
+# rolling summarization
+SUMMARY_PROMPT = """
+You are maintaining the running notes of a Socratic tutoring session on "{topic}".
+
+Notes so far:
+{summary}
+
+New turns to fold in:
+{turns}
+
+Rewrite the notes to include the new turns. Keep: what the student already understands,
+their mistakes and misconceptions, the questions already asked, and where the session is heading.
+Be concise (at most {max_words} words). Return only the notes.
+"""
+
+summary_chain = LazyProvider(
+    "conversation_summary_chain",
+    lambda: PromptTemplate.from_template(SUMMARY_PROMPT) | get_chat_model(temperature=0) | StrOutputParser()
+)
+
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+_pending_summaries = set()
+_pending_lock = threading.Lock()
+
+def _format_turns(messages: List[Dict[str, str]]) -> str:
+    return "\n".join(
+        f"{'Student' if m['role'] == 'user' else 'Tutor'}: {m['content']}" for m in messages
+    )
+
+def _summarize(session_id: str, through: int):
+    conversation = conversation_store.get(session_id)
+    if conversation is None or through <= conversation.summarized_through:
+        return
+
+    turns = conversation_store.messages_between(session_id, conversation.summarized_through, through)
+    summary = summary_chain.get().invoke({
+        "topic": conversation.topic,
+        "summary": conversation.summary or "(none yet)",
+        "turns": _format_turns(turns),
+        "max_words": settings.CONVERSATION_SUMMARY_MAX_WORDS
+    })
+    conversation_store.set_summary(session_id, summary.strip(), through)
+    print(f"[Conversations] Summarized {session_id} through message {through}.")
+
+def schedule_summary(session_id: str, through: int):
+    """
+    Folds messages up to `through` into the session's summary in the background.
+    Only one summary per session runs at a time; turns that arrive meanwhile
+    are picked up by the next one.
+    """
+    with _pending_lock:
+        if session_id in _pending_summaries:
+            return
+        _pending_summaries.add(session_id)
+
+    def _run():
+        try:
+            _summarize(session_id, through)
+        except Exception as e:
+            print(f"[Conversations] Background summary failed for {session_id}: {e}")
+        finally:
+            with _pending_lock:
+                _pending_summaries.discard(session_id)
+
+    _summary_executor.submit(_run)
+
+def load_context(session_id: str) -> Tuple[str, List[Dict[str, str]]]:
+    """
+    Returns (summary, recent messages) for the next turn: the messages the
+    rolling summary doesn't cover yet, about CONVERSATION_WINDOW_TOKENS of them.
+    Once they pass that, the older ones are summarized in the background (and
+    stay in the window until then), so this never waits for the LLM.
+    """
+    conversation = conversation_store.get(session_id)
+    window, fold_through = conversation_store.window(
+        session_id, settings.CONVERSATION_WINDOW_TOKENS, conversation
+    )
+    if fold_through:
+        schedule_summary(session_id, fold_through)
+    return conversation.summary, window
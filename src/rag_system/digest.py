@@ -0,0 +1,299 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable, RunnableLambda
+from src.core.config import settings
+from src.rag_system.hashing import content_hash
+from src.rag_system.context import prepare_chunks, format_chunk
+from src.rag_system.map_reduce import map_reduce, condense_documents, acondense_documents
+from src.rag_system.vector_store import get_all_documents, register_namespace_listener
+
+# what each per-document summary should capture
+DIGEST_FOCUS = (
+    "every topic covered, with its importance signals: how often it is repeated, "
+    "how much time the lecturer spends on it, explicit cues like 'this is important' "
+    "or 'this will be on the exam', major headings, key definitions and relationships "
+    "between concepts."
+)
+
+class DocumentDigest(BaseModel):
+    source: str
+    content_hash: str
+    chunk_count: int
+    summary: str
+
+class CourseDigest(BaseModel):
+    namespace: str
+    documents: List[DocumentDigest]
+    fingerprint: str # changes whenever any document in the course changes
+
+class CourseDigestStore:
+    """
+    SQLite store for per-document summaries, namespace change generations,
+    and final results (e.g. the prioritized topic list) keyed by digest fingerprint.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                namespace TEXT NOT NULL,
+                source TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, source)
+            );
+            CREATE TABLE IF NOT EXISTS namespaces (
+                namespace TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL DEFAULT 0,
+                refreshed_generation INTEGER NOT NULL DEFAULT -1
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                namespace TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                output TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, kind)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.fetchall()
+
+    # namespace generations ("dirty" tracking)
+
+    def bump_generation(self, namespace: str):
+        self._execute(
+            "INSERT INTO namespaces (namespace, generation) VALUES (?, 1) "
+            "ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1",
+            (namespace,)
+        )
+
+    def get_generations(self, namespace: str):
+        """
+        Returns (generation, refreshed_generation). Namespaces we have never
+        seen count as dirty, so courses ingested before digests existed still work.
+        """
+        rows = self._execute(
+            "SELECT generation, refreshed_generation FROM namespaces WHERE namespace = ?",
+            (namespace,)
+        )
+        return rows[0] if rows else (0, -1)
+
+    def mark_refreshed(self, namespace: str, generation: int):
+        self._execute(
+            "INSERT INTO namespaces (namespace, generation, refreshed_generation) VALUES (?, ?, ?) "
+            "ON CONFLICT(namespace) DO UPDATE SET refreshed_generation = excluded.refreshed_generation",
+            (namespace, generation, generation)
+        )
+
+    # per-document summaries
+
+    def get_documents(self, namespace: str) -> Dict[str, DocumentDigest]:
+        rows = self._execute(
+            "SELECT source, content_hash, chunk_count, summary FROM documents "
+            "WHERE namespace = ? ORDER BY source",
+            (namespace,)
+        )
+        return {
+            row[0]: DocumentDigest(source=row[0], content_hash=row[1], chunk_count=row[2], summary=row[3])
+            for row in rows
+        }
+
+    def put_document(self, namespace: str, digest: DocumentDigest):
+        self._execute(
+            "INSERT OR REPLACE INTO documents "
+            "(namespace, source, content_hash, chunk_count, summary, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, digest.source, digest.content_hash, digest.chunk_count, digest.summary, time.time())
+        )
+
+    def delete_document(self, namespace: str, source: str):
+        self._execute("DELETE FROM documents WHERE namespace = ? AND source = ?", (namespace, source))
+
+    # final results
+
+    def get_result(self, namespace: str, kind: str, fingerprint: str) -> Optional[str]:
+        rows = self._execute(
+            "SELECT output FROM results WHERE namespace = ? AND kind = ? AND fingerprint = ?",
+            (namespace, kind, fingerprint)
+        )
+        return rows[0][0] if rows else None
+
+    def put_result(self, namespace: str, kind: str, fingerprint: str, output: str):
+        self._execute(
+            "INSERT OR REPLACE INTO results (namespace, kind, fingerprint, output, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, kind, fingerprint, output, time.time())
+        )
+
+    def clear(self, namespace: str):
+        for table in ("documents", "namespaces", "results"):
+            self._execute(f"DELETE FROM {table} WHERE namespace = ?", (namespace,))
+
+digest_store = CourseDigestStore(os.path.join(settings.DATA_DIR, "course_digests.sqlite"))
+
+# one refresh at a time per namespace (so two callers never summarize the same document twice)
+_namespace_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+# background refreshes scheduled by ingest
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="digest")
+_pending_refreshes = set()
+_pending_lock = threading.Lock()
+
+def _source_of(doc: Document) -> str:
+    return str(doc.metadata.get("source", "Unknown"))
+
+def _summarize_document(source: str, docs: List[Document]) -> str:
+    # repeated slides and splitter overlap would be summarized (and paid for) twice
+    chunks, report = prepare_chunks(docs)
+    if report.duplicates or report.overlap_chars:
+        print(f"[Digest] '{source}': dropped {report.duplicates} duplicate chunks, trimmed {report.overlap_chars} overlap chars.")
+    return map_reduce([format_chunk(doc) for doc in chunks], DIGEST_FOCUS)
+
+def refresh_digest(namespace: str) -> CourseDigest:
+    """
+    Brings the namespace's digest up to date. Only documents whose chunks
+    changed since the last refresh are summarized again; an unchanged
+    course costs no LLM calls.
+    """
+    with _namespace_locks[namespace]:
+        generation, refreshed = digest_store.get_generations(namespace)
+        if generation > refreshed:
+            by_source: Dict[str, List[Document]] = defaultdict(list)
+            for doc in get_all_documents(namespace):
+                by_source[_source_of(doc)].append(doc)
+
+            stored = digest_store.get_documents(namespace)
+            for source, docs in by_source.items():
+                doc_hash = content_hash("\n".join(sorted(doc.id or "" for doc in docs)))
+                if source in stored and stored[source].content_hash == doc_hash:
+                    continue
+                print(f"[Digest] Summarizing '{source}' ({len(docs)} chunks) for {namespace}...")
+                digest_store.put_document(namespace, DocumentDigest(
+                    source=source,
+                    content_hash=doc_hash,
+                    chunk_count=len(docs),
+                    summary=_summarize_document(source, docs)
+                ))
+
+            for source in set(stored) - set(by_source):
+                digest_store.delete_document(namespace, source)
+
+            digest_store.mark_refreshed(namespace, generation)
+
+        documents = list(digest_store.get_documents(namespace).values())
+        fingerprint = content_hash("\n".join(f"{d.source}:{d.content_hash}" for d in documents))
+        return CourseDigest(namespace=namespace, documents=documents, fingerprint=fingerprint)
+
+def get_course_digest(namespace: str) -> CourseDigest:
+    """
+    Returns the (up to date) digest for a namespace.
+    """
+    return refresh_digest(namespace)
+
+def schedule_refresh(namespace: str):
+    """
+    Refreshes the digest in the background. Refreshes that are already
+    waiting for the same namespace are coalesced.
+    """
+    with _pending_lock:
+        if namespace in _pending_refreshes:
+            return
+        _pending_refreshes.add(namespace)
+
+    def _run():
+        # waiting a little so chunks that arrive in several batches are summarized once
+        time.sleep(settings.DIGEST_REFRESH_DELAY_SECONDS)
+        with _pending_lock:
+            _pending_refreshes.discard(namespace)
+        try:
+            refresh_digest(namespace)
+        except Exception as e:
+            print(f"[Digest] Background refresh failed for {namespace}: {e}")
+
+    _refresh_executor.submit(_run)
+
+def digest_documents(digest: CourseDigest) -> List[Document]:
+    """
+    The digest as one Document per course document (summary + source info).
+    """
+    return [
+        Document(page_content=d.summary, metadata={"source": d.source, "chunk_count": d.chunk_count})
+        for d in digest.documents
+    ]
+
+def format_summaries(docs: list) -> str:
+    """
+    Formats digest Documents as prompt context, one block per course document.
+    """
+    return "".join(
+        f"[Source: {d.metadata['source']}] ({d.metadata['chunk_count']} chunks)\n{d.page_content}\n\n---\n\n"
+        for d in docs
+    )
+
+def create_digest_chain(kind: str, focus: str, final_chain: Runnable) -> Runnable:
+    """
+    Wraps a whole-course chain ({"context": ...} -> str) so that it
+    runs off the course digest and caches its output per digest fingerprint.
+    Input: {"user_id": ...}.
+    """
+    def _run(x: dict) -> str:
+        digest = get_course_digest(x["user_id"])
+        if not digest.documents:
+            raise Exception("No documents found for this user.")
+
+        cached = digest_store.get_result(digest.namespace, kind, digest.fingerprint)
+        if cached is not None:
+            print(f"[Digest] Serving cached '{kind}' for {digest.namespace}.")
+            return cached
+
+        context = condense_documents(digest_documents(digest), focus, format_summaries)
+        output = final_chain.invoke({"context": context})
+        digest_store.put_result(digest.namespace, kind, digest.fingerprint, output)
+        return output
+
+    async def _arun(x: dict) -> str:
+        digest = await asyncio.to_thread(get_course_digest, x["user_id"])
+        if not digest.documents:
+            raise Exception("No documents found for this user.")
+
+        cached = digest_store.get_result(digest.namespace, kind, digest.fingerprint)
+        if cached is not None:
+            print(f"[Digest] Serving cached '{kind}' for {digest.namespace}.")
+            return cached
+
+        context = await acondense_documents(digest_documents(digest), focus, format_summaries)
+        output = await final_chain.ainvoke({"context": context})
+        digest_store.put_result(digest.namespace, kind, digest.fingerprint, output)
+        return output
+
+    return RunnableLambda(_run, afunc=_arun, name=f"{kind}_from_digest")
+
+def _on_namespace_change(event: str, namespace: str, docs: List[Document]):
+    if event == "add":
+        digest_store.bump_generation(namespace)
+        schedule_refresh(namespace)
+    elif event == "clear":
+        digest_store.clear(namespace)
+
+register_namespace_listener(_on_namespace_change)
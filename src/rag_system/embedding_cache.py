@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.rag_system.hashing import content_hash
+
+class EmbeddingCache:
+    """
+    On-disk (SQLite) cache of embedding vectors, keyed by model name + text hash.
+    Vectors are stored as raw float32 bytes. When the cache grows past
+    `max_entries`, the least recently used entries are evicted. Recency is
+    coarse: a hit only rewrites last_used if it's older than `touch_interval`,
+    so hot lookups stay read-only.
+    """
+
+    def __init__(self, path: str, max_entries: int, touch_interval: float = 3600):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.touch_interval = max(0.0, touch_interval)
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+        # stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        if not keys:
+            return {}
+
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        stale: List[str] = []
+        with self._lock:
+            # sqlite caps the number of bound parameters, so look up in slices
+            for i in range(0, len(keys), 500):
+                part = keys[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob, last_used in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                    if now - last_used >= self.touch_interval:
+                        stale.append(key)
+
+            # only touching rows whose last_used has gone stale, so repeat hits don't write
+            if stale:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in stale]
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._size += len(rows)
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # recounting, since other workers share the same file
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if self._size <= self.max_entries:
+            return
+
+        # evicting down to 90% so we don't evict on every insert
+        excess = self._size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,)
+        )
+        self._conn.commit()
+        self._size -= excess
+        self.evictions += excess
+        print(f"[EmbeddingCache] Evicted {excess} least recently used vectors.")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an Embeddings model so both document and query embeddings
+    are served from an EmbeddingCache when possible.
+    """
+
+    def __init__(self, inner: Embeddings, model_name: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache
+
+    def _key(self, text: str, kind: str) -> str:
+        return f"{self.model_name}:{kind}:{content_hash(text)}"
+
+    def _embed_many(self, texts: List[str], kind: str, embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        keys = [self._key(t, kind) for t in texts]
+        cached = self.cache.get_many(keys)
+
+        # only embedding what we haven't seen (once per unique text)
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+
+        if missing:
+            vectors = embed(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        return [cached[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_many(texts, "doc", self.inner.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text, "query")
+        cached: Optional[List[float]] = self.cache.get_many([key]).get(key)
+        if cached is not None:
+            return cached
+
+        vector = self.inner.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Several queries through the query path (same vectors and cache entries
+        as embed_query), with one cache lookup for all of them.
+        """
+        return self._embed_many(texts, "query", lambda missing: [self.inner.embed_query(t) for t in missing])
@@ -1,74 +1,83 @@
 from src.core.config import settings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda
-from src.rag_system.vector_store import get_all_documents
-import json
+from langchain_core.documents import Document
+from pydantic import BaseModel
+from src.rag_system.map_reduce import condense_documents
+from src.rag_system.models import get_chat_model
+from src.core.lazy import LazyProvider
+from src.rag_system.digest import get_course_digest, digest_documents, format_summaries, digest_store
+from src.rag_system.vector_store import multi_query_search
+from src.rag_system.context import build_context, drop_near_duplicates
+from src.rag_system.question_bank import ExamQuestion, QUESTION_FIELDS, sample_questions
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import math
 import os
+from typing import Callable, List, Optional, Tuple
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 
-# setup: llm
-llm_pro = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0.3,
-    google_api_key=settings.GOOGLE_API_KEY
+# setup: llm settings (the client is created on first use)
+LLM_TEMPERATURE = 0.3
+
+# what the map-reduce stage should keep when condensing a large course
+EXAM_FOCUS = (
+    "testable facts: definitions, formulas, key results, worked examples, common mistakes, "
+    "and which topics the lecturer emphasizes."
 )
 
-# helper function
-def _format_context(docs: list) -> str:
-    """
-    Combines all documents into a single massive string.
-    """
-    formatted_context = ""
-    for doc in docs:
-        source = doc.metadata.get('source', 'Unknown')
-        formatted_context += f"[Source: {source}]\n{doc.page_content}\n\n---\n\n"
-    return formatted_context
+# planning: splitting the course into exam sections
+PLAN_PROMPT = """
+You are a University Professor planning a final exam of {num_questions} multiple-choice questions.
+Based *only* on the provided course materials, pick the {num_sections} most important topics
+(judging by repetition, emphasis, and time spent), one per exam section.
+{covered}
+For each topic, give its name and 2-3 short search queries that would find the course material
+needed to write questions about it.
 
-# the exam generation prompt
-EXAM_PROMPT = """
-You are a University Professor creating a final exam.
-Based *only* on the provided course materials, generate **{num_questions}** high-quality, unique multiple-choice questions (MCQs) that cover the most important topics found in the context.
+**COURSE MATERIALS:**
+<CONTEXT>
+{context}
+</CONTEXT>
+"""
 
-**Instructions:**
-1.  Focus on the most important topics (judging by repetition, emphasis, and time spent).
-2.  Each question must have four options (A, B, C, D).
-3.  One option must be clearly correct based on the context.
-4.  The other three options must be plausible but incorrect "distractors".
-5.  Return *only* a single JSON object. Do not add any conversational text before or after.
-6.  The JSON object must have one key: "questions", which is a list of objects.
-7.  Each question object must have: "question_text", "options" (a list of 4 strings), and "correct_answer" (a string).
-
-**EXAMPLE FORMAT:**
-{{
-  "questions": [
-    {{
-      "question_text": "What is the core idea of gradient descent?",
-      "options": [
-        "To maximize the cost function",
-        "To iteratively move towards the minimum of a cost function",
-        "To use a random search for parameters",
-        "To set the learning rate to a large value"
-      ],
-      "correct_answer": "To iteratively move towards the minimum of a cost function"
-    }}
-  ]
-}}
+# one section: a few questions on one topic
+SECTION_PROMPT = """
+You are a University Professor writing one section of a final exam.
+Based *only* on the provided course materials, write **{count}** high-quality, unique multiple-choice questions (MCQs)
+on the topic: **{topic}**.
 
+**Instructions:**
+1.  Each question must have exactly four options.
+2.  One option must be clearly correct based on the context; "correct_answer" must repeat it exactly.
+3.  The other three options must be plausible but incorrect "distractors".
+4.  Test different facts: do not ask the same thing twice.
+{avoid}
 **COURSE MATERIALS:**
 <CONTEXT>
 {context}
 </CONTEXT>
-
-Generate {num_questions} MCQs now:
 """
 
-exam_gen_prompt = PromptTemplate.from_template(EXAM_PROMPT)
-exam_gen_chain = exam_gen_prompt | llm_pro | StrOutputParser()
+class ExamSection(BaseModel):
+    questions: List[ExamQuestion]
+
+class ExamTopic(BaseModel):
+    topic: str
+    queries: List[str] = []
+
+class ExamPlan(BaseModel):
+    topics: List[ExamTopic]
+
+plan_chain = LazyProvider(
+    "exam_plan_chain",
+    lambda: PromptTemplate.from_template(PLAN_PROMPT) | get_chat_model(temperature=0).with_structured_output(ExamPlan)
+)
+section_chain = LazyProvider(
+    "exam_section_chain",
+    lambda: PromptTemplate.from_template(SECTION_PROMPT) | get_chat_model(temperature=LLM_TEMPERATURE).with_structured_output(ExamSection)
+)
 
 # the pdf generation function
 def create_exam_pdf(exam_data: dict, user_id: str) -> str:
@@ -131,41 +140,196 @@ def create_exam_pdf(exam_data: dict, user_id: str) -> str:
     print(f"[ExamGen] PDF created at {file_path}")
     return download_url
 
+def _section_sizes(num_questions: int) -> List[int]:
+    """
+    Splits the exam into sections of at most EXAM_QUESTIONS_PER_SECTION questions, as evenly as possible.
+    """
+    sections = max(1, math.ceil(num_questions / settings.EXAM_QUESTIONS_PER_SECTION))
+    base, extra = divmod(num_questions, sections)
+    return [base + (1 if i < extra else 0) for i in range(sections)]
+
+def _plan_sections(
+    digest,
+    context: str,
+    num_questions: int,
+    num_sections: int,
+    covered: List[str] = ()
+) -> List[ExamTopic]:
+    """
+    One topic per section, for `num_questions` questions, steering clear of the
+    `covered` topics (those of questions taken from the bank). Plans without
+    covered topics are cached per digest fingerprint, so repeated exams on an
+    unchanged course skip this call.
+    """
+    covered = sorted(set(covered), key=str.lower)
+    kind = f"exam_plan:{num_sections}"
+    cached = None if covered else digest_store.get_result(digest.namespace, kind, digest.fingerprint)
+    if cached is not None:
+        topics = ExamPlan.model_validate_json(cached).topics
+    else:
+        covered_text = ""
+        if covered:
+            listed = "\n".join(f"- {topic}" for topic in covered)
+            covered_text = f"The exam already has questions on these topics; pick other ones where the course allows:\n{listed}\n"
+        plan = plan_chain.get().invoke({
+            "context": context,
+            "num_questions": num_questions,
+            "num_sections": num_sections,
+            "covered": covered_text
+        })
+        topics = [t for t in plan.topics if t.topic.strip()]
+        if topics and not covered:
+            digest_store.put_result(digest.namespace, kind, digest.fingerprint, ExamPlan(topics=topics).model_dump_json())
+
+    if not topics:
+        raise Exception("Failed to plan the exam sections.")
+    # fewer topics than sections: the topics are reused
+    return [topics[i % len(topics)] for i in range(num_sections)]
+
+def _section_context(user_id: str, topic: ExamTopic, fallback: str) -> str:
+    # the section's own chunks; the course digest if retrieval comes back empty
+    try:
+        docs = multi_query_search(user_id, [topic.topic] + topic.queries)
+    except Exception as e:
+        print(f"[ExamGen] Retrieval failed for section '{topic.topic}': {e}")
+        docs = []
+    return build_context(docs) if docs else fallback
+
+def _generate_section(user_id: str, topic: ExamTopic, count: int, fallback: str, avoid: List[str] = ()) -> List[ExamQuestion]:
+    avoid_text = ""
+    if avoid:
+        listed = "\n".join(f"- {q}" for q in avoid)
+        avoid_text = f"5.  Do not repeat (or rephrase) any of these existing questions:\n{listed}\n"
+
+    section = section_chain.get().invoke({
+        "topic": topic.topic,
+        "count": count,
+        "avoid": avoid_text,
+        "context": _section_context(user_id, topic, fallback)
+    })
+    if section is None or not section.questions:
+        raise ValueError("empty section")
+    return section.questions[:count]
+
+def _run_sections(
+    user_id: str,
+    sections: List[Tuple[ExamTopic, int]],
+    fallback: str,
+    on_done: Callable[[], None]
+) -> List[List[ExamQuestion]]:
+    """
+    Generates every section concurrently. Sections that fail (bad output,
+    schema violations, api errors) are retried on their own, up to
+    EXAM_SECTION_RETRIES times; the ones that succeeded are kept.
+    """
+    results: List[Optional[List[ExamQuestion]]] = [None] * len(sections)
+    pending = list(range(len(sections)))
+    executor = ThreadPoolExecutor(max_workers=settings.EXAM_SECTION_CONCURRENCY, thread_name_prefix="exam-section")
+    try:
+        for attempt in range(settings.EXAM_SECTION_RETRIES + 1):
+            futures = {
+                executor.submit(_generate_section, user_id, sections[i][0], sections[i][1], fallback): i
+                for i in pending
+            }
+            failed = []
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    print(f"[ExamGen] Section {i + 1} ('{sections[i][0].topic}') failed (attempt {attempt + 1}): {e}")
+                    failed.append(i)
+                    continue
+                # outside the try: a cancelled job raises from here and must not count as a failed section
+                on_done()
+            pending = sorted(failed)
+            if not pending:
+                break
+    finally:
+        # on cancellation (raised from on_done), queued sections are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if pending:
+        print(f"[ExamGen] {len(pending)} of {len(sections)} sections failed after retries.")
+    return [r for r in results if r]
+
+def _dedupe_questions(questions: List[ExamQuestion]) -> List[ExamQuestion]:
+    # the same fact asked twice (usually by sections with overlapping topics)
+    docs = [Document(page_content=q.question_text, metadata={"index": i}) for i, q in enumerate(questions)]
+    kept = drop_near_duplicates(docs, settings.EXAM_DEDUP_THRESHOLD)
+    return [questions[d.metadata["index"]] for d in kept]
+
 # the full exam generation logic
-def generate_exam_and_pdf(user_id: str, num_questions: int) -> str:
+def generate_exam_and_pdf(
+    user_id: str,
+    num_questions: int,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> str:
     """
     The full, end-to-end logic for generating an exam.
     This function is designed to be run in a background thread.
+    `progress(percent, stage)` is called as each stage starts.
+
+    Questions come from the namespace's question bank first. The rest is planned
+    as per-topic sections of a few questions each, which are generated
+    concurrently (so a large exam takes about as long as one section),
+    validated against a schema, and deduplicated across sections.
     """
+    progress = progress or (lambda percent, stage: None)
 
     print(f"[ExamGen] Starting exam generation for {user_id}...")
-    
-    # getting all documents
-    docs = get_all_documents(user_id)
-    if not docs:
-        raise Exception("No documents found for this user.")
-    
-    # formatting them
-    context = _format_context(docs)
-    
-    # calling the llm chain
-    print("[ExamGen] Calling Gemini 2.5 Pro...")
-    json_string = exam_gen_chain.invoke({
-        "context": context,
-        "num_questions": num_questions
-    })
-    
-    # parsing the json
-    try:
-        clean_json_string = json_string.strip().replace("```json", "").replace("```", "")
-        exam_data = json.loads(clean_json_string)
-    except Exception as e:
-        print(f"[ExamGen] Error parsing JSON: {e}")
-        print(f"[ExamGen] Raw LLM Output: {json_string}")
-        raise Exception("Failed to parse exam data from LLM.")
+    progress(5, "retrieval")
+
+    # questions already in the bank cost nothing; only the rest is generated
+    banked = sample_questions(user_id, num_questions)
+    questions = banked
+    if len(banked) < num_questions:
+        # getting the course digest (only new/changed documents get summarized)
+        digest = get_course_digest(user_id)
+        if not digest.documents:
+            raise Exception("No documents found for this user.")
+
+        # formatting it (very large courses are condensed further with map-reduce)
+        context = condense_documents(digest_documents(digest), EXAM_FOCUS, format_summaries)
+
+        # planning the sections
+        progress(15, "planning")
+        remaining = num_questions - len(banked)
+        sizes = _section_sizes(remaining)
+        topics = _plan_sections(digest, context, remaining, len(sizes), [q.topic for q in banked])
+        sections = list(zip(topics, sizes))
+
+        # generating them
+        print(f"[ExamGen] {len(banked)} questions from the bank, generating {len(sections)} sections concurrently...")
+        done = [0]
+        def on_done():
+            done[0] += 1
+            progress(20 + 65 * done[0] / len(sections), f"section {done[0]}/{len(sections)}")
+
+        progress(20, f"section 0/{len(sections)}")
+        results = _run_sections(user_id, sections, context, on_done)
+        questions = _dedupe_questions(banked + [q for section in results for q in section])
+
+        # one more section for whatever failed or was dropped as a duplicate
+        missing = num_questions - len(questions)
+        if missing > 0 and questions:
+            print(f"[ExamGen] Topping up {missing} questions...")
+            topic = ExamTopic(topic="any important topic of the course not covered yet")
+            try:
+                extra = _generate_section(user_id, topic, missing, context, [q.question_text for q in questions])
+                questions = _dedupe_questions(questions + extra)
+            except Exception as e:
+                print(f"[ExamGen] Top-up failed, continuing with {len(questions)} questions: {e}")
+    else:
+        print(f"[ExamGen] All {num_questions} questions served from the question bank.")
+
+    if not questions:
+        raise Exception("Failed to generate exam questions.")
+    exam_data = {"questions": [q.model_dump(include=QUESTION_FIELDS) for q in questions[:num_questions]]}
     
     # creating the pdf
+    progress(85, "pdf")
     download_url = create_exam_pdf(exam_data, user_id)
     
     print(f"[ExamGen] Exam generation complete. URL: {download_url}")
-    return download_url
\ No newline at end of file
+    return download_url
@@ -1,11 +1,16 @@
+import asyncio
 from typing import TypedDict, Literal
 from langgraph.graph import StateGraph, END
 from src.rag_system.vector_store import get_retriever
 from src.rag_system.chain import create_rag_chain, create_quiz_chain
-from langchain_google_genai import ChatGoogleGenerativeAI
+from src.rag_system.multi_query import MultiQueryRetriever
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from src.core.config import settings
+from langchain_core.runnables import RunnableLambda
+from src.core.lazy import LazyProvider
+from src.rag_system.models import get_chat_model
+from src.rag_system.question_bank import quiz_from_bank
+from src.rag_system.streaming import CACHED_ANSWER_NAME
 
 # defining the agent state
 class AgentState(TypedDict):
@@ -26,27 +31,65 @@ def rag_node(state: AgentState):
     question = state["question"]
     
     retriever = get_retriever(collection_name=user_id)
-    rag_chain = create_rag_chain(retriever)
+    rag_chain = create_rag_chain(retriever, user_id)
     
     answer = rag_chain.invoke({"question": question})
     
     return {"answer": answer, "next_node": "end"}
 
+async def arag_node(state: AgentState):
+    """
+    Async version of rag_node, used when the graph is run with ainvoke.
+    """
+    print("---NODE: Running RAG Chain---")
+    # connecting to the index is blocking network I/O
+    retriever = await asyncio.to_thread(get_retriever, state["user_id"])
+    rag_chain = create_rag_chain(retriever, state["user_id"])
+    
+    answer = await rag_chain.ainvoke({"question": state["question"]})
+    
+    return {"answer": answer, "next_node": "end"}
+
+# a quiz served from the question bank streams in one piece, like a cached answer
+serve_banked_quiz = RunnableLambda(lambda quiz: quiz, name=CACHED_ANSWER_NAME)
+
 def quiz_node(state: AgentState):
     """
-    Runs the Quiz chain to generate a quiz.
+    Runs the Quiz chain to generate a quiz
+    (or serves one from the question bank when it has enough questions).
     """
     print("---NODE: Running Quiz Generator---")
     user_id = state["user_id"]
     question = state["question"] # e.g., "5 question quiz on Chapter 1"
     
-    retriever = get_retriever(collection_name=user_id)
-    quiz_chain = create_quiz_chain(retriever)
+    banked = quiz_from_bank(user_id, question)
+    if banked is not None:
+        return {"quiz": serve_banked_quiz.invoke(banked), "next_node": "end"}
+    
+    # a quiz should cover the whole topic, not just the chunks closest to the request
+    retriever = MultiQueryRetriever(namespace=user_id)
+    quiz_chain = create_quiz_chain(retriever, user_id)
     
     quiz_json_str = quiz_chain.invoke({"question": question})
     
     return {"quiz": quiz_json_str, "next_node": "end"}
 
+async def aquiz_node(state: AgentState):
+    """
+    Async version of quiz_node, used when the graph is run with ainvoke.
+    """
+    print("---NODE: Running Quiz Generator---")
+    banked = await asyncio.to_thread(quiz_from_bank, state["user_id"], state["question"])
+    if banked is not None:
+        return {"quiz": await serve_banked_quiz.ainvoke(banked), "next_node": "end"}
+    
+    retriever = MultiQueryRetriever(namespace=state["user_id"])
+    quiz_chain = create_quiz_chain(retriever, state["user_id"])
+    
+    quiz_json_str = await quiz_chain.ainvoke({"question": state["question"]})
+    
+    return {"quiz": quiz_json_str, "next_node": "end"}
+
 # defining the router
 
 ROUTER_PROMPT_TEMPLATE = """
@@ -60,14 +103,12 @@ User Question:
 Your decision (rag or quiz):
 """
 router_prompt = PromptTemplate.from_template(ROUTER_PROMPT_TEMPLATE)
-router_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0,
-    google_api_key=settings.GOOGLE_API_KEY
-)
 
-# routing logic
-router_chain = router_prompt | router_llm | StrOutputParser()
+# routing logic (built on first use)
+router_chain = LazyProvider(
+    "router_chain",
+    lambda: router_prompt | get_chat_model(temperature=0) | StrOutputParser()
+)
 
 def router_node(state: AgentState):
     """
@@ -75,8 +116,18 @@ def router_node(state: AgentState):
     """
     print("---NODE: Routing---")
     question = state["question"]
-    decision = router_chain.invoke({"question": question})
-    
+    decision = router_chain.get().invoke({"question": question})
+    return _route_from_decision(decision)
+
+async def arouter_node(state: AgentState):
+    """
+    Async version of router_node, used when the graph is run with ainvoke.
+    """
+    print("---NODE: Routing---")
+    decision = await router_chain.get().ainvoke({"question": state["question"]})
+    return _route_from_decision(decision)
+
+def _route_from_decision(decision: str):
     if "quiz" in decision.lower():
         print("---DECISION: quiz---")
         return {"next_node": "quiz"}
@@ -93,9 +144,10 @@ def create_agent_graph():
 
     workflow = StateGraph(AgentState)
     
-    workflow.add_node("router", router_node)
-    workflow.add_node("rag_node", rag_node)
-    workflow.add_node("quiz_node", quiz_node)
+    # each node has a sync and a native async path (invoke / ainvoke)
+    workflow.add_node("router", RunnableLambda(router_node, afunc=arouter_node, name="router"))
+    workflow.add_node("rag_node", RunnableLambda(rag_node, afunc=arag_node, name="rag_node"))
+    workflow.add_node("quiz_node", RunnableLambda(quiz_node, afunc=aquiz_node, name="quiz_node"))
     
     workflow.set_entry_point("router")
     
@@ -115,8 +167,8 @@ def create_agent_graph():
     app = workflow.compile()
     return app
 
-# create a single runnable
-agent_runnable = create_agent_graph()
+# create a single runnable (compiled on first use)
+agent_runnable = LazyProvider("agent_graph", create_agent_graph)
 
 def get_agent_runnable():
-    return agent_runnable
\ No newline at end of file
+    return agent_runnable.get()
\ No newline at end of file
@@ -0,0 +1,28 @@
+import hashlib
+from langchain_core.documents import Document
+
+def content_hash(text: str) -> str:
+    """
+    Stable SHA-256 hex digest of a piece of text.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def chunk_id(doc: Document) -> str:
+    """
+    Content-addressed ID for a chunk: its text plus where it comes from (source,
+    page / start time). Re-uploading a document overwrites its vectors instead of
+    duplicating them, while the same text in two places (repeated headers,
+    boilerplate slides) keeps a vector, and a source label, for each.
+    """
+    location = "|".join(str(doc.metadata.get(key, "")) for key in ("source", "page", "start"))
+    return content_hash(f"{location}\n{doc.page_content}")
+
+def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    SHA-256 hex digest of a file's bytes, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
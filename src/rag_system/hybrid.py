@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any, List, Sequence
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.core.config import settings
+from src.rag_system.hashing import chunk_id
+from src.rag_system.keyword_index import keyword_index
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[Document]],
+    weights: Sequence[float] = None,
+    k: int = None,
+    limit: int = None
+) -> List[Document]:
+    """
+    Merges ranked lists of chunks: each chunk scores sum(weight / (k + rank))
+    over the lists it appears in. Chunks are matched by ID.
+    """
+    weights = weights or [1.0] * len(result_lists)
+    k = k or settings.HYBRID_RRF_K
+
+    scores, docs = {}, {}
+    for results, weight in zip(result_lists, weights):
+        for rank, doc in enumerate(results, start=1):
+            key = doc.id or chunk_id(doc)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+            docs.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:limit]]
+
+class HybridRetriever(BaseRetriever):
+    """
+    Dense (vector store) + keyword (BM25) retrieval for one namespace, fused with
+    weighted reciprocal rank fusion. Both sides fetch `candidates` chunks;
+    the best `k` fused chunks are returned.
+    """
+
+    vector_store: Any
+    namespace: str
+    k: int = 10
+    candidates: int = 20
+    dense_weight: float = 1.0
+    keyword_weight: float = 1.0
+
+    def _fuse(self, dense: List[Document], keyword: List[Document]) -> List[Document]:
+        return reciprocal_rank_fusion(
+            [dense, keyword],
+            weights=[self.dense_weight, self.keyword_weight],
+            limit=self.k
+        )
+
+    def _keyword_search(self, query: str) -> List[Document]:
+        # the keyword side is best-effort: dense results alone are still an answer
+        try:
+            return keyword_index.search(self.namespace, query, self.candidates)
+        except Exception as e:
+            print(f"[Hybrid] Keyword search failed for '{self.namespace}': {e}")
+            return []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = self.vector_store.similarity_search(query, k=self.candidates)
+        return self._fuse(dense, self._keyword_search(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense, keyword = await asyncio.gather(
+            self.vector_store.asimilarity_search(query, k=self.candidates),
+            asyncio.to_thread(self._keyword_search, query)
+        )
+        return self._fuse(dense, keyword)
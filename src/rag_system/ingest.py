@@ -0,0 +1,142 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+from pydantic import BaseModel
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.core.config import settings
+from src.rag_system.hashing import chunk_id
+
+# the metadata key the chunk text is stored under (same as langchain_pinecone's)
+TEXT_KEY = "text"
+
+class IngestReport(BaseModel):
+    chunks: int = 0
+    upserted: int = 0
+    skipped: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    cached: bool = False # True when the chunks came from the artifact cache
+
+    def combine(self, other: "IngestReport") -> "IngestReport":
+        """
+        Adds up two reports (e.g. from consecutive batches of a streamed ingest).
+        """
+        return IngestReport(
+            chunks=self.chunks + other.chunks,
+            upserted=self.upserted + other.upserted,
+            skipped=self.skipped + other.skipped,
+            batches=self.batches + other.batches,
+            embed_seconds=round(self.embed_seconds + other.embed_seconds, 3),
+            upsert_seconds=round(self.upsert_seconds + other.upsert_seconds, 3),
+            cached=self.cached and other.cached
+        )
+
+def _to_metadata(doc: Document) -> Dict[str, Any]:
+    """
+    Converts a chunk's metadata into something Pinecone accepts
+    (strings, numbers, booleans or lists of strings; no nulls).
+    """
+    metadata = {}
+    for key, value in doc.metadata.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, bool, int, float)):
+            metadata[key] = value
+        elif isinstance(value, (list, tuple)):
+            metadata[key] = [str(v) for v in value]
+        else:
+            metadata[key] = str(value)
+    metadata[TEXT_KEY] = doc.page_content
+    return metadata
+
+def _existing_ids(backend, ids: List[str], namespace: str) -> Set[str]:
+    """
+    Returns the subset of `ids` that are already stored in the namespace.
+    """
+    return backend.existing_ids(ids, namespace)
+
+def _upsert_with_retry(backend, records: List[Dict[str, Any]], namespace: str) -> float:
+    """
+    Upserts one batch, retrying with exponential backoff. Returns the time it took.
+    """
+    start = time.perf_counter()
+    for attempt in range(settings.UPSERT_MAX_RETRIES + 1):
+        try:
+            backend.upsert(records, namespace)
+            return time.perf_counter() - start
+        except Exception as e:
+            if attempt == settings.UPSERT_MAX_RETRIES:
+                raise
+            delay = settings.UPSERT_RETRY_BASE_DELAY * (2 ** attempt)
+            print(f"[Ingest] Upsert batch failed ({e}), retrying in {delay:.1f}s...")
+            time.sleep(delay)
+
+def ingest_documents(
+    docs: List[Document],
+    namespace: str,
+    backend,
+    embeddings: Embeddings,
+    vectors: Optional[Dict[str, List[float]]] = None
+) -> IngestReport:
+    """
+    Embeds and upserts chunks into a namespace of a VectorBackend.
+    - IDs are content hashes, so chunks that are already stored are skipped.
+    - `vectors` are precomputed embeddings by chunk ID (e.g. from the artifact
+      cache); only chunks without one are embedded.
+    - Chunks are embedded in batches of EMBED_BATCH_SIZE.
+    - Each embedded batch is upserted in the background (up to UPSERT_CONCURRENCY
+      at a time) while the next batch is being embedded.
+    """
+    report = IngestReport(chunks=len(docs))
+
+    # deduplicating by chunk ID (the same text at the same place, e.g. a file uploaded twice in one batch)
+    by_id: Dict[str, Document] = {}
+    for doc in docs:
+        by_id.setdefault(chunk_id(doc), doc)
+    ids = list(by_id)
+
+    batch_size = settings.EMBED_BATCH_SIZE
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    report.skipped = len(docs) - len(ids)
+
+    upsert_start = None
+    futures = []
+    with ThreadPoolExecutor(max_workers=settings.UPSERT_CONCURRENCY) as pool:
+        for batch_ids in batches:
+            # re-uploads: anything already in the namespace is a no-op
+            existing = _existing_ids(backend, batch_ids, namespace)
+            new_ids = [i for i in batch_ids if i not in existing]
+            report.skipped += len(existing)
+            if not new_ids:
+                continue
+
+            batch_vectors = {i: vectors[i] for i in new_ids if vectors and i in vectors}
+            to_embed = [i for i in new_ids if i not in batch_vectors]
+            if to_embed:
+                embed_start = time.perf_counter()
+                embedded = embeddings.embed_documents([by_id[i].page_content for i in to_embed])
+                batch_vectors.update(zip(to_embed, embedded))
+                report.embed_seconds += time.perf_counter() - embed_start
+
+            records = [
+                {"id": i, "values": batch_vectors[i], "metadata": _to_metadata(by_id[i])}
+                for i in new_ids
+            ]
+            if upsert_start is None:
+                upsert_start = time.perf_counter()
+            futures.append(pool.submit(_upsert_with_retry, backend, records, namespace))
+            report.batches += 1
+            report.upserted += len(records)
+
+        # surfacing the first failed batch (after its retries)
+        for future in futures:
+            future.result()
+
+    if upsert_start is not None:
+        report.upsert_seconds = time.perf_counter() - upsert_start
+
+    report.embed_seconds = round(report.embed_seconds, 3)
+    report.upsert_seconds = round(report.upsert_seconds, 3)
+    return report
@@ -0,0 +1,279 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.rag_system.hashing import chunk_id
+
+# standard BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# keeps "3.2.1"-style numbers (theorems, sections) as one token
+_TOKEN_RE = re.compile(r"\w+(?:\.\d+)*")
+
+# the most common english words; their postings would be as long as the namespace
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or that the "
+    "this to was were which will with what when where who how why do does".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class _NamespaceIndex:
+    """
+    In-memory BM25 index for one namespace. Postings are append-only arrays
+    (doc numbers + term frequencies), scored with numpy at query time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids: List[str] = [] # doc number -> chunk ID
+        self.numbers: Dict[str, int] = {} # chunk ID -> doc number
+        self.lengths = array("I")
+        self.total_length = 0
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = None # float32 copy of `lengths`, rebuilt after adds
+        # what has been read from the shared table (other processes add to it too)
+        self.max_rowid = 0
+        self.generation = 0
+        self.clears = 0
+
+    def add(self, doc_id: str, tokens: List[str]) -> bool:
+        if doc_id in self.numbers:
+            return False
+
+        number = len(self.ids)
+        self.ids.append(doc_id)
+        self.numbers[doc_id] = number
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        self._lengths = None
+
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = (array("I"), array("f"))
+            postings[0].append(number)
+            postings[1].append(count)
+        return True
+
+    def search(self, terms: List[str], k: int) -> List[Tuple[str, float]]:
+        """
+        The top `k` (chunk ID, score) pairs for the query terms.
+        """
+        n = len(self.ids)
+        if not n:
+            return []
+        if self._lengths is None:
+            self._lengths = np.array(self.lengths, dtype=np.float32)
+        lengths = self._lengths
+        avg_length = self.total_length / n or 1.0
+
+        scores = np.zeros(n, dtype=np.float32)
+        for term in dict.fromkeys(terms):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            docs = np.array(postings[0], dtype=np.int64)
+            tf = np.array(postings[1], dtype=np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / avg_length)
+            # a doc appears once per term, so plain fancy-index addition is safe
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.ids[i], float(scores[i])) for i in candidates]
+
+class KeywordIndex:
+    """
+    Per-namespace BM25 keyword index, for exact-term queries (formula names,
+    acronyms, theorem numbers) that dense retrieval misses.
+    Chunks are persisted in SQLite; each namespace's postings are built in
+    memory on first use. Every add bumps the namespace's generation, so an
+    in-memory index (in any process) catches up with new rows before its
+    next search. Only the `max_namespaces` most recently used namespaces
+    are kept in memory.
+    """
+
+    def __init__(self, path: str, max_namespaces: int):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                namespace TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                PRIMARY KEY (namespace, chunk_id)
+            );
+            CREATE TABLE IF NOT EXISTS backfilled (
+                namespace TEXT PRIMARY KEY
+            );
+            CREATE TABLE IF NOT EXISTS generations (
+                namespace TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL DEFAULT 0,
+                clears INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        self._conn.commit()
+
+        self._indexes = LRUCache(max_size=max_namespaces)
+        # held while a namespace is loaded, so adds can't slip past the load
+        self._namespace_locks: Dict[str, threading.Lock] = {}
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.fetchall()
+
+    def _namespace_lock(self, namespace: str) -> threading.Lock:
+        with self._lock:
+            return self._namespace_locks.setdefault(namespace, threading.Lock())
+
+    def _generation(self, namespace: str) -> Tuple[int, int]:
+        rows = self._execute("SELECT generation, clears FROM generations WHERE namespace = ?", (namespace,))
+        return rows[0] if rows else (0, 0)
+
+    def _bump_generation(self, namespace: str, cleared: bool = False):
+        # caller holds self._lock and commits
+        self._conn.execute(
+            "INSERT INTO generations (namespace, generation, clears) VALUES (?, 1, ?) "
+            "ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1, clears = clears + excluded.clears",
+            (namespace, int(cleared))
+        )
+
+    def _catch_up(self, namespace: str, index: _NamespaceIndex, generation: int):
+        """
+        Adds the namespace's rows the index hasn't read yet. Row IDs only grow
+        while the namespace isn't cleared, so "rowid > max_rowid" is exactly the new rows.
+        """
+        while True:
+            rows = self._execute(
+                "SELECT rowid, chunk_id, text FROM chunks WHERE namespace = ? AND rowid > ? "
+                "ORDER BY rowid LIMIT 1000",
+                (namespace, index.max_rowid)
+            )
+            if not rows:
+                break
+            with index.lock:
+                for rowid, doc_id, text in rows:
+                    index.add(doc_id, tokenize(text))
+                index.max_rowid = rows[-1][0]
+        index.generation = generation
+
+    def _load(self, namespace: str) -> _NamespaceIndex:
+        index = _NamespaceIndex()
+        # read before the rows, so an add that lands mid-load is caught up on next use
+        index.generation, index.clears = self._generation(namespace)
+        self._catch_up(namespace, index, index.generation)
+        print(f"[KeywordIndex] Loaded '{namespace}' ({len(index.ids)} chunks, {len(index.postings)} terms).")
+        return index
+
+    def _get_index(self, namespace: str) -> _NamespaceIndex:
+        generation, clears = self._generation(namespace)
+        index = self._indexes.get(namespace)
+        if index is not None and index.generation == generation:
+            return index
+        with self._namespace_lock(namespace):
+            index = self._indexes.get(namespace)
+            if index is None or index.clears != clears:
+                # never loaded, or cleared (possibly by another process) since
+                index = self._load(namespace)
+                self._indexes.put(namespace, index)
+            elif index.generation != generation:
+                self._catch_up(namespace, index, generation)
+        return index
+
+    def add(self, namespace: str, docs: Iterable[Document]):
+        """
+        Indexes chunks (already indexed ones are skipped).
+        """
+        rows = {}
+        for doc in docs:
+            rows[doc.id or chunk_id(doc)] = doc
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO chunks (namespace, chunk_id, text, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (namespace, doc_id, doc.page_content, json.dumps(doc.metadata, default=str))
+                    for doc_id, doc in rows.items()
+                ]
+            )
+            self._bump_generation(namespace)
+            self._conn.commit()
+
+        # namespaces that aren't in memory pick the new rows up when they're loaded
+        if self._indexes.get(namespace) is not None:
+            self._get_index(namespace)
+
+    def search(self, namespace: str, query: str, k: int) -> List[Document]:
+        """
+        The `k` best BM25 matches for the query, best first.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        index = self._get_index(namespace)
+        with index.lock:
+            hits = index.search(terms, k)
+        if not hits:
+            return []
+
+        ids = [doc_id for doc_id, _ in hits]
+        rows = self._execute(
+            f"SELECT chunk_id, text, metadata FROM chunks WHERE namespace = ? "
+            f"AND chunk_id IN ({','.join('?' * len(ids))})",
+            (namespace, *ids)
+        )
+        found = {doc_id: (text, metadata) for doc_id, text, metadata in rows}
+        return [
+            Document(id=doc_id, page_content=found[doc_id][0], metadata=json.loads(found[doc_id][1]))
+            for doc_id in ids
+            if doc_id in found
+        ]
+
+    def clear(self, namespace: str):
+        with self._namespace_lock(namespace):
+            with self._lock:
+                self._conn.execute("DELETE FROM chunks WHERE namespace = ?", (namespace,))
+                self._bump_generation(namespace, cleared=True)
+                self._conn.commit()
+            self._indexes.pop(namespace)
+
+    def is_backfilled(self, namespace: str) -> bool:
+        return bool(self._execute("SELECT 1 FROM backfilled WHERE namespace = ?", (namespace,)))
+
+    def mark_backfilled(self, namespace: str):
+        self._execute("INSERT OR IGNORE INTO backfilled (namespace) VALUES (?)", (namespace,))
+
+    def stats(self) -> dict:
+        return {"namespaces_in_memory": self._indexes.stats()}
+
+keyword_index = KeywordIndex(
+    path=os.path.join(settings.DATA_DIR, "keyword_index.sqlite"),
+    max_namespaces=settings.KEYWORD_INDEX_MAX_NAMESPACES
+)
@@ -1,16 +1,15 @@
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List, Optional
+from typing import Callable, Iterator, List, Optional
 from langchain_core.documents import Document
 import os
 import re
+import shutil
+import tempfile
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled
-import yt_dlp
-import whisper
-
-print("[Whisper] Initializing Whisper transcription model...")
-whisper_model = whisper.load_model("base")
-print("[Whisper] Whisper model loaded.")
+from src.core.config import settings
+from src.core.executors import get_pool
+from src.core.jobs import JobCancelled
+from src.rag_system.transcription import TranscriptSegment, iter_transcript_segments, chunk_segments
 
 def get_youtube_video_id(url: str) -> Optional[str]:
     """Extracts video ID from various YouTube URL formats."""
@@ -18,109 +17,163 @@ def get_youtube_video_id(url: str) -> Optional[str]:
     match = re.search(pattern, url)
     return match.group(1) if match else None
 
+def _open_pdf(file_path: str):
+    # imported here so API-only workers don't pay for it at startup
+    from pypdf import PdfReader
+
+    # pages are parsed lazily, only when they're accessed
+    reader = PdfReader(file_path)
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ValueError("The PDF is password-protected.")
+    return reader
+
+def _parse_page_range(file_path: str, start: int, end: int, source: str) -> List[Document]:
+    """
+    Runs in a PDF worker process: extracts and splits pages [start, end).
+    Pages are split one at a time, same as splitting PyPDFLoader's per-page documents.
+    """
+    reader = _open_pdf(file_path)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000, 
+        chunk_overlap=200
+    )
+    
+    chunks = []
+    for page_number in range(start, end):
+        text = reader.pages[page_number].extract_text() or ""
+        if not text.strip():
+            continue
+        page = Document(page_content=text, metadata={"source": source, "page": page_number})
+        chunks.extend(
+            doc for doc in text_splitter.split_documents([page])
+            if doc.page_content and doc.page_content.strip()
+        )
+    return chunks
+
+def iter_pdf_chunks(
+    file_path: str,
+    source: Optional[str] = None,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Iterator[Document]:
+    """
+    Streams a PDF's chunks in page order. Page ranges of PDF_PAGES_PER_TASK
+    are parsed in parallel in the PDF process pool, with a bounded number in
+    flight, so memory stays flat however long the PDF is.
+    """
+    source = source or file_path
+    progress = progress or (lambda percent, stage: None)
+
+    page_count = len(_open_pdf(file_path).pages)
+    if not page_count:
+        raise ValueError("PDF loaded 0 documents. The file might be empty, corrupted, or password-protected.")
+    
+    pages_per_task = max(1, settings.PDF_PAGES_PER_TASK)
+    ranges = [(i, min(i + pages_per_task, page_count)) for i in range(0, page_count, pages_per_task)]
+    
+    pool = get_pool("pdf")
+    window = max(1, pool.max_workers * 2)
+    futures = []
+    next_range = 0
+    count = 0
+    
+    for done in range(len(ranges)):
+        while next_range < len(ranges) and len(futures) < window:
+            start, end = ranges[next_range]
+            futures.append(pool.submit(_parse_page_range, file_path, start, end, source))
+            next_range += 1
+        
+        for doc in futures.pop(0).result():
+            count += 1
+            yield doc
+        progress(100 * (done + 1) / len(ranges), "parsing")
+    
+    if not count:
+        raise ValueError("Failed to split documents. The PDF may be image-based (scanned) and contain no extractable text.")
+    
+    print(f"[Loader] Loaded, split, and filtered {count} documents from {file_path} ({page_count} pages)")
+
 def load_and_split_pdf(file_path: str) -> List[Document]:
     """
     Loads a PDF from the given file path and splits it into chunks.
+    (Uses the PDF pool itself, so don't call it from inside that pool.)
     """
-
     try:
-        # loading the pdf
-        loader = PyPDFLoader(file_path)
-        documents = loader.load()
-        
-        if not documents:
-            raise ValueError("PDF loaded 0 documents. The file might be empty, corrupted, or password-protected.")
-        
-        # splitting the text
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, 
-            chunk_overlap=200
-        )
-        split_docs = text_splitter.split_documents(documents)
-        
-        if not split_docs:
-            raise ValueError("Failed to split documents. The PDF may be image-based (scanned) and contain no extractable text.")
-            
-        
-        filtered_docs = [
-            doc for doc in split_docs if doc.page_content and doc.page_content.strip()
-        ]
-        
-        if not filtered_docs:
-            raise ValueError("PDF content was filtered out. The document may contain only whitespace, headers/footers, or other non-substantive text.")
-        
-        print(f"[Loader] Loaded, split, and filtered {len(filtered_docs)} documents from {file_path}")
-        
-        return filtered_docs
+        return list(iter_pdf_chunks(file_path))
         
     except Exception as e:
         print(f"Error loading/splitting PDF {file_path}: {e}")
         raise e
     
-def transcribe_and_split_audio(file_path: str, source_filename: str) -> List[Document]:
+def iter_audio_chunks(
+    file_path: str,
+    source_filename: str,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Iterator[Document]:
     """
-    Transcribes an audio file using Whisper and splits the text into chunks.
+    Transcribes an audio file and yields timestamped chunks as soon as
+    each one is decoded (the transcription runs in parallel in the background).
     """
+    print(f"[Whisper] Transcribing {file_path}...")
+    count = 0
+    for doc in chunk_segments(iter_transcript_segments(file_path, progress), source_filename):
+        count += 1
+        yield doc
 
-    try:
-        # transcribing the audio
-        print(f"[Whisper] Transcribing {file_path}...")
-        transcription_result = whisper_model.transcribe(file_path, fp16=False)
-        full_text = transcription_result.get("text")
-        
-        if not full_text or not full_text.strip():
-            raise ValueError("Audio transcription resulted in empty text. The file might be silent or corrupted.")
-        
-        print("[Whisper] Transcription complete.")
-        
-        # splitting the text
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, 
-            chunk_overlap=200
-        )
-        
-        doc = Document(
-            page_content=full_text,
-            metadata={"source": source_filename}
-        )
-        
-        split_docs = text_splitter.split_documents([doc])
-        
-        print(f"[Loader] Transcribed and split {len(split_docs)} documents from {file_path}")
-        return split_docs
+    if not count:
+        raise ValueError("Audio transcription resulted in empty text. The file might be silent or corrupted.")
+    print(f"[Loader] Transcribed {count} timestamped chunks from {file_path}")
 
+def transcribe_and_split_audio(
+    file_path: str,
+    source_filename: str,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> List[Document]:
+    """
+    Transcribes an audio file using Whisper and splits it into timestamped chunks.
+    """
+    try:
+        return list(iter_audio_chunks(file_path, source_filename, progress))
     except Exception as e:
         print(f"Error transcribing audio {file_path}: {e}")
         raise e
     
-def fetch_youtube_transcript(video_id: str) -> Optional[str]:
+def fetch_youtube_transcript(video_id: str) -> Optional[List[TranscriptSegment]]:
     """
     Tries to fetch the transcript directly from YouTube.
-    Returns the text string if found, or None.
+    Returns its timestamped segments if found, or None.
     """
     
     print(f"[YouTube] Attempting to fetch transcript for {video_id}...")
     try:
         transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=['en'])
         
-        full_text = " ".join([t['text'] for t in transcript_list])
+        segments = [
+            TranscriptSegment(start=t['start'], end=t['start'] + t.get('duration', 0), text=t['text'].strip())
+            for t in transcript_list
+        ]
         print("[YouTube] Transcript fetched successfully!")
-        return full_text
+        return segments
     except Exception as e:
         print(f"[YouTube] No existing transcript found: {e}")
         return None
 
 # the slow path (download + whisper)
-def download_youtube_audio(url: str, output_dir: str = "temp_uploads") -> str:
+def download_youtube_audio(url: str, output_dir: str = settings.UPLOAD_DIR) -> str:
     """
     Downloads the audio of a YouTube video using yt-dlp.
-    Returns the path to the downloaded file.
+    Returns the path to the downloaded file, which is in a directory of its own
+    (so two jobs for the same video don't share, or delete, each other's file);
+    the caller removes that directory when done.
     """
+    import yt_dlp # slow to import, and only needed on the Whisper fallback path
+
     print(f"[YouTube] Downloading audio from {url}...")
+    os.makedirs(output_dir, exist_ok=True)
+    download_dir = tempfile.mkdtemp(prefix="youtube-", dir=output_dir)
     
     ydl_opts = {
         'format': 'bestaudio/best',
-        'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
+        'outtmpl': os.path.join(download_dir, '%(id)s.%(ext)s'),
         'postprocessors': [{
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
@@ -130,51 +183,72 @@ def download_youtube_audio(url: str, output_dir: str = "temp_uploads") -> str:
         'no_warnings': True
     }
 
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(url, download=True)
-        filename = ydl.prepare_filename(info)
-        final_filename = filename.rsplit('.', 1)[0] + '.mp3'
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+            filename = ydl.prepare_filename(info)
+            final_filename = filename.rsplit('.', 1)[0] + '.mp3'
+    except BaseException:
+        shutil.rmtree(download_dir, ignore_errors=True)
+        raise
         
     print(f"[YouTube] Download complete: {final_filename}")
     return final_filename
 
-# the main handler function
-def process_youtube_video(url: str) -> List[Document]:
+# the main handler functions
+def iter_youtube_chunks(
+    url: str,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Iterator[Document]:
     """
-    Orchestrates the YouTube processing:
+    Orchestrates the YouTube processing, yielding timestamped chunks:
     1. Try fetching transcript (Fast).
-    2. If fail, download audio & Whisper it (Slow).
+    2. If fail, download audio & Whisper it (Slow, streamed as it's decoded).
     """
     video_id = get_youtube_video_id(url)
     if not video_id:
         raise ValueError("Invalid YouTube URL")
 
+    source = f"YouTube: {url}"
+    count = 0
+
     # trying fast path
-    transcript_text = fetch_youtube_transcript(video_id)
+    segments = fetch_youtube_transcript(video_id)
 
-    # if fast path failed, try slow path
-    if not transcript_text:
+    if segments:
+        for doc in chunk_segments(segments, source):
+            count += 1
+            yield doc
+    else:
+        # slow path
         print("[YouTube] Falling back to Whisper transcription...")
+        audio_path = None
         try:
             audio_path = download_youtube_audio(url)
             
-            transcription = whisper_model.transcribe(audio_path, fp16=False)
-            transcript_text = transcription.get("text")
-            
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+            # whisper is bounded by its own pool so concurrent videos queue up
+            for doc in chunk_segments(iter_transcript_segments(audio_path, progress), source):
+                count += 1
+                yield doc
                 
+        except JobCancelled:
+            # a user cancel, not a failure
+            raise
         except Exception as e:
             raise Exception(f"Failed to process YouTube video: {e}")
+        
+        finally:
+            if audio_path:
+                shutil.rmtree(os.path.dirname(audio_path), ignore_errors=True)
 
-    if not transcript_text:
+    if not count:
          raise ValueError("Could not extract any text from this video.")
 
-    # splitting text into chunks
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    doc = Document(
-        page_content=transcript_text,
-        metadata={"source": f"YouTube: {url}"}
-    )
-    
-    return text_splitter.split_documents([doc])
\ No newline at end of file
+def process_youtube_video(
+    url: str,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> List[Document]:
+    """
+    Processes a whole YouTube video into timestamped chunks.
+    """
+    return list(iter_youtube_chunks(url, progress))
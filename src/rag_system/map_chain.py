@@ -1,24 +1,19 @@
-from src.core.config import settings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableLambda
-from src.rag_system.vector_store import get_all_documents
+from src.rag_system.digest import create_digest_chain
+from src.rag_system.models import get_chat_model
+from src.core.lazy import LazyProvider
 import re
 
-# setup: llm
-llm_pro = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0.1,
-    google_api_key=settings.GOOGLE_API_KEY
-)
+# setup: llm settings (the client is created on first use)
+LLM_TEMPERATURE = 0.1
 
-# helper function
-def _format_context(docs: list) -> str:
-    """
-    Combines all documents into a single massive string.
-    """
-    return "\n\n---\n\n".join([doc.page_content for doc in docs])
+# what the map-reduce stage should keep when condensing a large course
+MAP_FOCUS = (
+    "the core concepts and how they relate to each other "
+    "(e.g. 'A is minimized by B', 'B is controlled by C')."
+)
 
 # the concept map prompt
 MAP_PROMPT = """
@@ -65,23 +60,18 @@ def _clean_dot_output(dot_string: str) -> str:
 
 # the full map chain
 def create_map_chain():
-    chain = (
-        {
-            "context": (
-                (lambda x: x["user_id"])
-                | RunnableLambda(get_all_documents)
-                | RunnableLambda(_format_context)
-            )
-        }
-        | PromptTemplate.from_template(MAP_PROMPT)
-        | llm_pro
+    final_chain = (
+        PromptTemplate.from_template(MAP_PROMPT)
+        | get_chat_model(temperature=LLM_TEMPERATURE)
         | StrOutputParser()
         | RunnableLambda(_clean_dot_output)
     )
+    # runs off the per-namespace course digest; unchanged courses are served from cache
+    chain = create_digest_chain("concept_map", MAP_FOCUS, final_chain)
     return chain
 
-# runnable
-map_runnable = create_map_chain()
+# runnable (built on first use)
+map_runnable = LazyProvider("map_chain", create_map_chain)
 
 def get_map_runnable():
-    return map_runnable
\ No newline at end of file
+    return map_runnable.get()
\ No newline at end of file
@@ -0,0 +1,178 @@
+from typing import Callable, List
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
+from src.core.config import settings
+from src.core.lazy import LazyProvider
+from src.rag_system.models import get_chat_model
+
+# setup: llm settings (deterministic, it only writes notes)
+LLM_TEMPERATURE = 0
+
+# the map step: condense one batch of chunks into notes
+MAP_PROMPT = """
+You are condensing one part of a student's course materials (slides, notes and lecture transcripts).
+Write dense, factual study notes for this part only.
+
+Focus on: {focus}
+
+Keep source names, key terms, definitions, formulas and any explicit cues from the lecturer
+(e.g. "this is important", "this will be on the exam"). Do not add anything that isn't in the text.
+
+COURSE MATERIALS (PART):
+<CONTEXT>
+{context}
+</CONTEXT>
+
+Notes:
+"""
+
+# the reduce step: merge several sets of notes into one
+REDUCE_PROMPT = """
+You are merging several sets of study notes taken from different parts of the same course.
+Combine them into one set of notes, merging duplicates and keeping every distinct point.
+
+Focus on: {focus}
+
+When the same topic appears in several sets, say so (repetition is a signal of importance).
+Keep source names, key terms, definitions, formulas and lecturer cues.
+
+NOTES:
+<CONTEXT>
+{context}
+</CONTEXT>
+
+Merged notes:
+"""
+
+map_chain = LazyProvider(
+    "map_reduce_map_chain",
+    lambda: PromptTemplate.from_template(MAP_PROMPT) | get_chat_model(temperature=LLM_TEMPERATURE) | StrOutputParser()
+)
+reduce_chain = LazyProvider(
+    "map_reduce_reduce_chain",
+    lambda: PromptTemplate.from_template(REDUCE_PROMPT) | get_chat_model(temperature=LLM_TEMPERATURE) | StrOutputParser()
+)
+
+NOTES_SEPARATOR = "\n\n---\n\n"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token), good enough for budgeting.
+    """
+    return len(text) // 4 + 1
+
+def batch_by_tokens(texts: List[str], token_budget: int) -> List[List[str]]:
+    """
+    Greedily groups texts into batches that each fit in `token_budget`.
+    A single text that is larger than the budget gets a batch of its own.
+    """
+    batches, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > token_budget:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _reduce_groups(partials: List[str], token_budget: int) -> List[List[str]]:
+    """
+    Groups partial notes for the next reduce level. Partials too large to share
+    a batch are paired up (never chained further, so a group is at most two
+    oversized partials), which still shrinks the tree every level.
+    """
+    merged: List[List[str]] = []
+    for group in batch_by_tokens(partials, token_budget):
+        # batches are greedy, so only two singletons can be worth combining
+        if merged and len(group) == 1 and len(merged[-1]) == 1:
+            merged[-1].extend(group)
+        else:
+            merged.append(group)
+    return merged
+
+def _inputs(batches: List[List[str]], focus: str) -> List[dict]:
+    return [{"context": NOTES_SEPARATOR.join(batch), "focus": focus} for batch in batches]
+
+def map_reduce(texts: List[str], focus: str) -> str:
+    """
+    Hierarchical summarization of a whole course:
+    1. texts are grouped into token-budgeted batches and mapped to notes concurrently,
+    2. notes are merged in a tree (also concurrently) until one set is left.
+    At most MAP_REDUCE_MAX_CONCURRENCY LLM calls are in flight at a time.
+    """
+    config = {"max_concurrency": settings.MAP_REDUCE_MAX_CONCURRENCY}
+    budget = settings.MAP_REDUCE_BATCH_TOKENS
+
+    batches = batch_by_tokens(texts, budget)
+    print(f"[MapReduce] Mapping {len(texts)} chunks in {len(batches)} batches...")
+    partials = map_chain.get().batch(_inputs(batches, focus), config=config)
+
+    level = 1
+    while len(partials) > 1:
+        groups = _reduce_groups(partials, budget)
+        print(f"[MapReduce] Reduce level {level}: {len(partials)} -> {len(groups)}")
+        partials = reduce_chain.get().batch(_inputs(groups, focus), config=config)
+        level += 1
+
+    return partials[0] if partials else ""
+
+async def amap_reduce(texts: List[str], focus: str) -> str:
+    """
+    Async version of map_reduce().
+    """
+    config = {"max_concurrency": settings.MAP_REDUCE_MAX_CONCURRENCY}
+    budget = settings.MAP_REDUCE_BATCH_TOKENS
+
+    batches = batch_by_tokens(texts, budget)
+    print(f"[MapReduce] Mapping {len(texts)} chunks in {len(batches)} batches...")
+    partials = await map_chain.get().abatch(_inputs(batches, focus), config=config)
+
+    level = 1
+    while len(partials) > 1:
+        groups = _reduce_groups(partials, budget)
+        print(f"[MapReduce] Reduce level {level}: {len(partials)} -> {len(groups)}")
+        partials = await reduce_chain.get().abatch(_inputs(groups, focus), config=config)
+        level += 1
+
+    return partials[0] if partials else ""
+
+def _fits_directly(context: str) -> bool:
+    return estimate_tokens(context) <= settings.DIRECT_CONTEXT_TOKENS
+
+def condense_documents(docs: List[Document], focus: str, format_context: Callable[[list], str]) -> str:
+    """
+    Returns the context string for a whole-course prompt.
+    Small courses are passed through as-is (via `format_context`);
+    large ones are condensed with map_reduce().
+    """
+    context = format_context(docs)
+    if _fits_directly(context):
+        return context
+    return map_reduce([format_context([doc]) for doc in docs], focus)
+
+async def acondense_documents(docs: List[Document], focus: str, format_context: Callable[[list], str]) -> str:
+    """
+    Async version of condense_documents().
+    """
+    context = format_context(docs)
+    if _fits_directly(context):
+        return context
+    return await amap_reduce([format_context([doc]) for doc in docs], focus)
+
+def create_condense_runnable(focus: str, format_context: Callable[[list], str]) -> Runnable:
+    """
+    A runnable (docs -> context string) with both sync and async paths,
+    for use inside the whole-course chains.
+    """
+    def _condense(docs: List[Document]) -> str:
+        return condense_documents(docs, focus, format_context)
+
+    async def _acondense(docs: List[Document]) -> str:
+        return await acondense_documents(docs, focus, format_context)
+
+    return RunnableLambda(_condense, afunc=_acondense, name="condense_course")
@@ -0,0 +1,94 @@
+import os
+import threading
+from typing import Dict, List, Tuple
+from langchain_core.embeddings import Embeddings
+from src.core.config import settings
+from src.core.lazy import LazyProvider
+
+# models are loaded on first use, so API-only workers never pay for them
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+def _whisper_threads() -> int:
+    # each transcription worker process gets its share of the cores
+    if settings.TRANSCRIPTION_THREADS_PER_WORKER > 0:
+        return settings.TRANSCRIPTION_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // max(1, settings.WHISPER_POOL_WORKERS))
+
+def _load_whisper():
+    size = settings.WHISPER_MODEL_SIZE
+    threads = _whisper_threads()
+
+    if settings.TRANSCRIPTION_BACKEND == "faster-whisper":
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("TRANSCRIPTION_BACKEND is 'faster-whisper' but faster-whisper is not installed.")
+        print(f"[Whisper] Initializing faster-whisper '{size}' model ({threads} threads)...")
+        return WhisperModel(size, device="cpu", compute_type="int8", cpu_threads=threads)
+
+    import torch
+    import whisper # pulls in torch, so it's imported lazily too
+    torch.set_num_threads(threads)
+    print(f"[Whisper] Initializing Whisper '{size}' model ({threads} threads)...")
+    return whisper.load_model(size)
+
+def _load_embedding_model():
+    from langchain_huggingface import HuggingFaceEmbeddings
+    print("[Embeddings] Initializing HuggingFace embeddings...")
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'}
+    )
+
+def _load_reranker():
+    from sentence_transformers import CrossEncoder
+    print(f"[Reranker] Initializing cross-encoder '{settings.RERANK_MODEL}'...")
+    return CrossEncoder(settings.RERANK_MODEL, device="cpu", max_length=512)
+
+whisper_provider = LazyProvider("whisper", _load_whisper)
+embedding_provider = LazyProvider("embeddings", _load_embedding_model)
+reranker_provider = LazyProvider("reranker", _load_reranker)
+
+def get_whisper_model():
+    return whisper_provider.get()
+
+def get_embedding_model() -> Embeddings:
+    return embedding_provider.get()
+
+def get_reranker_model():
+    return reranker_provider.get()
+
+class LazyEmbeddings(Embeddings):
+    """
+    An Embeddings object that only loads the real model when it's first used.
+    """
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_embedding_model().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_embedding_model().embed_query(text)
+
+# chat models, one client per (model, temperature)
+_chat_models: Dict[Tuple[str, float], object] = {}
+_chat_models_lock = threading.Lock()
+
+def get_chat_model(temperature: float, model: str = "gemini-2.5-flash"):
+    """
+    Returns a shared ChatGoogleGenerativeAI client, created on first use.
+    """
+    key = (model, temperature)
+    if key not in _chat_models:
+        with _chat_models_lock:
+            if key not in _chat_models:
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                _chat_models[key] = ChatGoogleGenerativeAI(
+                    model=model,
+                    temperature=temperature,
+                    google_api_key=settings.GOOGLE_API_KEY
+                )
+    return _chat_models[key]
+
+# so warm_up(["llm"]) can pre-create the default client
+llm_provider = LazyProvider("llm", lambda: get_chat_model(temperature=0))
@@ -0,0 +1,98 @@
+import asyncio
+import re
+from typing import List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from src.core.cache import LRUCache
+from src.core.config import settings
+from src.core.lazy import LazyProvider
+from src.rag_system.models import get_chat_model
+from src.rag_system.vector_store import multi_query_search
+
+# expanding a topic into sub-queries
+EXPANSION_PROMPT = """
+A student wants to be tested on the topic below, from their own course materials.
+Write {count} short search queries that together cover the different parts of this topic
+(key definitions, main results, methods, examples, common pitfalls).
+The request may include instructions (number of questions, format): ignore those, only the subject matters.
+
+Topic / request:
+{topic}
+
+Return one query per line, with no numbering or extra text.
+"""
+
+expansion_chain = LazyProvider(
+    "query_expansion_chain",
+    lambda: PromptTemplate.from_template(EXPANSION_PROMPT) | get_chat_model(temperature=0) | StrOutputParser()
+)
+
+# run detached from the caller's callbacks, so progress streams don't mistake
+# the sub-queries for answer tokens
+_DETACHED = {"callbacks": []}
+
+# the same quiz topics get requested over and over
+_expansions = LRUCache(max_size=settings.MULTI_QUERY_CACHE_SIZE)
+
+def _parse_queries(text: str, topic: str, count: int) -> List[str]:
+    queries = [topic]
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line).strip().strip('"')
+        if line:
+            queries.append(line)
+    return list(dict.fromkeys(queries))[:count + 1]
+
+def expand_queries(topic: str, count: int = None) -> List[str]:
+    """
+    The topic plus up to `count` sub-queries covering it. Falls back to just
+    the topic if the expansion fails, so retrieval never depends on it.
+    """
+    count = count or settings.MULTI_QUERY_COUNT
+    cached = _expansions.get((topic, count))
+    if cached is not None:
+        return cached
+    try:
+        text = expansion_chain.get().invoke({"topic": topic, "count": count}, config=_DETACHED)
+        queries = _parse_queries(text, topic, count)
+    except Exception as e:
+        print(f"[MultiQuery] Expansion failed, using the topic only: {e}")
+        return [topic]
+    _expansions.put((topic, count), queries)
+    return queries
+
+async def aexpand_queries(topic: str, count: int = None) -> List[str]:
+    count = count or settings.MULTI_QUERY_COUNT
+    cached = _expansions.get((topic, count))
+    if cached is not None:
+        return cached
+    try:
+        text = await expansion_chain.get().ainvoke({"topic": topic, "count": count}, config=_DETACHED)
+        queries = _parse_queries(text, topic, count)
+    except Exception as e:
+        print(f"[MultiQuery] Expansion failed, using the topic only: {e}")
+        return [topic]
+    _expansions.put((topic, count), queries)
+    return queries
+
+class MultiQueryRetriever(BaseRetriever):
+    """
+    Broad-coverage retrieval for one namespace (quizzes, exam sections):
+    the query is expanded into sub-queries, which are searched together
+    with multi_query_search().
+    """
+
+    namespace: str
+    k: Optional[int] = None
+    limit: Optional[int] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return multi_query_search(self.namespace, expand_queries(query), self.k, self.limit)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        queries = await aexpand_queries(query)
+        return await asyncio.to_thread(multi_query_search, self.namespace, queries, self.k, self.limit)
@@ -1,29 +1,12 @@
-from src.core.config import settings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnableLambda
-from src.rag_system.vector_store import get_all_documents
+from src.rag_system.digest import create_digest_chain
+from src.rag_system.models import get_chat_model
+from src.core.lazy import LazyProvider
 
-# setup: llm
+# setup: llm settings (the client is created on first use)
 
-llm_pro = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0.2,
-    google_api_key=settings.GOOGLE_API_KEY
-)
-
-# helper function to format text
-def _format_context(docs: list) -> str:
-    """
-    Helper function to combine retrieved documents into a single string.
-    We add metadata (source file) to help the AI.
-    """
-    formatted_context = ""
-    for doc in docs:
-        source = doc.metadata.get('source', 'Unknown')
-        formatted_context += f"[Source: {source}]\n{doc.page_content}\n\n---\n\n"
-    return formatted_context
+LLM_TEMPERATURE = 0.2
 
 # the prioritization prompt
 PRIORITIZE_PROMPT = """
@@ -48,29 +31,26 @@ Based on your analysis, return a ranked list of the most important topics. For e
 Format your response in Markdown.
 """
 
-final_prompt_chain = (
-    PromptTemplate.from_template(PRIORITIZE_PROMPT)
-    | llm_pro
-    | StrOutputParser()
+# what the map-reduce stage should keep when condensing a large course
+PRIORITIZE_FOCUS = (
+    "topics and how important they are: repetition across sources, how long the lecturer "
+    "spends on them, explicit cues like 'this is important' or 'this will be on the exam', "
+    "and major headings in the slides."
 )
 
 # the full prioritization chain
 def create_prioritize_chain():
-    
-    chain = (
-        {
-            "context": (
-                (lambda x: x["user_id"])
-                | RunnableLambda(get_all_documents)
-                | RunnableLambda(_format_context)
-            )
-        }
-        | final_prompt_chain
+    final_prompt_chain = (
+        PromptTemplate.from_template(PRIORITIZE_PROMPT)
+        | get_chat_model(temperature=LLM_TEMPERATURE)
+        | StrOutputParser()
     )
+    # runs off the per-namespace course digest; unchanged courses are served from cache
+    chain = create_digest_chain("prioritize", PRIORITIZE_FOCUS, final_prompt_chain)
     return chain
 
-# runnable
-prioritize_runnable = create_prioritize_chain()
+# runnable (built on first use)
+prioritize_runnable = LazyProvider("prioritize_chain", create_prioritize_chain)
 
 def get_prioritize_runnable():
-    return prioritize_runnable
\ No newline at end of file
+    return prioritize_runnable.get()
\ No newline at end of file
@@ -0,0 +1,426 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Literal, Optional, Set
+from pydantic import BaseModel, model_validator
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from src.core.config import settings
+from src.core.lazy import LazyProvider
+from src.rag_system.hashing import content_hash
+from src.rag_system.context import format_chunk, drop_near_duplicates
+from src.rag_system.models import get_chat_model
+from src.rag_system.vector_store import get_all_documents, multi_query_search, register_namespace_listener
+
+class ExamQuestion(BaseModel):
+    """
+    One multiple-choice question, as quizzes and exams return it.
+    """
+    question_text: str
+    options: List[str]
+    correct_answer: str
+
+    @model_validator(mode="after")
+    def _check_options(self):
+        if len(self.options) != 4 or len(set(self.options)) != 4:
+            raise ValueError("a question needs four distinct options")
+        if self.correct_answer not in self.options:
+            raise ValueError("correct_answer must be one of the options")
+        return self
+
+# what quizzes and exams return of a question (not the bank's own tags)
+QUESTION_FIELDS = set(ExamQuestion.model_fields)
+
+class BankQuestion(ExamQuestion):
+    topic: str
+    difficulty: Literal["easy", "medium", "hard"] = "medium"
+    sources: List[int] = [] # numbers of the passages the question is based on
+
+class BankBatch(BaseModel):
+    questions: List[BankQuestion]
+
+# writing questions for the bank, a few passages at a time
+BANK_PROMPT = """
+You are a University Professor building a bank of exam questions from a student's course materials.
+Based *only* on the numbered passages below, write up to **{count}** high-quality, unique multiple-choice questions.
+
+**Instructions:**
+1.  Each question must have exactly four options.
+2.  One option must be clearly correct based on the passages; "correct_answer" must repeat it exactly.
+3.  The other three options must be plausible but incorrect "distractors".
+4.  "topic" is a short name for what the question tests (e.g. "Gradient descent").
+5.  "difficulty" is "easy" (recall), "medium" (understanding) or "hard" (application, multi-step).
+6.  "sources" lists the numbers of the passages the question is based on.
+7.  Skip passages with nothing worth testing (titles, logistics, references).
+
+**PASSAGES:**
+{context}
+"""
+
+bank_chain = LazyProvider(
+    "question_bank_chain",
+    lambda: PromptTemplate.from_template(BANK_PROMPT) | get_chat_model(temperature=0.3).with_structured_output(BankBatch)
+)
+
+class QuestionBankStore:
+    """
+    SQLite store for pre-generated questions, per namespace. Each question
+    keeps the IDs of the chunks it was written from, so it can be dropped
+    when they go away; chunks that have been through generation are
+    tracked so a refill only looks at new ones.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS questions (
+                namespace TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                question TEXT NOT NULL,
+                served INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (namespace, question_id)
+            );
+            CREATE TABLE IF NOT EXISTS question_chunks (
+                namespace TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (namespace, question_id, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_question_chunks_chunk ON question_chunks (namespace, chunk_id);
+            CREATE TABLE IF NOT EXISTS covered_chunks (
+                namespace TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                PRIMARY KEY (namespace, chunk_id)
+            );
+            CREATE TABLE IF NOT EXISTS filled (
+                namespace TEXT PRIMARY KEY,
+                filled_at REAL NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.fetchall()
+
+    def _executemany(self, sql: str, rows: List[tuple]):
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+
+    # filling
+
+    def add(self, namespace: str, question: BankQuestion, chunk_ids: Iterable[str]):
+        question_id = content_hash(question.question_text)
+        stored = ExamQuestion(
+            question_text=question.question_text,
+            options=question.options,
+            correct_answer=question.correct_answer
+        )
+        self._execute(
+            "INSERT OR IGNORE INTO questions (namespace, question_id, topic, difficulty, question, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, question_id, question.topic.strip(), question.difficulty, stored.model_dump_json(), time.time())
+        )
+        self._executemany(
+            "INSERT OR IGNORE INTO question_chunks (namespace, question_id, chunk_id) VALUES (?, ?, ?)",
+            [(namespace, question_id, chunk_id) for chunk_id in chunk_ids]
+        )
+
+    def mark_covered(self, namespace: str, chunk_ids: Iterable[str]):
+        self._executemany(
+            "INSERT OR IGNORE INTO covered_chunks (namespace, chunk_id) VALUES (?, ?)",
+            [(namespace, chunk_id) for chunk_id in chunk_ids]
+        )
+
+    def covered_chunks(self, namespace: str) -> Set[str]:
+        rows = self._execute("SELECT chunk_id FROM covered_chunks WHERE namespace = ?", (namespace,))
+        return {row[0] for row in rows}
+
+    def mark_filled(self, namespace: str):
+        self._execute("INSERT OR REPLACE INTO filled (namespace, filled_at) VALUES (?, ?)", (namespace, time.time()))
+
+    def is_filled(self, namespace: str) -> bool:
+        return bool(self._execute("SELECT 1 FROM filled WHERE namespace = ?", (namespace,)))
+
+    def question_texts(self, namespace: str) -> List[str]:
+        rows = self._execute("SELECT question FROM questions WHERE namespace = ?", (namespace,))
+        return [json.loads(row[0])["question_text"] for row in rows]
+
+    def count(self, namespace: str) -> int:
+        return self._execute("SELECT COUNT(*) FROM questions WHERE namespace = ?", (namespace,))[0][0]
+
+    # invalidation
+
+    def invalidate_chunks(self, namespace: str, chunk_ids: Iterable[str]) -> int:
+        """
+        Drops every question written from any of `chunk_ids`. Returns how many.
+        """
+        chunk_ids = list(chunk_ids)
+        removed = set()
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._execute(
+                f"SELECT DISTINCT question_id FROM question_chunks WHERE namespace = ? AND chunk_id IN ({placeholders})",
+                (namespace, *batch)
+            )
+            removed.update(row[0] for row in rows)
+            self._execute(
+                f"DELETE FROM covered_chunks WHERE namespace = ? AND chunk_id IN ({placeholders})",
+                (namespace, *batch)
+            )
+        for question_id in removed:
+            self._execute("DELETE FROM questions WHERE namespace = ? AND question_id = ?", (namespace, question_id))
+            self._execute("DELETE FROM question_chunks WHERE namespace = ? AND question_id = ?", (namespace, question_id))
+        return len(removed)
+
+    def clear(self, namespace: str):
+        for table in ("questions", "question_chunks", "covered_chunks", "filled"):
+            self._execute(f"DELETE FROM {table} WHERE namespace = ?", (namespace,))
+
+    # sampling
+
+    def sample(
+        self,
+        namespace: str,
+        count: int,
+        chunk_ids: Optional[List[str]] = None,
+        min_count: int = 0
+    ) -> List[BankQuestion]:
+        """
+        Up to `count` questions, spread across topics (round-robin), least-served
+        first so repeated exams don't keep getting the same ones. With
+        `chunk_ids`, only questions written from those chunks. Fewer than
+        `min_count` available returns nothing.
+        """
+        if chunk_ids is not None:
+            if not chunk_ids:
+                return []
+            placeholders = ",".join("?" * len(chunk_ids))
+            rows = self._execute(
+                "SELECT DISTINCT q.question_id, q.topic, q.question, q.served, q.difficulty FROM questions q "
+                "JOIN question_chunks c ON c.namespace = q.namespace AND c.question_id = q.question_id "
+                f"WHERE q.namespace = ? AND c.chunk_id IN ({placeholders})",
+                (namespace, *chunk_ids)
+            )
+        else:
+            rows = self._execute(
+                "SELECT question_id, topic, question, served, difficulty FROM questions WHERE namespace = ?",
+                (namespace,)
+            )
+
+        by_topic: Dict[str, list] = defaultdict(list)
+        for row in rows:
+            by_topic[row[1].lower()].append(row)
+        for topic_rows in by_topic.values():
+            random.shuffle(topic_rows)
+            topic_rows.sort(key=lambda row: row[3])
+        topics = list(by_topic.values())
+        random.shuffle(topics)
+
+        picked = []
+        while len(picked) < count and any(topics):
+            for topic_rows in topics:
+                if topic_rows and len(picked) < count:
+                    picked.append(topic_rows.pop(0))
+        if len(picked) < min_count:
+            return []
+
+        self._executemany(
+            "UPDATE questions SET served = served + 1 WHERE namespace = ? AND question_id = ?",
+            [(namespace, row[0]) for row in picked]
+        )
+        return [
+            BankQuestion(**ExamQuestion.model_validate_json(row[2]).model_dump(), topic=row[1], difficulty=row[4])
+            for row in picked
+        ]
+
+    def stats(self) -> dict:
+        rows = self._execute("SELECT COUNT(*), COUNT(DISTINCT namespace), COALESCE(SUM(served), 0) FROM questions")
+        questions, namespaces, served = rows[0]
+        return {"questions": questions, "namespaces": namespaces, "served": served}
+
+question_bank = QuestionBankStore(os.path.join(settings.DATA_DIR, "question_bank.sqlite"))
+
+# one fill at a time per namespace
+_namespace_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+# background fills scheduled by ingest
+_fill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="question-bank")
+_pending_fills = set()
+_pending_lock = threading.Lock()
+
+def _batches(docs: List[Document], size: int) -> List[List[Document]]:
+    # consecutive chunks of the same source, so passages read as a whole
+    by_source: Dict[str, List[Document]] = defaultdict(list)
+    for doc in docs:
+        by_source[str(doc.metadata.get("source", "Unknown"))].append(doc)
+    return [chunks[i:i + size] for chunks in by_source.values() for i in range(0, len(chunks), size)]
+
+def _generate_batch(docs: List[Document]) -> List[tuple]:
+    context = "\n\n---\n\n".join(f"[{i}] {format_chunk(doc)}" for i, doc in enumerate(docs, start=1))
+    batch = bank_chain.get().invoke({"context": context, "count": settings.QUESTION_BANK_QUESTIONS_PER_BATCH})
+    results = []
+    for question in (batch.questions if batch else [])[:settings.QUESTION_BANK_QUESTIONS_PER_BATCH]:
+        chunk_ids = [docs[n - 1].id for n in question.sources if 1 <= n <= len(docs) and docs[n - 1].id]
+        results.append((question, chunk_ids or [doc.id for doc in docs if doc.id]))
+    return results
+
+def fill_question_bank(namespace: str) -> int:
+    """
+    Brings the namespace's bank up to date: questions whose chunks are gone
+    are dropped, and chunks that haven't been through generation yet get
+    questions (up to QUESTION_BANK_MAX_QUESTIONS). Returns questions added.
+    """
+    with _namespace_locks[namespace]:
+        docs = [doc for doc in get_all_documents(namespace) if doc.id]
+        live = {doc.id for doc in docs}
+
+        covered = question_bank.covered_chunks(namespace)
+        removed = question_bank.invalidate_chunks(namespace, covered - live)
+        if removed:
+            print(f"[QuestionBank] Dropped {removed} questions on deleted chunks in {namespace}.")
+
+        room = settings.QUESTION_BANK_MAX_QUESTIONS - question_bank.count(namespace)
+        batches = _batches([doc for doc in docs if doc.id not in covered], settings.QUESTION_BANK_CHUNKS_PER_BATCH)
+        batches = batches[:max(0, room) // max(1, settings.QUESTION_BANK_QUESTIONS_PER_BATCH)]
+        if not batches:
+            question_bank.mark_filled(namespace)
+            return 0
+
+        print(f"[QuestionBank] Generating questions for {sum(map(len, batches))} new chunks in {namespace}...")
+        existing = question_bank.question_texts(namespace)
+        added = 0
+        with ThreadPoolExecutor(max_workers=settings.QUESTION_BANK_FILL_CONCURRENCY) as executor:
+            futures = {executor.submit(_generate_batch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    generated = future.result()
+                except Exception as e:
+                    # not marked covered, so the next fill tries these chunks again
+                    print(f"[QuestionBank] Batch of {len(batch)} chunks failed: {e}")
+                    continue
+
+                # near-duplicates of questions already in the bank are dropped
+                candidates = [Document(page_content=text) for text in existing] + [
+                    Document(page_content=question.question_text, metadata={"index": i})
+                    for i, (question, _) in enumerate(generated)
+                ]
+                for doc in drop_near_duplicates(candidates, settings.EXAM_DEDUP_THRESHOLD):
+                    if "index" in doc.metadata:
+                        question, chunk_ids = generated[doc.metadata["index"]]
+                        question_bank.add(namespace, question, chunk_ids)
+                        existing.append(question.question_text)
+                        added += 1
+                question_bank.mark_covered(namespace, [doc.id for doc in batch])
+
+        question_bank.mark_filled(namespace)
+        print(f"[QuestionBank] Added {added} questions to {namespace} ({question_bank.count(namespace)} in the bank).")
+        return added
+
+def schedule_fill(namespace: str):
+    """
+    Fills the bank in the background. Fills that are already waiting for
+    the same namespace are coalesced.
+    """
+    if not settings.QUESTION_BANK_ENABLED:
+        return
+    with _pending_lock:
+        if namespace in _pending_fills:
+            return
+        _pending_fills.add(namespace)
+
+    def _run():
+        # waiting a little so chunks that arrive in several batches are handled once
+        time.sleep(settings.QUESTION_BANK_FILL_DELAY_SECONDS)
+        with _pending_lock:
+            _pending_fills.discard(namespace)
+        try:
+            fill_question_bank(namespace)
+        except Exception as e:
+            print(f"[QuestionBank] Background fill failed for {namespace}: {e}")
+
+    _fill_executor.submit(_run)
+
+def sample_questions(
+    namespace: str,
+    count: int,
+    chunk_ids: Optional[List[str]] = None,
+    min_count: int = 0
+) -> List[BankQuestion]:
+    """
+    Questions from the bank (see QuestionBankStore.sample). Courses ingested
+    before the bank existed get their first fill scheduled here.
+    """
+    if not settings.QUESTION_BANK_ENABLED:
+        return []
+    try:
+        questions = question_bank.sample(namespace, count, chunk_ids, min_count)
+        if len(questions) < count and not question_bank.is_filled(namespace):
+            schedule_fill(namespace)
+        return questions
+    except Exception as e:
+        print(f"[QuestionBank] Sampling failed for {namespace}: {e}")
+        return []
+
+# quiz requests look like "5 question quiz on chapter 1"
+_COUNT_PATTERN = re.compile(r"\b(\d{1,2})\s*(?:-\s*)?(?:questions?|qs?|mcqs?)\b", re.IGNORECASE)
+
+def quiz_question_count(request: str) -> int:
+    match = _COUNT_PATTERN.search(request)
+    return int(match.group(1)) if match else settings.QUIZ_DEFAULT_QUESTIONS
+
+def quiz_from_bank(namespace: str, request: str) -> Optional[str]:
+    """
+    A quiz (in the quiz chain's JSON format) for the request, served from the
+    bank: questions written from the chunks the request retrieves. None if
+    the bank doesn't have enough of them, so the caller generates one.
+    """
+    if not settings.QUESTION_BANK_ENABLED:
+        return None
+    count = quiz_question_count(request)
+    if count <= 0:
+        return None
+
+    try:
+        docs = multi_query_search(namespace, [request])
+    except Exception as e:
+        print(f"[QuestionBank] Retrieval failed for quiz in {namespace}: {e}")
+        return None
+    questions = sample_questions(namespace, count, [doc.id for doc in docs if doc.id], min_count=count)
+    if not questions:
+        return None
+
+    print(f"[QuestionBank] Served a {count} question quiz from the bank for {namespace}.")
+    return json.dumps({"questions": [q.model_dump(include=QUESTION_FIELDS) for q in questions]}, indent=2)
+
+def get_question_bank_stats() -> dict:
+    if not settings.QUESTION_BANK_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **question_bank.stats()}
+
+def _on_namespace_change(event: str, namespace: str, docs: List[Document]):
+    if event == "add":
+        schedule_fill(namespace)
+    elif event == "clear":
+        question_bank.clear(namespace)
+
+register_namespace_listener(_on_namespace_change)
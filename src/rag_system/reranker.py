@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import deque
+from typing import List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.core.config import settings
+from src.core.executors import get_pool, run_in_pool
+from src.rag_system.map_reduce import estimate_tokens
+from src.rag_system.models import get_reranker_model, reranker_provider
+from src.rag_system.streaming import CANDIDATE_RETRIEVAL_TAG
+
+class RerankStats:
+    """
+    Rerank latency, plus the adaptive candidate depth (how many of the retrieved
+    candidates get scored). The depth follows a moving average of the cost per
+    candidate, so a rerank stays within the latency budget; the time spent
+    waiting for the rerank pool counts too, so depth shrinks under load.
+    """
+
+    def __init__(self, min_depth: int, max_depth: int, budget_ms: float, window: int = 512):
+        self.min_depth = max(1, min_depth)
+        self.max_depth = max(self.min_depth, max_depth)
+        self.budget_ms = budget_ms
+        self.depth = self.max_depth
+        self._ms_per_candidate: Optional[float] = None
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+        # stats
+        self.reranks = 0
+        self.failures = 0
+        self.candidates = 0
+        self.kept = 0
+
+    def record(self, candidates: int, kept: int, seconds: float, adapt: bool = True):
+        ms = seconds * 1000
+        with self._lock:
+            self.reranks += 1
+            self.candidates += candidates
+            self.kept += kept
+            self._latencies.append(ms)
+            if not adapt or not candidates:
+                return
+
+            cost = ms / candidates
+            if self._ms_per_candidate is None:
+                self._ms_per_candidate = cost
+            else:
+                self._ms_per_candidate = 0.8 * self._ms_per_candidate + 0.2 * cost
+            depth = int(self.budget_ms / max(self._ms_per_candidate, 1e-3))
+            self.depth = min(self.max_depth, max(self.min_depth, depth))
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+            def _percentile(p: float) -> float:
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 1) if latencies else 0.0
+
+            return {
+                "enabled": True,
+                "model": settings.RERANK_MODEL,
+                "reranks": self.reranks,
+                "failures": self.failures,
+                "depth": self.depth,
+                "ms_per_candidate": round(self._ms_per_candidate or 0.0, 3),
+                "avg_candidates": round(self.candidates / self.reranks, 1) if self.reranks else 0.0,
+                "avg_kept": round(self.kept / self.reranks, 1) if self.reranks else 0.0,
+                "latency_ms": {
+                    "p50": _percentile(0.5),
+                    "p95": _percentile(0.95),
+                    "max": round(latencies[-1], 1) if latencies else 0.0,
+                },
+            }
+
+rerank_stats = RerankStats(
+    min_depth=settings.RERANK_MIN_CANDIDATES,
+    max_depth=settings.RERANK_MAX_CANDIDATES,
+    budget_ms=settings.RERANK_LATENCY_BUDGET_MS
+)
+
+def _score(query: str, docs: List[Document]) -> List[float]:
+    """
+    Runs in the rerank pool: cross-encoder relevance of each chunk to the query.
+    """
+    scores = get_reranker_model().predict(
+        [(query, doc.page_content) for doc in docs],
+        batch_size=settings.RERANK_BATCH_SIZE,
+        show_progress_bar=False
+    )
+    return [float(score) for score in scores]
+
+def _select(docs: List[Document], scores: List[float], k: int, token_budget: int) -> List[Document]:
+    """
+    The best `k` chunks by score, stopping before the token budget is exceeded.
+    """
+    ranked = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+    kept, used = [], 0
+    for i in ranked[:k]:
+        tokens = estimate_tokens(docs[i].page_content)
+        if kept and used + tokens > token_budget:
+            break
+        kept.append(docs[i])
+        used += tokens
+    return kept
+
+def _finish(docs: List[Document], scores: Optional[List[float]], started: float, adapt: bool) -> List[Document]:
+    k, budget = settings.RERANK_TOP_K, settings.RERANK_TOKEN_BUDGET
+    if scores is None:
+        # reranking is best-effort: fall back to the retrieval order
+        rerank_stats.record_failure()
+        return docs[:k]
+
+    kept = _select(docs, scores, k, budget)
+    rerank_stats.record(len(docs), len(kept), time.perf_counter() - started, adapt)
+    return kept
+
+def rerank(query: str, docs: List[Document]) -> List[Document]:
+    """
+    Scores the first `depth` candidates with the cross-encoder and keeps the
+    top RERANK_TOP_K within RERANK_TOKEN_BUDGET.
+    """
+    candidates = docs[:rerank_stats.depth]
+    adapt = reranker_provider.loaded # the call that loads the model isn't a fair measurement
+    started = time.perf_counter()
+    try:
+        scores = get_pool("rerank").submit(_score, query, candidates).result()
+    except Exception as e:
+        print(f"[Reranker] Rerank failed: {e}")
+        scores = None
+    return _finish(candidates, scores, started, adapt)
+
+async def arerank(query: str, docs: List[Document]) -> List[Document]:
+    candidates = docs[:rerank_stats.depth]
+    adapt = reranker_provider.loaded
+    started = time.perf_counter()
+    try:
+        scores = await run_in_pool("rerank", _score, query, candidates)
+    except Exception as e:
+        print(f"[Reranker] Rerank failed: {e}")
+        scores = None
+    return _finish(candidates, scores, started, adapt)
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Retrieves candidates with `base` (which should return RERANK_MAX_CANDIDATES
+    chunks) and reranks them with the cross-encoder.
+    """
+
+    base: BaseRetriever
+
+    def _candidate_config(self, run_manager) -> dict:
+        # tagged so progress streams report one retrieval, not two
+        return {"callbacks": run_manager.get_child(), "tags": [CANDIDATE_RETRIEVAL_TAG]}
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        docs = self.base.invoke(query, config=self._candidate_config(run_manager))
+        return rerank(query, docs)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        docs = await self.base.ainvoke(query, config=self._candidate_config(run_manager))
+        return await arerank(query, docs)
+
+def get_rerank_stats() -> dict:
+    if not settings.RERANK_ENABLED:
+        return {"enabled": False}
+    return rerank_stats.stats()
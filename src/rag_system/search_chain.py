@@ -1,31 +1,30 @@
-from langchain_community.tools.tavily_search import TavilySearchResults
 from src.core.config import settings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableMap, RunnablePassthrough
 from langchain_core.runnables import RunnableLambda
 from src.rag_system.vector_store import get_retriever
-from src.rag_system.chain import _format_context
+from src.rag_system.context import build_context
+from src.rag_system.streaming import FINAL_ANSWER_TAG
+from src.rag_system.models import get_chat_model
+from src.core.lazy import LazyProvider
 import json
 import os
 
 # setup: llm and tools
 os.environ["TAVILY_API_KEY"] = settings.TAVILY_API_KEY
 
-llm_flash = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0,
-    google_api_key=settings.GOOGLE_API_KEY
-)
-llm_pro = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0.3,
-    google_api_key=settings.GOOGLE_API_KEY
-)
+# (the llm clients are created on first use)
+QUERY_SYNTH_TEMPERATURE = 0
+ANALYZE_TEMPERATURE = 0.3
+
+def _create_tavily_tool():
+    # langchain_community is slow to import, so only load it when searching
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    return TavilySearchResults(max_results=5)
 
 # initializing the tavily tool
-tavily_tool = TavilySearchResults(max_results=5)
+tavily_tool = LazyProvider("tavily_tool", _create_tavily_tool)
 
 
 # refining the search query
@@ -40,7 +39,6 @@ CONTEXT: {context}
 Search Query:
 """
 query_synth_prompt = PromptTemplate.from_template(QUERY_SYNTH_PROMPT)
-query_synth_chain = query_synth_prompt | llm_flash | StrOutputParser()
 
 
 # analyzes the search results
@@ -62,19 +60,29 @@ Your task is to analyze these results and present a clean, helpful list.
 Your final, clean output (in Markdown format):
 """
 analyze_results_prompt = PromptTemplate.from_template(ANALYZE_RESULTS_PROMPT)
-analyze_results_chain = analyze_results_prompt | llm_pro | StrOutputParser()
 
 
 # the full rag chain
 
 def create_rag_search_chain():
     
+    query_synth_chain = (
+        query_synth_prompt
+        | get_chat_model(temperature=QUERY_SYNTH_TEMPERATURE)
+        | StrOutputParser()
+    )
+    analyze_results_chain = (
+        analyze_results_prompt
+        | get_chat_model(temperature=ANALYZE_TEMPERATURE)
+        | StrOutputParser()
+    ).with_config(tags=[FINAL_ANSWER_TAG])
+    
     setup_chain = RunnableMap({
         "topic": lambda x: x["topic"],
         "context": (
             (lambda x: get_retriever(collection_name=x["user_id"])
             .invoke(x["topic"]))
-            | RunnableLambda(_format_context)
+            | RunnableLambda(build_context)
         )
     })
     
@@ -92,7 +100,7 @@ def create_rag_search_chain():
         
         "search_results": (
             (lambda x: x["search_query"])
-            | tavily_tool
+            | tavily_tool.get()
         )
     })
     
@@ -105,8 +113,8 @@ def create_rag_search_chain():
     
     return full_chain
 
-# our runnable
-rag_search_runnable = create_rag_search_chain()
+# our runnable (built on first use)
+rag_search_runnable = LazyProvider("rag_search_chain", create_rag_search_chain)
 
 def get_rag_search_runnable():
-    return rag_search_runnable
\ No newline at end of file
+    return rag_search_runnable.get()
\ No newline at end of file
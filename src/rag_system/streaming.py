@@ -0,0 +1,116 @@
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from langchain_core.runnables import Runnable
+
+# chains tag their user-facing LLM step with this so only its tokens get streamed
+FINAL_ANSWER_TAG = "final_answer"
+
+# answers served from the answer cache come from a runnable with this name, not an LLM
+CACHED_ANSWER_NAME = "cached_answer"
+
+# the reranker's candidate retrieval is tagged with this; only the reranked result is reported
+CANDIDATE_RETRIEVAL_TAG = "rerank_candidates"
+
+TokenFilter = Callable[[Dict[str, Any]], bool]
+
+def _chunk_text(chunk) -> str:
+    """
+    Pulls the plain text out of a streamed message chunk.
+    """
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return ""
+
+def tagged_tokens(event: Dict[str, Any]) -> bool:
+    """
+    Token filter: only stream LLM steps tagged with FINAL_ANSWER_TAG.
+    """
+    return FINAL_ANSWER_TAG in event.get("tags", [])
+
+def graph_node_tokens(*nodes: str) -> TokenFilter:
+    """
+    Token filter: only stream LLM calls made inside the given LangGraph nodes.
+    """
+    def _filter(event: Dict[str, Any]) -> bool:
+        return event.get("metadata", {}).get("langgraph_node") in nodes
+    return _filter
+
+async def astream_progress(
+    runnable: Runnable,
+    input_data: Dict[str, Any],
+    token_filter: Optional[TokenFilter] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs a chain/graph with astream_events and yields simplified progress events:
+    - "router":    the agent's routing decision
+    - "retrieval": retrieval from the vector store finished
+    - "search":    a web search tool finished
+    - "token":     a piece of the answer (a cached answer comes as one token)
+    - "done":      the full answer text
+    """
+    answer_parts = []
+    routed = False
+
+    async for event in runnable.astream_events(input_data, version="v2"):
+        kind = event["event"]
+        name = event.get("name")
+
+        if kind == "on_chain_end" and name == "router" and not routed:
+            output = event["data"].get("output") or {}
+            if isinstance(output, dict) and "next_node" in output:
+                routed = True
+                yield {"event": "router", "data": {"decision": output["next_node"]}}
+
+        elif kind == "on_retriever_end":
+            if CANDIDATE_RETRIEVAL_TAG in event.get("tags", []):
+                continue
+            docs = event["data"].get("output") or []
+            yield {"event": "retrieval", "data": {"documents": len(docs)}}
+
+        elif kind == "on_tool_end":
+            output = event["data"].get("output")
+            results = output if isinstance(output, list) else []
+            yield {"event": "search", "data": {"tool": name, "results": len(results)}}
+
+        elif kind == "on_chat_model_stream":
+            if token_filter is not None and not token_filter(event):
+                continue
+            text = _chunk_text(event["data"].get("chunk"))
+            if text:
+                answer_parts.append(text)
+                yield {"event": "token", "data": {"text": text}}
+
+        elif kind == "on_chain_end" and name == CACHED_ANSWER_NAME:
+            # a cached answer arrives in one piece
+            if token_filter is not None and not token_filter(event):
+                continue
+            text = event["data"].get("output") or ""
+            if text:
+                answer_parts.append(text)
+                yield {"event": "token", "data": {"text": text, "cached": True}}
+
+    yield {"event": "done", "data": {"text": "".join(answer_parts)}}
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """
+    Formats a progress event as a Server-Sent Events frame.
+    """
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+async def sse_stream(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """
+    Turns progress events into SSE frames, reporting failures as an "error" event
+    (the HTTP status is already sent by the time anything can go wrong).
+    """
+    try:
+        async for event in events:
+            yield format_sse(event)
+    except Exception as e:
+        print(f"[Streaming] Error while streaming: {e}")
+        yield format_sse({"event": "error", "data": {"detail": str(e)}})
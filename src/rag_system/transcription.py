@@ -0,0 +1,185 @@
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from langchain_core.documents import Document
+from src.core.config import settings
+from src.core.executors import get_pool
+from src.rag_system.models import get_whisper_model
+
+# whisper models expect 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+class TranscriptSegment(BaseModel):
+    start: float # seconds from the start of the recording
+    end: float
+    text: str
+
+def load_audio(file_path: str) -> np.ndarray:
+    """
+    Decodes any audio/video file to 16 kHz mono float32 (via ffmpeg).
+    """
+    from whisper.audio import load_audio as whisper_load_audio
+    return whisper_load_audio(file_path, sr=SAMPLE_RATE)
+
+def split_on_silence(
+    audio: np.ndarray,
+    target_seconds: float,
+    window_seconds: float,
+    frame_seconds: float = 0.03
+) -> List[Tuple[int, int]]:
+    """
+    Splits audio into spans of roughly `target_seconds`, cutting at the quietest
+    point within +/- `window_seconds` of each target so we don't cut mid-word.
+    Returns (start_sample, end_sample) pairs that cover the whole recording.
+    """
+    frame = int(SAMPLE_RATE * frame_seconds)
+    n_frames = len(audio) // frame
+    target_frames = int(target_seconds / frame_seconds)
+    window_frames = int(window_seconds / frame_seconds)
+
+    if n_frames <= target_frames + window_frames:
+        return [(0, len(audio))]
+
+    # frame energy, smoothed over ~0.3s so we cut in pauses, not between syllables
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    smooth = max(1, int(0.3 / frame_seconds))
+    energy = np.convolve(energy, np.ones(smooth) / smooth, mode="same")
+
+    spans = []
+    start = 0
+    while n_frames - start > target_frames + window_frames:
+        lo = start + target_frames - window_frames
+        hi = start + target_frames + window_frames
+        cut = lo + int(np.argmin(energy[lo:hi]))
+        spans.append((start * frame, cut * frame))
+        start = cut
+    spans.append((start * frame, len(audio)))
+    return spans
+
+def _transcribe_segment(audio: np.ndarray, offset: float) -> List[dict]:
+    """
+    Runs in a transcription worker process: decodes one span of audio
+    and shifts its timestamps by `offset` seconds.
+    """
+    model = get_whisper_model()
+
+    if settings.TRANSCRIPTION_BACKEND == "faster-whisper":
+        segments, _ = model.transcribe(audio)
+        raw = [(s.start, s.end, s.text) for s in segments]
+    else:
+        result = model.transcribe(audio, fp16=False)
+        raw = [(s["start"], s["end"], s["text"]) for s in result.get("segments", [])]
+
+    return [
+        {"start": round(offset + start, 2), "end": round(offset + end, 2), "text": text.strip()}
+        for start, end, text in raw
+        if text.strip()
+    ]
+
+def iter_transcript_segments(
+    file_path: str,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> Iterator[TranscriptSegment]:
+    """
+    Transcribes a recording, yielding timestamped segments in order as soon as
+    they're decoded. The audio is split on silence and the spans are decoded
+    in parallel across the transcription process pool.
+    `progress(percent, stage)` is called after each span.
+    """
+    progress = progress or (lambda percent, stage: None)
+
+    progress(0, "decoding audio")
+    audio = load_audio(file_path)
+    spans = split_on_silence(
+        audio,
+        target_seconds=settings.TRANSCRIPTION_SEGMENT_SECONDS,
+        window_seconds=settings.TRANSCRIPTION_SPLIT_WINDOW_SECONDS
+    )
+    print(f"[Transcription] {len(audio) / SAMPLE_RATE:.0f}s of audio split into {len(spans)} spans.")
+
+    pool = get_pool("whisper")
+    # keeping a bounded number of spans in flight (each one is a copy of its audio)
+    window = max(1, pool.max_workers * 2)
+    futures = []
+    next_span = 0
+
+    for done in range(len(spans)):
+        while next_span < len(spans) and len(futures) < window:
+            start, end = spans[next_span]
+            futures.append(pool.submit(_transcribe_segment, audio[start:end], start / SAMPLE_RATE))
+            next_span += 1
+
+        for segment in futures.pop(0).result():
+            yield TranscriptSegment(**segment)
+        progress(100 * (done + 1) / len(spans), "transcribing")
+
+def transcribe_file(
+    file_path: str,
+    progress: Optional[Callable[[float, str], None]] = None
+) -> List[TranscriptSegment]:
+    """
+    Transcribes a whole recording and returns its timestamped segments.
+    """
+    return list(iter_transcript_segments(file_path, progress))
+
+def format_timestamp(seconds: float) -> str:
+    """
+    12.5 -> "0:12", 3725 -> "1:02:05"
+    """
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+def _segments_to_document(segments: List[TranscriptSegment], source: str) -> Document:
+    start, end = segments[0].start, segments[-1].end
+    return Document(
+        page_content=" ".join(segment.text for segment in segments),
+        metadata={
+            "source": source,
+            "start": start,
+            "end": end,
+            "timestamp": f"{format_timestamp(start)}-{format_timestamp(end)}",
+        }
+    )
+
+def chunk_segments(
+    segments: Iterable[TranscriptSegment],
+    source: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200
+) -> Iterator[Document]:
+    """
+    Groups timestamped segments into ~`chunk_size`-character chunks, never
+    splitting a segment, so every chunk knows where it starts and ends in the
+    recording. The last segments of each chunk (up to `chunk_overlap` chars)
+    are repeated at the start of the next one.
+    Works on a stream: each chunk is yielded as soon as it's full.
+    """
+    current: List[TranscriptSegment] = []
+    length = 0
+
+    for segment in segments:
+        if not segment.text:
+            continue
+        if current and length + len(segment.text) > chunk_size:
+            yield _segments_to_document(current, source)
+
+            # carrying the tail over as overlap
+            overlap: List[TranscriptSegment] = []
+            overlap_length = 0
+            for previous in reversed(current):
+                if overlap_length + len(previous.text) > chunk_overlap:
+                    break
+                overlap.insert(0, previous)
+                overlap_length += len(previous.text) + 1
+            current, length = overlap, overlap_length
+
+        current.append(segment)
+        length += len(segment.text) + 1
+
+    if current:
+        yield _segments_to_document(current, source)
@@ -1,19 +1,15 @@
-from src.core.config import settings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableMap, RunnableLambda
 from src.rag_system.vector_store import get_retriever
-from src.rag_system.chain import _format_context
+from src.rag_system.context import build_context
 from langchain_core.messages import HumanMessage, AIMessage
+from src.rag_system.models import get_chat_model
+from src.core.lazy import LazyProvider
 from typing import List, Dict, Any
 
-# setup: llm
-llm_pro = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash", 
-    temperature=0.4,
-    google_api_key=settings.GOOGLE_API_KEY
-)
+# setup: llm settings (the client is created on first use)
+LLM_TEMPERATURE = 0.4
 
 # the tutor prompt
 TUTOR_SYSTEM_PROMPT = """
@@ -29,6 +25,9 @@ You are an expert on the student's course, using their *own* "CONTEXT" (from the
 5.  **IF THEY ARE WRONG/STUCK:** Gently correct them by pointing them to their *own* notes. (e.g., "Not quite. According to your professor's notes, it's actually... Why do you think that is?").
 6.  **STAY ON TOPIC:** Keep the user focused on the "{topic}".
 
+Notes on the earlier part of this session (older turns, summarized):
+{conversation_summary}
+
 Here is the context from the student's course materials:
 <CONTEXT>
 {context}
@@ -67,23 +66,25 @@ def create_tutor_chain():
             
             "chat_history": lambda x: _parse_chat_history(x["chat_history"]),
             
+            "conversation_summary": lambda x: x.get("summary") or "(none, the session has just started)",
+            
             "context": 
                 (lambda x: {
                     "retriever": get_retriever(collection_name=x["user_id"]),
                     "topic": x["topic"]
                 })
                 | RunnableLambda(lambda y: y["retriever"].invoke(y["topic"]))
-                | RunnableLambda(_format_context)
+                | RunnableLambda(build_context)
         })
         | tutor_prompt
-        | llm_pro
+        | get_chat_model(temperature=LLM_TEMPERATURE)
         | StrOutputParser()
     )
     
     return chain
 
-# runnable
-tutor_runnable = create_tutor_chain()
+# runnable (built on first use)
+tutor_runnable = LazyProvider("tutor_chain", create_tutor_chain)
 
 def get_tutor_runnable():
-    return tutor_runnable
\ No newline at end of file
+    return tutor_runnable.get()
\ No newline at end of file
@@ -0,0 +1,549 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from src.core.config import settings
+from src.rag_system.hashing import content_hash, chunk_id
+from src.rag_system.ingest import ingest_documents, TEXT_KEY
+
+# (id, score, metadata) - the chunk text is in metadata[TEXT_KEY]
+Match = Tuple[str, float, Dict[str, Any]]
+
+class VectorBackend(ABC):
+    """
+    Where chunk vectors live. Namespaces separate users; records are
+    {"id", "values", "metadata"} dicts, with the chunk text in metadata[TEXT_KEY].
+    """
+
+    name: str
+
+    @abstractmethod
+    def existing_ids(self, ids: List[str], namespace: str) -> Set[str]:
+        """
+        The subset of `ids` already stored in the namespace.
+        """
+
+    @abstractmethod
+    def upsert(self, records: List[Dict[str, Any]], namespace: str):
+        ...
+
+    @abstractmethod
+    def query(self, vector: List[float], k: int, namespace: str) -> List[Match]:
+        """
+        The `k` most similar records, best first.
+        """
+
+    @abstractmethod
+    def list_ids(self, namespace: str, batch_size: int) -> Iterator[List[str]]:
+        ...
+
+    @abstractmethod
+    def fetch(self, ids: List[str], namespace: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Metadata by ID, for the IDs that exist.
+        """
+
+    @abstractmethod
+    def delete_namespace(self, namespace: str):
+        ...
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+class PineconeBackend(VectorBackend):
+    """
+    Pinecone index (one shared, pooled client per process).
+    """
+
+    name = "pinecone"
+
+    def __init__(self, index):
+        self.index = index
+
+    def existing_ids(self, ids: List[str], namespace: str) -> Set[str]:
+        response = self.index.fetch(ids=ids, namespace=namespace)
+        return set(response.vectors.keys())
+
+    def upsert(self, records: List[Dict[str, Any]], namespace: str):
+        self.index.upsert(vectors=records, namespace=namespace)
+
+    def query(self, vector: List[float], k: int, namespace: str) -> List[Match]:
+        response = self.index.query(vector=vector, top_k=k, namespace=namespace, include_metadata=True)
+        return [(match.id, match.score, dict(match.metadata or {})) for match in response.matches]
+
+    def list_ids(self, namespace: str, batch_size: int) -> Iterator[List[str]]:
+        for id_page in self.index.list(namespace=namespace, limit=batch_size):
+            ids = list(id_page)
+            if ids:
+                yield ids
+
+    def fetch(self, ids: List[str], namespace: str) -> Dict[str, Dict[str, Any]]:
+        response = self.index.fetch(ids=ids, namespace=namespace)
+        return {vector_id: dict(vector.metadata or {}) for vector_id, vector in response.vectors.items()}
+
+    def delete_namespace(self, namespace: str):
+        self.index.delete(delete_all=True, namespace=namespace)
+
+def _hnswlib():
+    # optional: approximate search for large namespaces
+    try:
+        import hnswlib
+        return hnswlib
+    except ImportError:
+        return None
+
+def _fcntl():
+    # file locks (posix only): keep uvicorn workers sharing a local store from interleaving writes
+    try:
+        import fcntl
+        return fcntl
+    except ImportError:
+        return None
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+class _LocalNamespace:
+    """
+    One namespace's vectors: an append-only float32 file of normalized rows,
+    read through a memory map (so the OS page cache holds it, not the heap),
+    plus an optional HNSW graph once the namespace is large enough.
+    """
+
+    def __init__(self, directory: str, dim: int, count: int):
+        self.lock = threading.RLock()
+        self.directory = directory
+        self.path = os.path.join(directory, "vectors.f32")
+        self.hnsw_path = os.path.join(directory, "hnsw.bin")
+        self.dim = dim
+        self.count = count
+        self._matrix = None
+        self._hnsw = None
+        self._hnsw_saved_at = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        # rows past `count` (a crashed writer's, or another process's in-flight append)
+        # are never read, and the next append overwrites them
+        if not os.path.exists(self.path):
+            open(self.path, "wb").close()
+        self._open_hnsw()
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            if not self.count:
+                return np.empty((0, self.dim), dtype=np.float32)
+            self._matrix = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._matrix
+
+    def sync(self, count: int):
+        """
+        Catches up with the catalog's row count, which another process may
+        have moved (rows appended, or the namespace deleted and recreated).
+        """
+        if count == self.count:
+            return
+        if count < self.count:
+            os.makedirs(self.directory, exist_ok=True)
+            if not os.path.exists(self.path):
+                open(self.path, "wb").close()
+            self.count = count
+            self._matrix = None
+            self._hnsw = None
+            self._open_hnsw()
+            return
+        start = self.count
+        self.count = count
+        self._matrix = None
+        if self._hnsw is not None:
+            self._hnsw_add(np.asarray(self.matrix()[start:]), start)
+        elif self.count >= settings.LOCAL_HNSW_MIN_VECTORS:
+            self._build_hnsw()
+
+    def append(self, vectors: np.ndarray):
+        # written at the committed end, over anything a crashed writer left behind
+        with open(self.path, "r+b") as f:
+            f.seek(self.count * self.dim * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        start = self.count
+        self.count += len(vectors)
+        self._matrix = None
+
+        if self._hnsw is not None:
+            self._hnsw_add(vectors, start)
+        elif self.count >= settings.LOCAL_HNSW_MIN_VECTORS:
+            self._build_hnsw()
+
+    def _open_hnsw(self):
+        hnswlib = _hnswlib()
+        if hnswlib is None:
+            return
+        if not os.path.exists(self.hnsw_path):
+            if self.count >= settings.LOCAL_HNSW_MIN_VECTORS:
+                self._build_hnsw()
+            return
+        try:
+            index = hnswlib.Index(space="ip", dim=self.dim)
+            index.load_index(self.hnsw_path, max_elements=max(self.count, 1))
+        except Exception as e:
+            print(f"[LocalVectors] Could not load {self.hnsw_path}, rebuilding: {e}")
+            self._build_hnsw()
+            return
+        index.set_ef(settings.LOCAL_HNSW_EF_SEARCH)
+        self._hnsw = index
+        # rows appended after the graph was last saved
+        indexed = index.get_current_count()
+        if indexed < self.count:
+            self._hnsw_add(np.asarray(self.matrix()[indexed:]), indexed)
+
+    def _build_hnsw(self):
+        hnswlib = _hnswlib()
+        if hnswlib is None:
+            return
+        start = time.perf_counter()
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=max(1024, self.count * 2), ef_construction=200, M=settings.LOCAL_HNSW_M)
+        index.add_items(np.asarray(self.matrix()), np.arange(self.count))
+        index.set_ef(settings.LOCAL_HNSW_EF_SEARCH)
+        self._hnsw = index
+        self._save_hnsw(force=True)
+        print(f"[LocalVectors] Built HNSW graph over {self.count} vectors in {time.perf_counter() - start:.1f}s.")
+
+    def _hnsw_add(self, vectors: np.ndarray, start: int):
+        index = self._hnsw
+        if start + len(vectors) > index.get_max_elements():
+            index.resize_index(max(index.get_max_elements() * 2, start + len(vectors)))
+        index.add_items(vectors, np.arange(start, start + len(vectors)))
+        self._save_hnsw()
+
+    def _save_hnsw(self, force: bool = False):
+        # saving rewrites the whole graph, so it's throttled; unsaved rows are re-added on load
+        if not force and time.time() - self._hnsw_saved_at < settings.LOCAL_HNSW_SAVE_INTERVAL_SECONDS:
+            return
+        tmp_path = self.hnsw_path + ".tmp"
+        self._hnsw.save_index(tmp_path)
+        os.replace(tmp_path, self.hnsw_path)
+        self._hnsw_saved_at = time.time()
+
+    def search(self, vector: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """
+        (row, cosine similarity) pairs, best first.
+        """
+        with self.lock:
+            if not self.count:
+                return []
+            k = min(k, self.count)
+            if self._hnsw is not None:
+                labels, distances = self._hnsw.knn_query(vector, k=k)
+                return [(int(row), 1.0 - float(d)) for row, d in zip(labels[0], distances[0])]
+            matrix = self.matrix()
+
+        scores = matrix @ vector
+        top = np.argpartition(scores, -k)[-k:] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+class LocalVectorBackend(VectorBackend):
+    """
+    Vectors on local disk, for on-prem / offline use: no network hop per query.
+    Each namespace is a memory-mapped float32 matrix searched exactly (one
+    matrix-vector product), switching to an HNSW graph (if hnswlib is installed)
+    past LOCAL_HNSW_MIN_VECTORS. IDs and metadata are kept in SQLite.
+    Similarity is cosine (vectors are normalized on the way in).
+    Writers are serialized per namespace with a file lock, so several uvicorn
+    workers can share one store; readers pick up other processes' rows from the catalog.
+    """
+
+    name = "local"
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(path, "catalog.sqlite"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS namespaces (
+                namespace TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS vectors (
+                namespace TEXT NOT NULL,
+                row INTEGER NOT NULL,
+                id TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                PRIMARY KEY (namespace, row)
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS vectors_by_id ON vectors (namespace, id);
+            """
+        )
+        self._conn.commit()
+        self._namespaces: Dict[str, _LocalNamespace] = {}
+        self._namespace_locks: Dict[str, threading.Lock] = {}
+
+    def _execute(self, sql: str, params: tuple = ()):
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+            self._conn.commit()
+            return cursor.fetchall()
+
+    def _directory(self, namespace: str) -> str:
+        return os.path.join(self.path, content_hash(namespace)[:32])
+
+    def _write_lock(self, namespace: str) -> threading.Lock:
+        with self._lock:
+            return self._namespace_locks.setdefault(namespace, threading.Lock())
+
+    @contextmanager
+    def _namespace_write(self, namespace: str):
+        """
+        Exclusive write access to a namespace: the thread lock within this
+        process, plus a file lock across processes (uvicorn workers).
+        """
+        with self._write_lock(namespace):
+            fcntl = _fcntl()
+            if fcntl is None:
+                yield
+                return
+            with open(self._directory(namespace) + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _catalog_count(self, namespace: str) -> Optional[int]:
+        rows = self._execute("SELECT count FROM namespaces WHERE namespace = ?", (namespace,))
+        return rows[0][0] if rows else None
+
+    def _get(self, namespace: str, dim: Optional[int] = None) -> Optional[_LocalNamespace]:
+        """
+        The namespace's vectors, opened on first use (created if `dim` is given).
+        """
+        ns = self._namespaces.get(namespace)
+        if ns is not None:
+            return ns
+        with self._write_lock(namespace):
+            ns = self._namespaces.get(namespace)
+            if ns is not None:
+                return ns
+            rows = self._execute("SELECT dim, count FROM namespaces WHERE namespace = ?", (namespace,))
+            if rows:
+                ns = _LocalNamespace(self._directory(namespace), rows[0][0], rows[0][1])
+            elif dim is not None:
+                self._execute("INSERT INTO namespaces (namespace, dim, count) VALUES (?, ?, 0)", (namespace, dim))
+                ns = _LocalNamespace(self._directory(namespace), dim, 0)
+            else:
+                return None
+            self._namespaces[namespace] = ns
+            return ns
+
+    def existing_ids(self, ids: List[str], namespace: str) -> Set[str]:
+        if not ids:
+            return set()
+        rows = self._execute(
+            f"SELECT id FROM vectors WHERE namespace = ? AND id IN ({','.join('?' * len(ids))})",
+            (namespace, *ids)
+        )
+        return {row[0] for row in rows}
+
+    def upsert(self, records: List[Dict[str, Any]], namespace: str):
+        if not records:
+            return
+        dim = len(records[0]["values"])
+        ns = self._get(namespace, dim=dim)
+        with self._namespace_write(namespace), ns.lock:
+            # another process may have appended to (or deleted) the namespace since we last looked
+            count = self._catalog_count(namespace)
+            if count is None:
+                self._execute("INSERT INTO namespaces (namespace, dim, count) VALUES (?, ?, 0)", (namespace, dim))
+                count = 0
+            ns.sync(count)
+
+            # ids are content hashes: a stored id already has these values
+            existing = self.existing_ids([r["id"] for r in records], namespace)
+            fresh: Dict[str, Dict[str, Any]] = {}
+            for record in records:
+                if record["id"] not in existing:
+                    fresh.setdefault(record["id"], record)
+            if not fresh:
+                return
+
+            matrix = _normalize_rows(np.asarray([r["values"] for r in fresh.values()], dtype=np.float32))
+            if matrix.shape[1] != ns.dim:
+                raise ValueError(f"Vector dimension {matrix.shape[1]} doesn't match namespace dimension {ns.dim}.")
+
+            # vectors first: rows past the catalog's count are ignored until it's updated
+            start = ns.count
+            ns.append(matrix)
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT INTO vectors (namespace, row, id, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (namespace, start + i, record["id"], json.dumps(record["metadata"]))
+                        for i, record in enumerate(fresh.values())
+                    ]
+                )
+                self._conn.execute("UPDATE namespaces SET count = ? WHERE namespace = ?", (ns.count, namespace))
+                self._conn.commit()
+
+    def query(self, vector: List[float], k: int, namespace: str) -> List[Match]:
+        ns = self._get(namespace)
+        if ns is None:
+            return []
+        count = self._catalog_count(namespace)
+        if count is None:
+            return []
+        if count != ns.count:
+            with ns.lock:
+                ns.sync(count)
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        hits = ns.search(query, k)
+        if not hits:
+            return []
+        rows = self._execute(
+            f"SELECT row, id, metadata FROM vectors WHERE namespace = ? AND row IN ({','.join('?' * len(hits))})",
+            (namespace, *(row for row, _ in hits))
+        )
+        by_row = {row: (vector_id, metadata) for row, vector_id, metadata in rows}
+        return [
+            (by_row[row][0], score, json.loads(by_row[row][1]))
+            for row, score in hits
+            if row in by_row
+        ]
+
+    def list_ids(self, namespace: str, batch_size: int) -> Iterator[List[str]]:
+        last_row = -1
+        while True:
+            rows = self._execute(
+                "SELECT row, id FROM vectors WHERE namespace = ? AND row > ? ORDER BY row LIMIT ?",
+                (namespace, last_row, batch_size)
+            )
+            if not rows:
+                return
+            yield [vector_id for _, vector_id in rows]
+            last_row = rows[-1][0]
+
+    def fetch(self, ids: List[str], namespace: str) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        rows = self._execute(
+            f"SELECT id, metadata FROM vectors WHERE namespace = ? AND id IN ({','.join('?' * len(ids))})",
+            (namespace, *ids)
+        )
+        return {vector_id: json.loads(metadata) for vector_id, metadata in rows}
+
+    def delete_namespace(self, namespace: str):
+        with self._namespace_write(namespace):
+            ns = self._namespaces.pop(namespace, None)
+            if ns is not None:
+                ns.lock.acquire()
+            try:
+                with self._lock:
+                    self._conn.execute("DELETE FROM vectors WHERE namespace = ?", (namespace,))
+                    self._conn.execute("DELETE FROM namespaces WHERE namespace = ?", (namespace,))
+                    self._conn.commit()
+                shutil.rmtree(self._directory(namespace), ignore_errors=True)
+            finally:
+                if ns is not None:
+                    ns.lock.release()
+        with self._lock:
+            self._namespace_locks.pop(namespace, None)
+
+    def stats(self) -> dict:
+        rows = self._execute("SELECT COUNT(*), COALESCE(SUM(count), 0) FROM namespaces")
+        return {
+            "backend": self.name,
+            "namespaces": rows[0][0],
+            "vectors": rows[0][1],
+            "open_namespaces": len(self._namespaces),
+            "hnsw_available": _hnswlib() is not None,
+            "hnsw_namespaces": sum(1 for ns in list(self._namespaces.values()) if ns._hnsw is not None),
+        }
+
+class BackendVectorStore(VectorStore):
+    """
+    LangChain VectorStore over a VectorBackend, for one namespace
+    (so `as_retriever()` and the rest of the chains work with either backend).
+    """
+
+    def __init__(self, backend: VectorBackend, embedding: Embeddings, namespace: str):
+        self.backend = backend
+        self._embedding = embedding
+        self.namespace = namespace
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        docs = [Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)]
+        ingest_documents(docs, self.namespace, self.backend, self._embedding)
+        return [chunk_id(doc) for doc in docs]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        backend: VectorBackend,
+        namespace: str,
+        **kwargs: Any
+    ) -> "BackendVectorStore":
+        store = cls(backend, embedding, namespace)
+        store.add_texts(texts, metadatas)
+        return store
+
+    def _to_document(self, match: Match) -> Tuple[Document, float]:
+        vector_id, score, metadata = match
+        text = metadata.pop(TEXT_KEY, "")
+        return Document(id=vector_id, page_content=text, metadata=metadata), score
+
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return [self._to_document(m) for m in self.backend.query(embedding, k, self.namespace)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        # both backends score by cosine similarity
+        return lambda score: score
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: Optional[bool] = None, **kwargs: Any):
+        if not delete_all:
+            raise ValueError("Only delete_all=True is supported.")
+        self.backend.delete_namespace(self.namespace)
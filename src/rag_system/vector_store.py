@@ -1,70 +1,338 @@
 import os
+import threading
 import time
-from langchain_pinecone import PineconeVectorStore
-from langchain_huggingface import HuggingFaceEmbeddings
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.documents import Document
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from src.core.config import settings
+from src.core.cache import LRUCache
+from src.core.lazy import LazyProvider
+from src.core.executors import get_pool
+from src.rag_system.ingest import ingest_documents, IngestReport, TEXT_KEY
+from src.rag_system.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.rag_system.models import LazyEmbeddings, EMBEDDING_MODEL_NAME
+from src.rag_system.keyword_index import keyword_index
+from src.rag_system.hybrid import HybridRetriever, reciprocal_rank_fusion
+from src.rag_system.reranker import RerankingRetriever
+from src.rag_system.context import document_position
+from src.rag_system.vector_backends import VectorBackend, PineconeBackend, LocalVectorBackend, BackendVectorStore
 
 INDEX_NAME = settings.PINECONE_INDEX_NAME
 
-print("[Embeddings] Initializing HuggingFace embeddings...")
-embeddings = HuggingFaceEmbeddings(
-    model_name="all-MiniLM-L6-v2",
-    model_kwargs={'device': 'cpu'}
+# the model itself is only loaded on the first embedding call
+_base_embeddings = LazyEmbeddings()
+
+# persistent cache in front of the model (same slides get uploaded by many students)
+_embedding_cache = None
+embeddings = _base_embeddings
+if settings.EMBEDDING_CACHE_ENABLED:
+    _embedding_cache = EmbeddingCache(
+        path=os.path.join(settings.DATA_DIR, "embedding_cache.sqlite"),
+        max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+        touch_interval=settings.EMBEDDING_CACHE_TOUCH_INTERVAL
+    )
+    embeddings = CachedEmbeddings(_base_embeddings, EMBEDDING_MODEL_NAME, _embedding_cache)
+
+# per-namespace vector stores, so each request doesn't rebuild one
+_store_cache = LRUCache(
+    max_size=settings.VECTOR_STORE_CACHE_SIZE,
+    ttl_seconds=settings.VECTOR_STORE_CACHE_TTL_SECONDS
+)
+_retriever_cache = LRUCache(
+    max_size=settings.VECTOR_STORE_CACHE_SIZE,
+    ttl_seconds=settings.VECTOR_STORE_CACHE_TTL_SECONDS
 )
 
+def _connect_index():
+    from pinecone import Pinecone # not needed at all with the local backend
+
+    if not settings.PINECONE_API_KEY:
+        raise RuntimeError("PINECONE_API_KEY is not set (or use VECTOR_BACKEND=local).")
+    pc = Pinecone(
+        api_key=settings.PINECONE_API_KEY,
+        pool_threads=settings.PINECONE_POOL_THREADS
+    )
+    index = pc.Index(INDEX_NAME, pool_threads=settings.PINECONE_POOL_THREADS)
+    print(f"[VectorStore] Connected to Pinecone index '{INDEX_NAME}'.")
+    return index
+
+# one Pinecone client + index handle for the whole process (pooled HTTP connections)
+_index_provider = LazyProvider("pinecone_index", _connect_index)
+
+def _get_index():
+    """
+    Returns the process-wide Pinecone index handle, creating it on first use.
+    """
+    return _index_provider.get()
+
+def _create_backend() -> VectorBackend:
+    if settings.VECTOR_BACKEND == "local":
+        path = os.path.join(settings.DATA_DIR, "vectors")
+        print(f"[VectorStore] Using the local vector backend at '{path}'.")
+        return LocalVectorBackend(path)
+    return PineconeBackend(_get_index())
+
+# where vectors are stored: Pinecone, or local memory-mapped files (VECTOR_BACKEND)
+_backend_provider = LazyProvider("vector_backend", _create_backend)
+
+def _get_backend() -> VectorBackend:
+    return _backend_provider.get()
+
 def _get_vector_store(namespace: str):
     """
-    Returns a Pinecone Vector Store connected to our index.
+    Returns a Vector Store over the configured backend.
     CRITICAL: We use 'namespace' to separate users.
+    Stores are cached per namespace (LRU + idle TTL).
     """
     
-    os.environ["PINECONE_API_KEY"] = settings.PINECONE_API_KEY
-    
-    return PineconeVectorStore.from_existing_index(
-        index_name=INDEX_NAME,
-        embedding=embeddings,
-        namespace=namespace 
+    return _store_cache.get_or_create(
+        namespace,
+        lambda: BackendVectorStore(
+            backend=_get_backend(),
+            embedding=embeddings,
+            namespace=namespace
+        )
     )
 
+# callbacks run after a namespace changes: listener(event, namespace, docs)
+# event is "add" (docs = the chunks just added), "clear" (docs = []), or "partial"
+# (a batch of a stream that's still running; the whole stream is reported as one "add" at the end)
+NamespaceListener = Callable[[str, str, List[Document]], None]
+_namespace_listeners: List[NamespaceListener] = []
 
-def add_documents_to_store(docs: List[Document], collection_name: str):
+def register_namespace_listener(listener: NamespaceListener):
     """
-    Adds documents to the user's specific namespace in Pinecone.
+    Registers a callback for namespace changes (used to keep derived
+    data like digests and caches in sync with the vector store).
+    """
+    _namespace_listeners.append(listener)
+
+def _notify_namespace_change(event: str, namespace: str, docs: List[Document]):
+    for listener in _namespace_listeners:
+        try:
+            listener(event, namespace, docs)
+        except Exception as e:
+            print(f"[VectorStore] Namespace listener failed on '{event}': {e}")
+
+def get_embedding_cache_stats() -> dict:
+    if _embedding_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **_embedding_cache.stats()}
+
+def get_vector_store_stats() -> dict:
+    return {
+        "backend": _get_backend().stats() if _backend_provider.loaded else {"backend": settings.VECTOR_BACKEND},
+        "stores": _store_cache.stats(),
+        "retrievers": _retriever_cache.stats(),
+        "keyword_index": keyword_index.stats(),
+    }
+
+
+def add_documents_to_store(
+    docs: List[Document],
+    collection_name: str,
+    vectors: Optional[Dict[str, List[float]]] = None,
+    event: str = "add"
+) -> IngestReport:
+    """
+    Adds documents to the user's specific namespace in the vector backend.
+    Chunks get content-hash IDs, so re-uploading the same file is a no-op.
+    `vectors` (by chunk ID) skips embedding for chunks we already have vectors for.
+    `event` is what namespace listeners are told, if anything was upserted.
     """
     print(f"[VectorStore] Adding {len(docs)} docs to namespace: {collection_name}")
     
     if not docs:
-        return
+        return IngestReport()
 
-    os.environ["PINECONE_API_KEY"] = settings.PINECONE_API_KEY
-    
     try:
-        PineconeVectorStore.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            index_name=INDEX_NAME,
-            namespace=collection_name 
-        )
-        print(f"[VectorStore] Upload complete.")
+        report = ingest_documents(docs, collection_name, _get_backend(), embeddings, vectors)
+        print(f"[VectorStore] Upload complete: {report.upserted} upserted, {report.skipped} skipped.")
+        if settings.HYBRID_SEARCH_ENABLED:
+            # skipped chunks too, in case they predate the keyword index
+            keyword_index.add(collection_name, docs)
+        if report.upserted:
+            _notify_namespace_change(event, collection_name, docs)
+        return report
     except Exception as e:
-        print(f"[VectorStore] Error uploading to Pinecone: {e}")
+        print(f"[VectorStore] Error uploading to the vector store: {e}")
         raise e
 
+def add_document_stream(
+    docs: Iterable[Document],
+    collection_name: str,
+    batch_size: int = None,
+    on_batch: Optional[Callable[[IngestReport], None]] = None
+) -> IngestReport:
+    """
+    Ingests chunks as they're produced (e.g. by a running transcription):
+    every `batch_size` chunks are embedded and upserted, so the start of a
+    lecture is searchable while the rest is still being processed.
+    Batches go through the embedding pool; `on_batch` gets the running total.
+    Listeners get a "partial" event per batch and a single "add" at the end,
+    so whole-document work (digests, the question bank) runs once per stream.
+    """
+    batch_size = batch_size or settings.STREAM_INGEST_BATCH_CHUNKS
+    total = IngestReport()
+    batch: List[Document] = []
+    added: List[Document] = []
+
+    def _flush():
+        nonlocal total
+        report = get_pool("embedding").submit(add_documents_to_store, batch, collection_name, None, "partial").result()
+        total = total.combine(report)
+        if report.upserted:
+            added.extend(batch)
+        if on_batch:
+            on_batch(total)
+
+    try:
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                _flush()
+                batch = []
+        if batch:
+            _flush()
+    finally:
+        # a failed stream still reports the batches that made it in
+        if added:
+            _notify_namespace_change("add", collection_name, added)
+
+    return total
+
+# namespaces ingested before the keyword index existed are indexed once, in the background
+_backfill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="keyword-backfill")
+_pending_backfills = set()
+_backfill_lock = threading.Lock()
+
+def _backfill_keyword_index(collection_name: str):
+    try:
+        count = 0
+        for batch in iter_namespace_documents(collection_name):
+            keyword_index.add(collection_name, batch)
+            count += len(batch)
+        keyword_index.mark_backfilled(collection_name)
+        print(f"[VectorStore] Keyword index backfilled for '{collection_name}' ({count} chunks).")
+    except Exception as e:
+        print(f"[VectorStore] Keyword index backfill failed for '{collection_name}': {e}")
+    finally:
+        with _backfill_lock:
+            _pending_backfills.discard(collection_name)
+
+def _schedule_keyword_backfill(collection_name: str):
+    if keyword_index.is_backfilled(collection_name):
+        return
+    with _backfill_lock:
+        if collection_name in _pending_backfills:
+            return
+        _pending_backfills.add(collection_name)
+    _backfill_executor.submit(_backfill_keyword_index, collection_name)
+
+def _create_retriever(collection_name: str):
+    vector_store = _get_vector_store(collection_name)
+    # with reranking on, retrieval returns the candidates and the reranker picks the final few
+    k = settings.RERANK_MAX_CANDIDATES if settings.RERANK_ENABLED else settings.RETRIEVER_K
+
+    if settings.HYBRID_SEARCH_ENABLED:
+        _schedule_keyword_backfill(collection_name)
+        retriever = HybridRetriever(
+            vector_store=vector_store,
+            namespace=collection_name,
+            k=k,
+            candidates=max(settings.HYBRID_CANDIDATES, k),
+            dense_weight=settings.HYBRID_DENSE_WEIGHT,
+            keyword_weight=settings.HYBRID_KEYWORD_WEIGHT
+        )
+    else:
+        retriever = vector_store.as_retriever(search_kwargs={"k": k})
+
+    if settings.RERANK_ENABLED:
+        retriever = RerankingRetriever(base=retriever)
+    return retriever
+
 def get_retriever(collection_name: str):
     """
-    Gets a retriever for the specific user namespace.
+    Gets a retriever for the specific user namespace:
+    hybrid dense + keyword search (or dense only if HYBRID_SEARCH_ENABLED is off),
+    optionally followed by cross-encoder reranking (RERANK_ENABLED).
+    """
+    return _retriever_cache.get_or_create(collection_name, lambda: _create_retriever(collection_name))
+
+# vector queries are network calls with pinecone, so a batch of them runs concurrently
+_query_executor = ThreadPoolExecutor(max_workers=settings.MULTI_QUERY_CONCURRENCY, thread_name_prefix="multi-query")
+
+def _keyword_search(collection_name: str, query: str, k: int) -> List[Document]:
+    try:
+        return keyword_index.search(collection_name, query, k)
+    except Exception as e:
+        print(f"[VectorStore] Keyword search failed for '{collection_name}': {e}")
+        return []
+
+def multi_query_search(
+    collection_name: str,
+    queries: List[str],
+    k: int = None,
+    limit: int = None
+) -> List[Document]:
+    """
+    Retrieves for several queries at about the latency of one: the queries are
+    embedded together (one cache lookup), their vector (and keyword) searches run
+    concurrently, and the ranked lists are merged with reciprocal rank fusion,
+    so chunks found by several queries rank higher and appear once.
     """
+    k = k or settings.MULTI_QUERY_K
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return []
+
     vector_store = _get_vector_store(collection_name)
-    return vector_store.as_retriever(search_kwargs={"k": 10})
+    # query path, so these match the vectors the single-query retrievers search with
+    if isinstance(embeddings, CachedEmbeddings):
+        vectors = embeddings.embed_queries(queries)
+    else:
+        vectors = [embeddings.embed_query(q) for q in queries]
+    futures = [_query_executor.submit(vector_store.similarity_search_by_vector, v, k) for v in vectors]
+    weights = [settings.HYBRID_DENSE_WEIGHT] * len(futures)
+    if settings.HYBRID_SEARCH_ENABLED:
+        futures += [_query_executor.submit(_keyword_search, collection_name, q, k) for q in queries]
+        weights += [settings.HYBRID_KEYWORD_WEIGHT] * len(queries)
+
+    results = [future.result() for future in futures]
+    merged = reciprocal_rank_fusion(results, weights, limit=limit or settings.MULTI_QUERY_LIMIT)
+    print(f"[VectorStore] Multi-query: {len(queries)} queries, {sum(map(len, results))} hits -> {len(merged)} chunks.")
+    return merged
+
+def iter_namespace_documents(collection_name: str, batch_size: int = None) -> Iterator[List[Document]]:
+    """
+    Streams every chunk in the user's namespace, one batch at a time.
+    Lists vector IDs page by page and fetches each page, so whole courses
+    can be processed in bounded memory.
+    """
+    backend = _get_backend()
+    batch_size = batch_size or settings.NAMESPACE_SCAN_BATCH_SIZE
+    
+    for ids in backend.list_ids(collection_name, batch_size):
+        fetched = backend.fetch(ids, collection_name)
+        batch = []
+        for vector_id in ids:
+            metadata = fetched.get(vector_id)
+            if metadata is None:
+                continue
+            text = metadata.pop(TEXT_KEY, "")
+            batch.append(Document(id=vector_id, page_content=text, metadata=metadata))
+        
+        if batch:
+            yield batch
 
 def get_all_documents(collection_name: str) -> List[Document]:
     """
-    Retrieves documents for the 'Prioritize' and 'Exam' features.
+    Retrieves every document in the namespace, in reading order,
+    for the 'Prioritize', 'Map' and 'Exam' features.
     """
-    vector_store = _get_vector_store(collection_name)
-    return vector_store.similarity_search(".", k=100)
+    docs = [doc for batch in iter_namespace_documents(collection_name) for doc in batch]
+    docs.sort(key=document_position)
+    return docs
 
 def clear_collection(collection_name: str):
     """
@@ -73,6 +341,9 @@ def clear_collection(collection_name: str):
     try:
         vector_store = _get_vector_store(collection_name)
         vector_store.delete(delete_all=True)
+        keyword_index.clear(collection_name)
+        keyword_index.mark_backfilled(collection_name) # nothing left to backfill
         print(f"[VectorStore] Namespace '{collection_name}' cleared.")
+        _notify_namespace_change("clear", collection_name, [])
     except Exception as e:
         print(f"Error clearing namespace: {e}")
\ No newline at end of file